@@ -0,0 +1,6 @@
+"""
+Benchmarks for the restaurant management system.
+
+`python -m benchmarks` runs the hot-path suite in benchmarks.suite; the
+other modules are standalone benchmarks for individual features.
+"""
@@ -0,0 +1,7 @@
+"""
+Command-line entry point for the benchmark suite.
+"""
+from benchmarks.suite import main
+
+if __name__ == "__main__":
+    main()
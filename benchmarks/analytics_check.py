@@ -0,0 +1,126 @@
+"""
+Check SalesAnalytics against a brute-force scan of order history and time both.
+
+Orders are spread over the past `--days` days, so day ranges and hour
+buckets are exercised. Run from the repository root:
+
+    python -m benchmarks.analytics_check --orders 100000
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from restro.analytics import get_analytics, this_week
+from restro.money import Money, ZERO
+from restro.restaurant import Restaurant
+
+
+def build(orders: int, days: int, seed: int = 0) -> Restaurant:
+    """Build a restaurant with orders placed at random times over recent days."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Analytics")
+    categories = ["Food", "Drink", "Dessert", "Side"]
+    menu = [
+        restaurant.add_menu_item(f"Item {n}", round(rng.uniform(1, 20), 2), categories[n % len(categories)])
+        for n in range(60)
+    ]
+    customers = [restaurant.add_customer(f"C {n}", f"c{n}@example.com", "Street") for n in range(500)]
+    for customer in customers:
+        customer.balance = Money(10 ** 15)
+    get_analytics(restaurant)
+    now = time.time()
+    for _ in range(orders):
+        customer = rng.choice(customers)
+        items = rng.choices(menu, weights=range(1, len(menu) + 1), k=rng.randint(1, 5))
+        total = ZERO
+        for item in items:
+            total += item.price
+        customer._record_order(items, total, now - rng.uniform(0, days * 86400))
+    return restaurant
+
+
+def scan_by_category(restaurant: Restaurant, start: date, end: date):
+    """Revenue per category by scanning every order."""
+    revenue = {}
+    for customer in restaurant.get_customers():
+        for order in customer.orders:
+            if start <= order.timestamp.date() <= end:
+                for item in order.items:
+                    revenue[item.category] = revenue.get(item.category, ZERO) + item.price
+    return revenue
+
+
+def scan_top_items(restaurant: Restaurant, n: int, start: date, end: date):
+    """Best sellers by units, ties broken by item ID, by scanning every order."""
+    units = {}
+    for customer in restaurant.get_customers():
+        for order in customer.orders:
+            if start <= order.timestamp.date() <= end:
+                for item in order.items:
+                    units[item] = units.get(item, 0) + 1
+    best = sorted(units.items(), key=lambda entry: (-entry[1], entry[0].item_id))[:n]
+    return [(item, count) for item, count in best]
+
+
+def scan_by_hour(restaurant: Restaurant, day: date):
+    """Revenue per hour of a day by scanning every order."""
+    revenue = {}
+    for customer in restaurant.get_customers():
+        for order in customer.orders:
+            if order.timestamp.date() == day:
+                hour = datetime.fromtimestamp(order._created // 3600 * 3600)
+                revenue[hour] = revenue.get(hour, ZERO) + order.total_price
+    return revenue
+
+
+def assert_equal(expected: dict, actual: dict, label: str):
+    """Fail unless two dicts of amounts agree exactly."""
+    assert expected.keys() == actual.keys(), f"{label}: keys differ"
+    for key, value in expected.items():
+        assert value == actual[key], f"{label}: {key} {value} != {actual[key]}"
+
+
+def timed(function, *args):
+    """Call a function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=14)
+    args = parser.parse_args(argv)
+
+    restaurant = build(args.orders, args.days)
+    analytics = restaurant.analytics
+    today = date.today()
+    week = this_week()
+    ranges = {"today": (today, today), "this week": week, "all": (date.min, date.max)}
+
+    for label, (start, end) in ranges.items():
+        expected, scan_time = timed(scan_by_category, restaurant, start, end)
+        if label == "all":
+            actual, query_time = timed(analytics.revenue_by_category)
+        else:
+            actual, query_time = timed(analytics.revenue_by_category, start, end)
+        assert_equal(expected, actual, f"revenue by category ({label})")
+        print(f"revenue by category {label:>9}: scan {scan_time * 1e3:8.2f} ms, query {query_time * 1e3:8.3f} ms")
+
+        expected, scan_time = timed(scan_top_items, restaurant, 10, start, end)
+        if label == "all":
+            actual, query_time = timed(analytics.top_items, 10)
+        else:
+            actual, query_time = timed(analytics.top_items, 10, start, end)
+        assert expected == [(item, units) for item, units, _ in actual], f"top items ({label})"
+        print(f"top 10 items        {label:>9}: scan {scan_time * 1e3:8.2f} ms, query {query_time * 1e3:8.3f} ms")
+
+    yesterday = today - timedelta(days=1)
+    assert_equal(scan_by_hour(restaurant, yesterday), analytics.revenue_by_hour(yesterday), "revenue by hour")
+    print("all aggregates match the brute-force scan")
+
+
+if __name__ == "__main__":
+    main()
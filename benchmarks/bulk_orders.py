@@ -0,0 +1,81 @@
+"""
+Throughput of Restaurant.place_orders_bulk against a loop of Customer.place_order.
+
+Run from the repository root:
+
+    python -m benchmarks.bulk_orders --orders 100000
+"""
+import argparse
+import contextlib
+import gc
+import io
+import random
+import time
+
+from restro.restaurant import Restaurant
+
+
+def build_restaurant(menu_size: int, customers: int, seed: int = 0) -> Restaurant:
+    """Create a restaurant with a synthetic menu and funded customers."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Benchmark")
+    for i in range(menu_size):
+        category = "Drink" if i % 4 == 0 else "Food"
+        restaurant.add_menu_item(f"Item {i}", round(rng.uniform(1, 30), 2), category)
+    for i in range(customers):
+        customer = restaurant.add_customer(f"Customer {i}", f"c{i}@example.com", "Street")
+        customer.add_funds(1_000_000.0)
+    return restaurant
+
+
+def build_batch(restaurant: Restaurant, orders: int, lines: int, seed: int = 1):
+    """Create (customer_id, item_names) pairs over the restaurant's data."""
+    rng = random.Random(seed)
+    names = [item.name for item in restaurant.get_menu()]
+    customer_ids = list(restaurant.customers)
+    return [
+        (rng.choice(customer_ids), [rng.choice(names) for _ in range(rng.randint(1, lines))])
+        for _ in range(orders)
+    ]
+
+
+def run(orders: int, menu_size: int, customers: int, lines: int):
+    """Time both code paths on identical restaurants and batches."""
+    looped = build_restaurant(menu_size, customers)
+    batch = build_batch(looped, orders, lines)
+    
+    gc.collect()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for customer_id, item_names in batch:
+            looped.get_customer(customer_id).place_order(looped, item_names)
+    loop_time = time.perf_counter() - start
+    
+    # Drop the first run's orders so both runs see the same heap size
+    del looped
+    bulk = build_restaurant(menu_size, customers)
+    gc.collect()
+    start = time.perf_counter()
+    results = bulk.place_orders_bulk(batch)
+    bulk_time = time.perf_counter() - start
+    
+    placed = sum(result.ok for result in results)
+    print(f"orders={orders} menu={menu_size} customers={customers} placed={placed}")
+    print(f"place_order loop : {loop_time:8.3f}s  {orders / loop_time:12,.0f} orders/s")
+    print(f"place_orders_bulk: {bulk_time:8.3f}s  {orders / bulk_time:12,.0f} orders/s")
+    print(f"speedup          : {loop_time / bulk_time:8.2f}x")
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--menu-size", type=int, default=1_000)
+    parser.add_argument("--customers", type=int, default=1_000)
+    parser.add_argument("--lines", type=int, default=8, help="maximum items per order")
+    args = parser.parse_args()
+    run(args.orders, args.menu_size, args.customers, args.lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure bulk order throughput of a sharded cluster against one restaurant.
+
+Places `--orders` orders in batches of `--batch` through a single
+in-process Restaurant, then through a RestaurantCluster of each size in
+`--shards`, and checks every run ends with the same liabilities. Shards
+run in parallel only on as many cores as the machine has, so speedups
+level off at the core count. Run from the repository root:
+
+    python -m benchmarks.cluster_scaling --orders 200000 --shards 1 2 4 8
+"""
+import argparse
+import os
+import random
+import time
+
+from restro.cluster import RestaurantCluster
+from restro.restaurant import Restaurant
+
+FUNDS = 10 ** 7
+
+
+def setup(target, customers: int, seed: int = 0) -> list:
+    """Give a restaurant or cluster a menu and funded customers, returning their IDs."""
+    rng = random.Random(seed)
+    for n in range(50):
+        target.add_menu_item(f"Item {n}", round(rng.uniform(1, 20), 2))
+    ids = []
+    for n in range(customers):
+        customer = target.add_customer(f"Customer {n}", f"c{n}@example.com", "Street")
+        customer_id = customer["customer_id"] if isinstance(customer, dict) else customer.customer_id
+        if isinstance(target, RestaurantCluster):
+            target.add_funds(customer_id, FUNDS)
+        else:
+            customer.add_funds(FUNDS)
+        ids.append(customer_id)
+    return ids
+
+
+def batches(ids: list, orders: int, size: int, seed: int = 1) -> list:
+    """Make the order batches, the same for every run."""
+    rng = random.Random(seed)
+    names = [f"Item {n}" for n in range(50)]
+    pairs = [(rng.choice(ids), rng.sample(names, rng.randint(1, 4))) for _ in range(orders)]
+    return [pairs[start:start + size] for start in range(0, orders, size)]
+
+
+def place(target, work: list) -> float:
+    """Place every batch and return the seconds taken."""
+    start = time.perf_counter()
+    for batch in work:
+        results = target.place_orders_bulk(batch)
+        assert all(result.ok for result in results)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args(argv)
+
+    print(f"orders={args.orders:,} batch={args.batch:,} cores={os.cpu_count()}")
+    restaurant = Restaurant("Single")
+    work = batches(setup(restaurant, args.customers), args.orders, args.batch)
+    baseline = place(restaurant, work)
+    expected = restaurant.total_liabilities()
+    print(f"{'restaurant':12}{args.orders / baseline:12,.0f} orders/s")
+
+    for shards in args.shards:
+        with RestaurantCluster("Cluster", shards) as cluster:
+            setup(cluster, args.customers)
+            elapsed = place(cluster, work)
+            assert cluster.total_liabilities() == expected, (cluster.total_liabilities(), expected)
+        print(f"{f'{shards} shards':12}{args.orders / elapsed:12,.0f} orders/s {baseline / elapsed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Multi-threaded stress test for a thread-safe Restaurant.
+
+Worker threads add funds and place orders for random customers while an
+admin thread registers customers and changes prices. Afterwards every
+customer's balance must equal their deposits minus their order totals and
+never be negative. Throughput is reported for each thread count.
+
+Run from the repository root:
+
+    python -m benchmarks.concurrency_stress --threads 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import random
+import threading
+import time
+from collections import defaultdict
+
+from restro.money import Money, ZERO
+from restro.restaurant import Restaurant
+
+
+def build_restaurant(menu_size: int, customers: int) -> Restaurant:
+    """Create a thread-safe restaurant with a synthetic menu and customers."""
+    restaurant = Restaurant("Stress", thread_safe=True)
+    for i in range(menu_size):
+        restaurant.add_menu_item(f"Item {i}", 1.0 + i % 20, "Food")
+    for i in range(customers):
+        restaurant.add_customer(f"Customer {i}", f"c{i}@example.com", "Street")
+    return restaurant
+
+
+def worker(restaurant: Restaurant, customer_ids, names, operations: int, seed: int, deposits):
+    """Mix deposits and orders, recording deposits per customer."""
+    rng = random.Random(seed)
+    for _ in range(operations):
+        customer = restaurant.get_customer(rng.choice(customer_ids))
+        if rng.random() < 0.4:
+            amount = Money.of(rng.randint(1, 40))
+            customer.add_funds(amount)
+            deposits[customer.customer_id] += amount
+        else:
+            customer.place_order(restaurant, rng.sample(names, rng.randint(1, 4)))
+
+
+def admin(restaurant: Restaurant, names, stop: threading.Event, registered):
+    """Register customers and change prices until told to stop."""
+    rng = random.Random(-1)
+    while not stop.is_set():
+        restaurant.update_menu_item_price(rng.choice(names), float(rng.randint(1, 20)))
+        registered.append(restaurant.add_customer("Walk-in", f"walkin{len(registered)}@example.com", "Street").customer_id)
+        time.sleep(0.001)
+
+
+def check_invariants(restaurant: Restaurant, deposit_maps, registered):
+    """Raise AssertionError if balances or customer IDs are inconsistent."""
+    deposits = defaultdict(Money)
+    for deposit_map in deposit_maps:
+        for customer_id, amount in deposit_map.items():
+            deposits[customer_id] += amount
+    for customer in restaurant.get_customers():
+        spent = sum((order.total_price for order in customer.orders), ZERO)
+        expected = deposits[customer.customer_id] - spent
+        assert customer.balance == expected, (customer.customer_id, customer.balance, expected)
+        assert customer.balance >= ZERO, (customer.customer_id, customer.balance)
+    assert len(set(registered)) == len(registered), "duplicate customer IDs"
+
+
+def run(threads: int, operations: int, menu_size: int, customers: int) -> float:
+    """Run one stress round and return operations per second."""
+    restaurant = build_restaurant(menu_size, customers)
+    customer_ids = list(restaurant.customers)
+    names = [item.name for item in restaurant.get_menu()]
+    deposit_maps = [defaultdict(Money) for _ in range(threads)]
+    registered = list(customer_ids)
+    stop = threading.Event()
+    per_thread = operations // threads
+    workers = [
+        threading.Thread(target=worker, args=(restaurant, customer_ids, names, per_thread, n, deposit_maps[n]))
+        for n in range(threads)
+    ]
+    admin_thread = threading.Thread(target=admin, args=(restaurant, names, stop, registered))
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        admin_thread.start()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        admin_thread.join()
+    
+    check_invariants(restaurant, deposit_maps, registered)
+    return per_thread * threads / elapsed
+
+
+def main():
+    """Parse arguments and run the stress test for each thread count."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--operations", type=int, default=200_000)
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--customers", type=int, default=500)
+    args = parser.parse_args()
+    
+    for threads in args.threads:
+        throughput = run(threads, args.operations, args.menu_size, args.customers)
+        print(f"threads={threads:3d}  {throughput:12,.0f} ops/s  invariants ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Check customer search and paging against a linear scan and time both.
+
+Registers `--customers` customers, then looks customers up by email and
+by name prefix and walks pages of the customer list, comparing every
+answer with a scan of all customers. Run from the repository root:
+
+    python -m benchmarks.customer_directory --customers 1000000
+"""
+import argparse
+import random
+import time
+
+from restro.restaurant import Restaurant
+
+FIRST_NAMES = ("Ada", "Alan", "Grace", "Edsger", "Barbara", "Donald", "Frances", "John", "Radia", "Ken")
+
+
+def build(customers: int, seed: int = 0) -> Restaurant:
+    """Build a restaurant with customers whose names share common prefixes."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Directory")
+    for n in range(customers):
+        restaurant.add_customer(f"{rng.choice(FIRST_NAMES)} {n}", f"Customer{n}@Example.com", "Street")
+    return restaurant
+
+
+def scan_email(restaurant: Restaurant, email: str):
+    """Find a customer by email by scanning every customer."""
+    email = email.strip().casefold()
+    return next((c for c in restaurant.customers.values() if c.email.strip().casefold() == email), None)
+
+
+def scan_name(restaurant: Restaurant, prefix: str, limit: int):
+    """Find customers by name prefix by scanning and sorting every match."""
+    prefix = prefix.casefold()
+    found = sorted((c.name.casefold(), c.customer_id) for c in restaurant.customers.values()
+                   if c.name.casefold().startswith(prefix))
+    return [customer_id for _, customer_id in found[:limit]]
+
+
+def timed(function):
+    """Call a function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    restaurant, elapsed = timed(lambda: build(args.customers))
+    print(f"registered {args.customers:,} customers: {elapsed:8.2f} s")
+    rng = random.Random(1)
+    picks = [rng.randrange(args.customers) for _ in range(args.queries)]
+
+    emails = [f"customer{pick}@EXAMPLE.com" for pick in picks]
+    expected, scan_time = timed(lambda: [scan_email(restaurant, email) for email in emails])
+    actual, query_time = timed(lambda: [restaurant.find_customer_by_email(email) for email in emails])
+    assert actual == expected and None not in actual, "find_customer_by_email"
+    print(f"email lookup      : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"index {query_time / args.queries * 1e6:8.2f} us")
+
+    prefixes = [f"{rng.choice(FIRST_NAMES)} {pick}"[:rng.randint(3, 8)] for pick in picks]
+    expected, scan_time = timed(lambda: [scan_name(restaurant, prefix, 10) for prefix in prefixes])
+    actual, query_time = timed(lambda: [
+        [c.customer_id for c in restaurant.find_customers_by_name(prefix, 10)] for prefix in prefixes
+    ])
+    assert actual == expected, "find_customers_by_name"
+    print(f"name prefix       : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"index {query_time / args.queries * 1e6:8.2f} us")
+
+    cursors = [f"C{pick + 1:04d}" for pick in picks]
+    ordered = list(restaurant.customers)
+    expected, scan_time = timed(lambda: [
+        ordered[ordered.index(cursor) + 1:][:args.page_size] for cursor in cursors
+    ])
+    actual, query_time = timed(lambda: [
+        [c.customer_id for c in restaurant.customer_page(cursor, args.page_size)[0]] for cursor in cursors
+    ])
+    assert actual == expected, "customer_page"
+    print(f"page after cursor : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"index {query_time / args.queries * 1e6:8.2f} us")
+
+    walked, elapsed = timed(lambda: [c.customer_id for c in restaurant.iter_customers()])
+    assert walked == ordered, "iter_customers"
+    print(f"walk every page   : {elapsed:8.2f} s")
+    print("all searches and pages match the scan")
+
+
+if __name__ == "__main__":
+    main()
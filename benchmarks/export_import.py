@@ -0,0 +1,88 @@
+"""
+Time streaming export and import of orders and measure the memory export holds.
+
+Builds a restaurant with `--orders` orders, exports customers and orders
+in each format, reports throughput and the peak memory allocated while
+exporting, which stays flat however many orders there are, then imports
+the files into an empty restaurant and checks they match. Run from the
+repository root:
+
+    python -m benchmarks.export_import --orders 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from restro import export
+from restro.money import Money
+from restro.restaurant import Restaurant
+
+FORMATS = ("csv", "jsonl", "csv.gz", "jsonl.gz")
+
+
+def build(orders: int, customers: int, seed: int = 0) -> Restaurant:
+    """Build a restaurant whose customers hold `orders` orders between them."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Export")
+    menu = [restaurant.add_menu_item(f"Item {n}", round(rng.uniform(1, 20), 2), f"Category {n % 5}")
+            for n in range(100)]
+    people = [restaurant.add_customer(f"Customer {n}", f"c{n}@example.com", "Street") for n in range(customers)]
+    start = time.time() - orders
+    for n in range(orders):
+        items = rng.choices(menu, k=rng.randint(1, 4))
+        people[n % customers]._record_order(items, Money(sum(item.price.cents for item in items)), start + n)
+    return restaurant
+
+
+def traced_peak(function) -> int:
+    """Call a function under tracemalloc and return the peak bytes it allocated."""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    args = parser.parse_args(argv)
+
+    restaurant = build(args.orders, args.customers)
+    print(f"orders={args.orders:,} customers={args.customers:,}")
+    with tempfile.TemporaryDirectory() as directory:
+        for suffix in args.formats:
+            customers_path = os.path.join(directory, f"customers.{suffix}")
+            orders_path = os.path.join(directory, f"orders.{suffix}")
+
+            start = time.perf_counter()
+            export.export_customers(restaurant, customers_path)
+            written = export.export_orders(restaurant, orders_path)
+            elapsed = time.perf_counter() - start
+            assert written == args.orders
+            peak = traced_peak(lambda: export.export_orders(restaurant, orders_path))
+            size = os.path.getsize(orders_path)
+            print(f"{suffix:9} export {written / elapsed:10,.0f} orders/s  "
+                  f"peak {peak / 2 ** 20:6.2f} MiB  file {size / 2 ** 20:8.1f} MiB")
+
+            copy = Restaurant("Import")
+            start = time.perf_counter()
+            export.import_customers(copy, customers_path)
+            read = export.import_orders(copy, orders_path)
+            elapsed = time.perf_counter() - start
+            assert read == args.orders
+            for customer_id in random.Random(1).sample(list(restaurant.customers), 20):
+                original, imported = restaurant.get_customer(customer_id), copy.get_customer(customer_id)
+                assert imported.balance == original.balance
+                assert [(o.id, o.total_price, o._created) for o in imported.orders] == \
+                       [(o.id, o.total_price, o._created) for o in original.orders]
+            print(f"{suffix:9} import {read / elapsed:10,.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
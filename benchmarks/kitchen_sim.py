@@ -0,0 +1,85 @@
+"""
+Size the kitchen by replaying a synthetic day of orders through it.
+
+Generates a day of orders arriving at random, busiest at lunch and
+dinner, then simulates them through a kitchen with each combination of
+`--food` and `--drink` cooks and each `--aging`, reporting throughput,
+latency from order to ready, station utilization and how long each
+simulated day took to replay. Run from the repository root:
+
+    python -m benchmarks.kitchen_sim --per-hour 30 --food 8 10 12 --drink 2 3
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from restro.kitchen import simulate
+from restro.models import MenuItem, Order
+
+# Relative order rate of each hour of the day, from 08:00 to 22:00
+HOURLY_RATE = {8: 0.4, 9: 0.5, 10: 0.5, 11: 1.0, 12: 2.0, 13: 1.6, 14: 0.6, 15: 0.4,
+               16: 0.4, 17: 0.8, 18: 1.8, 19: 2.0, 20: 1.4, 21: 0.6}
+
+
+def build_menu(seed: int = 0):
+    """Make a menu of food and drinks with their prep seconds per unit."""
+    rng = random.Random(seed)
+    items = [MenuItem(f"Dish {n}", round(rng.uniform(6, 20), 2), "Food") for n in range(30)]
+    items += [MenuItem(f"Drink {n}", round(rng.uniform(1, 6), 2), "Drink") for n in range(15)]
+    prep = {item.name: rng.uniform(180, 600) if item.category == "Food" else rng.uniform(30, 120)
+            for item in items}
+    return items, prep
+
+
+def day_of_orders(items: list, per_hour: float, seed: int = 1) -> list:
+    """Make the orders of one day, arriving as a Poisson process at the hourly rates."""
+    rng = random.Random(seed)
+    food = [item for item in items if item.category == "Food"]
+    drinks = [item for item in items if item.category == "Drink"]
+    day = datetime(2026, 1, 5).timestamp()
+    orders = []
+    for hour, weight in HOURLY_RATE.items():
+        at = day + hour * 3600
+        end = at + 3600
+        while True:
+            at += rng.expovariate(per_hour * weight / 3600)
+            if at >= end:
+                break
+            lines = rng.sample(food, rng.randint(0, 2)) + rng.sample(drinks, rng.randint(0, 2)) or [rng.choice(food)]
+            quantities = [rng.choice((1, 1, 1, 2, 3)) for _ in lines]
+            orders.append(Order(lines, "C0001", at, None, len(orders), 0, quantities))
+    return orders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--per-hour", type=float, default=30.0,
+                        help="average orders per hour over the day, before the hourly weights")
+    parser.add_argument("--food", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--drink", type=int, nargs="+", default=[2, 3])
+    parser.add_argument("--aging", type=float, nargs="+", default=[0.0, 1.0, 100.0])
+    args = parser.parse_args(argv)
+
+    items, prep = build_menu()
+    orders = day_of_orders(items, args.per_hour)
+    print(f"orders={len(orders):,} per_hour={args.per_hour:g}")
+    print(f"{'food':>5}{'drink':>6}{'aging':>7}{'orders/h':>10}{'p50 min':>9}{'p95 min':>9}{'max min':>9}"
+          f"{'food use':>10}{'drink use':>10}{'replay s':>10}")
+    for food in args.food:
+        for drink in args.drink:
+            for aging in args.aging:
+                start = time.perf_counter()
+                report = simulate(orders, {"Food": food, "Drink": drink}, prep, aging)
+                elapsed = time.perf_counter() - start
+                assert report["orders"] == len(orders) and not report["pending"]
+                latency = report["latency"]
+                stations = report["stations"]
+                print(f"{food:5}{drink:6}{aging:7g}{report['orders_per_hour']:10.1f}"
+                      f"{latency['p50'] / 60:9.1f}{latency['p95'] / 60:9.1f}{latency['max'] / 60:9.1f}"
+                      f"{stations['Food']['utilization']:10.0%}{stations['Drink']['utilization']:10.0%}"
+                      f"{elapsed:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Check point-in-time balances and liabilities against a brute-force scan and time both.
+
+Deposits and orders are spread over the past `--days` days and recorded
+out of time order, as a replay can, so the ledgers' one-off sort is
+exercised too. Run from the repository root:
+
+    python -m benchmarks.ledger_check --entries 200000
+"""
+import argparse
+import random
+import time
+
+from restro.ledger import DEPOSIT
+from restro.money import ZERO
+from restro.restaurant import Restaurant
+
+
+def build(entries: int, customers: int, days: int, seed: int = 0):
+    """Build a restaurant with deposits and orders at random past times.
+
+    Returns:
+        The restaurant and every (customer_id, timestamp, cents) posted
+    """
+    rng = random.Random(seed)
+    restaurant = Restaurant("Ledger")
+    menu = [restaurant.add_menu_item(f"Item {n}", round(rng.uniform(1, 20), 2)) for n in range(40)]
+    people = [restaurant.add_customer(f"C {n}", f"c{n}@example.com", "Street") for n in range(customers)]
+    now = time.time()
+    posted = []
+    for _ in range(entries):
+        customer = rng.choice(people)
+        timestamp = now - rng.uniform(0, days * 86400)
+        if rng.random() < 0.3:
+            cents = rng.randint(500, 5000)
+            customer._post(timestamp, cents, DEPOSIT)
+        else:
+            items = rng.choices(menu, k=rng.randint(1, 4))
+            order = customer._record_order(items, sum(item.price for item in items), timestamp)
+            cents = -order.total_price.cents
+        posted.append((customer.customer_id, timestamp, cents))
+    return restaurant, posted
+
+
+def scan_balance(posted, customer_id: str, when: float) -> int:
+    """A customer's balance in cents at a moment, by scanning every entry."""
+    return sum(cents for owner, timestamp, cents in posted if owner == customer_id and timestamp <= when)
+
+
+def scan_liabilities(posted, when: float) -> int:
+    """Total customer balances in cents at a moment, by scanning every entry."""
+    return sum(cents for _, timestamp, cents in posted if timestamp <= when)
+
+
+def timed(function):
+    """Call a function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    restaurant, posted = build(args.entries, args.customers, args.days)
+    rng = random.Random(1)
+    now = time.time()
+    moments = [now - rng.uniform(0, args.days * 86400) for _ in range(args.queries)]
+    customer_ids = list(restaurant.customers)
+
+    # The first query of each ledger pays for sorting the out-of-order entries
+    start = time.perf_counter()
+    for customer in restaurant.get_customers():
+        customer.balance_at(now)
+    restaurant.total_liabilities(now)
+    print(f"first queries (sorting {args.entries:,} entries twice): {(time.perf_counter() - start) * 1e3:8.2f} ms")
+
+    queries = [(rng.choice(customer_ids), when) for when in moments]
+    expected, scan_time = timed(lambda: [scan_balance(posted, customer_id, when) for customer_id, when in queries])
+    actual, query_time = timed(lambda: [
+        restaurant.get_customer(customer_id).balance_at(when).cents for customer_id, when in queries
+    ])
+    assert actual == expected, "balance_at"
+    print(f"balance_at        : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"query {query_time / args.queries * 1e6:8.2f} us")
+
+    expected, scan_time = timed(lambda: [scan_liabilities(posted, when) for when in moments])
+    actual, query_time = timed(lambda: [restaurant.total_liabilities(when).cents for when in moments])
+    assert actual == expected, "total_liabilities"
+    print(f"total_liabilities : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"query {query_time / args.queries * 1e6:8.2f} us")
+
+    assert restaurant.total_liabilities() == sum((customer.balance for customer in restaurant.get_customers()), ZERO)
+    print("all balances match the brute-force scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measure what metrics cost on the hot paths, disabled and enabled.
+
+Times a mix of order placement, deposits, balance checks and customer
+lookups with metrics disabled and enabled, alternating between the two
+and taking the best of several repeats of each, with the garbage
+collector paused as timeit does. Balance checks and customer lookups
+are getters metrics leave uninstrumented, so they should show no
+overhead. Run from the repository root:
+
+    python -m benchmarks.metrics_overhead --ops 50000
+
+Exits non-zero if enabled metrics slow order placement by more than
+`--budget` percent.
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+
+from restro.metrics import disable_metrics, enable_metrics, metrics_snapshot
+from restro.restaurant import Restaurant
+
+
+def build(customers: int, seed: int = 0) -> Restaurant:
+    """Build a restaurant whose customers can afford every order in the run."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Metrics")
+    for n in range(50):
+        restaurant.add_menu_item(f"Item {n}", round(rng.uniform(1, 20), 2))
+    for n in range(customers):
+        restaurant.add_customer(f"Customer {n}", f"c{n}@example.com", "Street").add_funds(10 ** 9)
+    return restaurant
+
+
+def workloads(restaurant: Restaurant, ops: int, seed: int = 1):
+    """Make the timed workloads, each doing `ops` calls."""
+    rng = random.Random(seed)
+    names = [item.name for item in restaurant.get_menu()]
+    customers = restaurant.get_customers()
+    ids = [customer.customer_id for customer in customers]
+    orders = [(rng.choice(customers), rng.sample(names, rng.randint(1, 4))) for _ in range(ops)]
+    lookups = [rng.choice(ids) for _ in range(ops)]
+    picks = [rng.choice(customers) for _ in range(ops)]
+
+    def place_orders():
+        for customer, items in orders:
+            customer.place_order(restaurant, items)
+
+    def add_funds():
+        for customer in picks:
+            customer.add_funds(1)
+
+    def check_balances():
+        for customer in picks:
+            customer.check_balance()
+
+    def get_customers():
+        for customer_id in lookups:
+            restaurant.get_customer(customer_id)
+
+    return {
+        "place_order": place_orders,
+        "add_funds": add_funds,
+        "check_balance": check_balances,
+        "get_customer": get_customers,
+    }
+
+
+def timed(function) -> float:
+    """Run a function with the garbage collector paused and return its time in seconds."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=50_000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=20.0,
+                        help="largest acceptable slowdown of place_order with metrics enabled, in percent")
+    args = parser.parse_args(argv)
+
+    restaurant = build(args.customers)
+    runs = workloads(restaurant, args.ops)
+    timings = {name: {"disabled": float("inf"), "enabled": float("inf")} for name in runs}
+    for _ in range(args.repeats):
+        for state in ("disabled", "enabled"):
+            if state == "enabled":
+                enable_metrics(restaurant)
+            for name, function in runs.items():
+                timings[name][state] = min(timings[name][state], timed(function))
+            if state == "enabled":
+                calls = metrics_snapshot(restaurant)["operations"]["customer.place_order"]["calls"]
+                assert calls == args.ops, calls
+                disable_metrics(restaurant)
+
+    print(f"{'operation':15}{'disabled':>12}{'enabled':>12}{'overhead':>12}{'per call':>12}")
+    for name, states in timings.items():
+        overhead = states["enabled"] / states["disabled"] - 1
+        extra = (states["enabled"] - states["disabled"]) / args.ops * 1e6
+        print(f"{name:15}{states['disabled'] / args.ops * 1e6:10.2f}us{states['enabled'] / args.ops * 1e6:10.2f}us"
+              f"{overhead:12.1%}{extra:10.2f}us")
+
+    overhead = timings["place_order"]["enabled"] / timings["place_order"]["disabled"] - 1
+    if overhead * 100 > args.budget:
+        print(f"place_order overhead {overhead:.1%} exceeds the {args.budget:g}% budget")
+        sys.exit(1)
+    print(f"place_order overhead {overhead:.1%} is within the {args.budget:g}% budget")
+
+
+if __name__ == "__main__":
+    main()
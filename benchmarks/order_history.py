@@ -0,0 +1,108 @@
+"""
+Check order history range queries and paging against a linear scan and time both.
+
+Records `--orders` orders spread over `--days` days across `--customers`
+customers, the first of them a heavy regular with a tenth of all orders,
+then queries the regular's orders between two moments, pages back
+through their history, and asks the restaurant for every order of the
+last hour, comparing every answer with a scan. Run from the repository
+root:
+
+    python -m benchmarks.order_history --orders 1000000 --customers 10000
+"""
+import argparse
+import random
+import time
+
+from restro.money import Money
+from restro.restaurant import Restaurant
+
+
+def build(orders: int, customers: int, days: int, seed: int = 0) -> Restaurant:
+    """Build a restaurant whose first customer placed a tenth of the orders."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("History")
+    for n in range(20):
+        restaurant.add_menu_item(f"Item {n}", 5)
+    menu = list(restaurant.menu)
+    people = [restaurant.add_customer(f"Customer {n}", f"c{n}@example.com", "Street") for n in range(customers)]
+    end = time.time()
+    start = end - days * 86400
+    # Orders arrive in time order, the way they are placed
+    for n, at in enumerate(sorted(rng.uniform(start, end) for _ in range(orders))):
+        customer = people[0] if n % 10 == 0 else people[rng.randrange(customers)]
+        items = rng.sample(menu, rng.randint(1, 3))
+        customer._record_order(items, Money(sum(item.price.cents for item in items)), at)
+    return restaurant
+
+
+def timed(function):
+    """Call a function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--customers", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    restaurant, elapsed = timed(lambda: build(args.orders, args.customers, args.days))
+    print(f"recorded {args.orders:,} orders: {elapsed:8.2f} s")
+    regular = restaurant.get_customer(next(iter(restaurant.customers)))
+    history = regular.orders
+    rng = random.Random(1)
+    first, last = history[0]._created, history[-1]._created
+    spans = []
+    for _ in range(args.queries):
+        start = rng.uniform(first, last)
+        spans.append((start, start + 86400))
+
+    expected, scan_time = timed(lambda: [
+        [order.id for order in history if start <= order._created < end] for start, end in spans
+    ])
+    actual, query_time = timed(lambda: [[order.id for order in regular.view_orders(start, end)] for start, end in spans])
+    assert actual == expected, "view_orders"
+    print(f"regular's day     : scan {scan_time / args.queries * 1e3:8.3f} ms, "
+          f"index {query_time / args.queries * 1e6:8.2f} us  ({len(history):,} orders)")
+
+    # Walk back at most --queries pages, stopping at the oldest
+    pages = max(1, min(args.queries, -(-len(history) // args.page_size)))
+    expected, scan_time = timed(lambda: [
+        [order.id for order in list(reversed(history))[page * args.page_size:(page + 1) * args.page_size]]
+        for page in range(pages)
+    ])
+
+    def walk():
+        found, cursor = [], None
+        for _ in range(pages):
+            orders, cursor = regular.order_page(cursor, args.page_size)
+            found.append([order.id for order in orders])
+            if cursor is None:
+                break
+        return found
+
+    actual, query_time = timed(walk)
+    assert actual == expected, "order_page"
+    print(f"page back         : scan {scan_time / pages * 1e3:8.3f} ms, index {query_time / pages * 1e6:8.2f} us")
+
+    hour_ago = time.time() - 3600
+    expected, scan_time = timed(lambda: sorted(
+        (order._created, order.id) for customer in restaurant.customers.values()
+        for order in customer.orders if order._created >= hour_ago
+    ))
+    actual, build_time = timed(lambda: [(order._created, order.id) for order in restaurant.orders_between(hour_ago)])
+    assert actual == expected, "orders_between"
+    _, query_time = timed(lambda: [restaurant.orders_between(hour_ago) for _ in range(args.queries)])
+    print(f"last hour         : scan {scan_time * 1e3:8.3f} ms, index {query_time / args.queries * 1e6:8.2f} us "
+          f"after {build_time * 1e3:.1f} ms to build  ({len(actual):,} orders)")
+    print("all ranges and pages match the scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Bytes per order for the slotted Order against the previous dict-backed layout.
+
+Run from the repository root:
+
+    python -m benchmarks.order_memory --orders 200000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+
+from restro.models import MenuItem, Order
+
+
+class DictOrder:
+    """The dict-backed Order layout used before orders became slotted."""
+
+    def __init__(self, items, customer_id):
+        self.items = items
+        self.customer_id = customer_id
+        self.total_price = sum(item.price for item in items)
+        self.timestamp = datetime.now()
+        self.order_id = f"{customer_id}-{self.timestamp.strftime('%Y%m%d%H%M%S')}"
+
+
+def measure(factory, orders: int, menu, lines: int, seed: int = 0) -> float:
+    """Return the traced bytes allocated per order built by `factory`."""
+    rng = random.Random(seed)
+    baskets = [rng.choices(menu, k=rng.randint(1, lines)) for _ in range(orders)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = [factory(list(basket), f"C{n % 10000:04d}") for n, basket in enumerate(baskets)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Exclude the list holding the orders
+    return (after - before - built.__sizeof__()) / orders
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=6, help="maximum items per order")
+    args = parser.parse_args()
+    
+    menu = [MenuItem(f"Item {i}", 1.0 + i % 50, "Food") for i in range(args.menu_size)]
+    legacy = measure(DictOrder, args.orders, menu, args.lines)
+    slotted = measure(Order, args.orders, menu, args.lines)
+    print(f"orders={args.orders} lines<={args.lines}")
+    print(f"dict-backed Order: {legacy:8.1f} bytes/order")
+    print(f"slotted Order    : {slotted:8.1f} bytes/order")
+    print(f"reduction        : {1 - slotted / legacy:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
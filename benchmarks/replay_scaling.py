@@ -0,0 +1,93 @@
+"""
+Scaling of the parallel log replay with worker processes.
+
+Writes a synthetic operation log of deposits, orders and occasional price
+changes, then times a sequential wal.apply_record replay against
+reconcile.replay_customers at each worker count. Run from the repository
+root:
+
+    python -m benchmarks.replay_scaling --events 50000000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from restro import reconcile, wal
+from restro.restaurant import Restaurant
+
+
+def write_log(path: str, events: int, customers: int, menu_size: int, seed: int = 0):
+    """Write a synthetic log in the format OperationLog produces."""
+    rng = random.Random(seed)
+    names = [f"Item {n}" for n in range(menu_size)]
+    start = time.time() - events / 1000
+    # Each menu record makes a menu version, as in a live log
+    version = 0
+    with open(path, "w", encoding="utf-8") as log_file:
+        lines = []
+        for name in names:
+            lines.append([wal.ADD_ITEM, name, round(rng.uniform(1, 20), 2), "Food"])
+            version += 1
+        for number in range(1, customers + 1):
+            lines.append([wal.ADD_CUSTOMER, f"C{number:04d}", f"Customer {number}", f"c{number}@example.com", "Street"])
+        for event in range(events):
+            customer_id = f"C{rng.randint(1, customers):04d}"
+            roll = rng.random()
+            if roll < 0.3:
+                lines.append([wal.ADD_FUNDS, customer_id, rng.randint(10, 100), start + event / 1000])
+            elif roll < 0.9999:
+                lines.append([wal.PLACE_ORDER, customer_id, start + event / 1000, event, version,
+                              *rng.choices(names, k=rng.randint(1, 4))])
+            else:
+                lines.append([wal.UPDATE_PRICE, rng.choice(names), round(rng.uniform(1, 20), 2)])
+                version += 1
+            if len(lines) >= 100_000:
+                log_file.write("".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines))
+                lines.clear()
+        log_file.write("".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines))
+
+
+def sequential(path: str) -> float:
+    """Time a one-record-at-a-time replay."""
+    restaurant = Restaurant("Sequential")
+    start = time.perf_counter()
+    for record in wal.OperationLog.read(path):
+        wal.apply_record(restaurant, record)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--sequential", action="store_true", help="also time the sequential replay")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.log")
+        start = time.perf_counter()
+        write_log(path, args.events, args.customers, args.menu_size)
+        print(f"wrote {args.events:,} events ({os.path.getsize(path) / 2**20:.0f} MiB) "
+              f"in {time.perf_counter() - start:.1f} s on {os.cpu_count()} CPUs")
+
+        if args.sequential:
+            elapsed = sequential(path)
+            print(f"sequential apply_record   {elapsed:8.2f} s  {args.events / elapsed:12,.0f} events/s")
+
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            customers, _ = reconcile.replay_customers(path, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"replay_customers x{workers:<3}    {elapsed:8.2f} s  {args.events / elapsed:12,.0f} events/s"
+                  f"  speedup {baseline / elapsed:5.2f}  ({len(customers):,} customers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Asynchronous load client for the restaurant HTTP/JSON service.
+
+Opens many keep-alive connections, each pipelining requests, and reports
+throughput with p50/p99 latency. By default it starts a service in-process
+on a free port; pass --url to target a running one.
+
+Run from the repository root:
+
+    python -m benchmarks.service_load --connections 1000 --requests 20
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from urllib.parse import quote, urlsplit
+
+from restro.admin import Admin
+from restro.restaurant import Restaurant
+from restro.service import RestaurantService
+
+ADMIN_AUTH = "Basic " + base64.b64encode(b"admin:admin123").decode("ascii")
+
+
+def encode_request(method: str, path: str, body=None, host: str = "localhost") -> bytes:
+    """Serialize one keep-alive request."""
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: {ADMIN_AUTH}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+
+async def read_response(reader: asyncio.StreamReader):
+    """Read one response and return (status, decoded body)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, json.loads(body)
+
+
+async def call(host: str, port: int, method: str, path: str, body=None):
+    """Send a single request on its own connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode_request(method, path, body))
+    response = await read_response(reader)
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+async def client(host: str, port: int, customer_id: str, names, requests: int, depth: int,
+                 seed: int, latencies, statuses):
+    """Drive one connection, keeping up to `depth` requests in flight."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = asyncio.Queue(depth)
+
+    async def send():
+        for _ in range(requests):
+            roll = rng.random()
+            if roll < 0.5:
+                request = encode_request("POST", f"/customers/{customer_id}/orders",
+                                         {"items": rng.sample(names, rng.randint(1, 3))})
+            elif roll < 0.7:
+                request = encode_request("POST", f"/customers/{customer_id}/funds", {"amount": 50})
+            elif roll < 0.9:
+                request = encode_request("GET", f"/customers/{customer_id}")
+            else:
+                request = encode_request("GET", f"/customers/{customer_id}/orders")
+            await sent_at.put(time.perf_counter())
+            writer.write(request)
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in range(requests):
+        status, _ = await read_response(reader)
+        latencies.append(time.perf_counter() - await sent_at.get())
+        statuses[status] = statuses.get(status, 0) + 1
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(host: str, port: int, connections: int, requests: int, depth: int, menu_size: int):
+    """Set up customers and the menu, then run the load."""
+    for i in range(menu_size):
+        await call(host, port, "POST", "/menu", {"name": f"Item {i}", "price": 2 + i % 15, "category": "Food"})
+    _, menu = await call(host, port, "GET", "/menu")
+    names = [item["name"] for item in menu]
+    customer_ids = []
+    for i in range(connections):
+        _, customer = await call(host, port, "POST", "/customers",
+                                 {"name": f"Load {i}", "email": f"load{i}@example.com", "address": "Street"})
+        customer_ids.append(quote(customer["customer_id"]))
+
+    latencies = []
+    statuses = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, customer_id, names, requests, depth, n, latencies, statuses)
+        for n, customer_id in enumerate(customer_ids)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"connections={connections} requests/conn={requests} pipeline depth={depth}")
+    print(f"requests : {len(latencies):,} in {elapsed:.2f}s = {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency  : p50 {percentile(latencies, 0.50) * 1000:.2f} ms"
+          f"  p99 {percentile(latencies, 0.99) * 1000:.2f} ms"
+          f"  max {latencies[-1] * 1000:.2f} ms")
+    print(f"statuses : {dict(sorted(statuses.items()))}")
+
+
+async def main_async(args):
+    """Start an in-process service unless a URL was given, then run the load."""
+    if args.url:
+        url = urlsplit(args.url)
+        await run(url.hostname, url.port or 80, args.connections, args.requests, args.depth, args.menu_size)
+        return
+    api = RestaurantService(Restaurant("Load Test"), Admin("admin", "admin123"), queue_size=args.queue_size)
+    server = await api.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        await run("127.0.0.1", port, args.connections, args.requests, args.depth, args.menu_size)
+    finally:
+        await api.close()
+
+
+def main():
+    """Parse arguments and run the load client."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="service to target, e.g. http://127.0.0.1:8080")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20, help="requests per connection")
+    parser.add_argument("--depth", type=int, default=4, help="pipelined requests in flight per connection")
+    parser.add_argument("--menu-size", type=int, default=50)
+    parser.add_argument("--queue-size", type=int, default=1024, help="in-process service queue bound")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the in-memory and SQLite storage backends.
+
+Registers and funds `--customers` customers, places `--orders` orders
+for customers picked with a skew towards a hot fifth of them, then
+looks customers up with the same skew, on a MemoryBackend and on a
+SQLiteBackend for each `--batch-size`. Reports the rate of each phase,
+the SQLite cache hit rate, the database size and how long reopening
+it takes. Only total liabilities are compared here; benchmarks.storage_parity
+checks that the backends hold the same restaurant. Run from the
+repository root:
+
+    python -m benchmarks.storage_backends --customers 50000 --orders 200000 --batch-size 1 100 1000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from restro.restaurant import Restaurant
+from restro.storage import MemoryBackend, SQLiteBackend
+
+
+def picks(customers: int, count: int, seed: int) -> list:
+    """Pick customer numbers, four in five from the first fifth of customers."""
+    rng = random.Random(seed)
+    hot = max(1, customers // 5)
+    return [rng.randrange(hot) if rng.random() < 0.8 else rng.randrange(customers) for _ in range(count)]
+
+
+def run(storage, customers: int, orders: int) -> dict:
+    """Time each phase on one backend and return the rates."""
+    restaurant = Restaurant("Storage", storage=storage)
+    names = [f"Item {n}" for n in range(50)]
+    for name in names:
+        restaurant.add_menu_item(name, 5)
+    rng = random.Random(2)
+    baskets = [rng.sample(names, rng.randint(1, 4)) for _ in range(orders)]
+    rates = {}
+
+    start = time.perf_counter()
+    ids = []
+    for n in range(customers):
+        customer = restaurant.add_customer(f"Customer {n}", f"c{n}@example.com", "Street")
+        customer.add_funds(10 ** 6)
+        ids.append(customer.customer_id)
+    storage.flush()
+    rates["register"] = customers / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for number, basket in zip(picks(customers, orders, 3), baskets):
+            restaurant.get_customer(ids[number]).place_order(restaurant, basket)
+    storage.flush()
+    rates["orders"] = orders / (time.perf_counter() - start)
+
+    lookups = picks(customers, orders, 4)
+    start = time.perf_counter()
+    for number in lookups:
+        restaurant.get_customer(ids[number]).check_balance()
+    rates["lookups"] = len(lookups) / (time.perf_counter() - start)
+    rates["liabilities"] = restaurant.total_liabilities()
+    hits = getattr(restaurant.customers, "hits", None)
+    if hits is not None:
+        rates["hit_rate"] = hits / (hits + restaurant.customers.misses)
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--cache-size", type=int, default=2_000,
+                        help="customers the SQLite backend keeps built")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 1000],
+                        help="writes per SQLite transaction, one run each")
+    args = parser.parse_args(argv)
+
+    print(f"customers={args.customers:,} orders={args.orders:,} cache={args.cache_size:,}")
+    print(f"{'backend':16}{'register/s':>12}{'orders/s':>12}{'lookups/s':>12}{'hit rate':>10}"
+          f"{'file MiB':>10}{'reopen s':>10}")
+    memory = run(MemoryBackend(), args.customers, args.orders)
+    print(f"{'memory':16}{memory['register']:12,.0f}{memory['orders']:12,.0f}{memory['lookups']:12,.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in args.batch_size:
+            path = os.path.join(directory, f"batch{batch_size}.db")
+            storage = SQLiteBackend(path, args.cache_size, batch_size)
+            rates = run(storage, args.customers, args.orders)
+            assert rates["liabilities"] == memory["liabilities"], (rates["liabilities"], memory["liabilities"])
+            storage.close()
+            start = time.perf_counter()
+            reopened = Restaurant("Storage", storage=SQLiteBackend(path, args.cache_size, batch_size))
+            reopen = time.perf_counter() - start
+            assert reopened.total_liabilities() == memory["liabilities"]
+            reopened.storage.close()
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                       if name.startswith(f"batch{batch_size}.db"))
+            print(f"{f'sqlite batch {batch_size}':16}{rates['register']:12,.0f}{rates['orders']:12,.0f}"
+                  f"{rates['lookups']:12,.0f}{rates['hit_rate']:10.1%}{size / 2 ** 20:10.1f}{reopen:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Check that the memory and SQLite storage backends end up holding the same restaurant.
+
+Plays one seeded scenario, menu changes, deposits, orders that succeed
+and fail, bulk orders, backdated orders and customer removals, on a
+MemoryBackend and on a file-backed SQLiteBackend with a small cache and
+batch, then reopens the file. Compares the menu, every customer's
+balance, ledger and order history, the liabilities ledger and the
+restaurant's orders by time across all three. Times and IDs are drawn
+afresh in each run, so the memory run is compared by what happened and
+in which order; the reopened file must match the SQLite run exactly.
+Run from the repository root:
+
+    python -m benchmarks.storage_parity --customers 200 --orders 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from restro.money import Money
+from restro.restaurant import Restaurant
+from restro.storage import MemoryBackend, SQLiteBackend
+
+
+def play(restaurant: Restaurant, customers: int, orders: int, seed: int):
+    """Play the scenario on a new restaurant."""
+    rng = random.Random(seed)
+    # Index orders by time from the start, so the memory backend keeps orders
+    # placed at one moment in the order they were placed, as SQLite does
+    restaurant.orders_between()
+    for n in range(12):
+        restaurant.add_menu_item(f"Item {n}", rng.randint(100, 2000) / 100, "Drink" if n % 4 == 0 else "Food")
+    people = []
+    for n in range(customers):
+        customer = restaurant.add_customer(f"Customer {n}", f"c{n}@example.com", f"{n} Street")
+        # Some customers can only afford a little, so some orders fail
+        customer.add_funds(rng.choice([5, 50, 5000]))
+        people.append(customer)
+    renamed = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(orders):
+            names = [item.name for item in restaurant.menu]
+            basket = [name if rng.random() < 0.7 else [name, rng.randint(2, 5)]
+                      for name in rng.sample(names, rng.randint(1, 3))]
+            customer = rng.choice(people)
+            customer.place_order(restaurant, basket)
+            if n % 97 == 0:
+                customer.add_funds(rng.randint(1, 100))
+            if n % 250 == 0:
+                item = rng.choice(names)
+                restaurant.update_menu_item_price(item, rng.randint(100, 2000) / 100)
+            if n % 600 == 300:
+                restaurant.rename_menu_item(rng.choice(names), f"Renamed {renamed}")
+                renamed += 1
+            if n % 900 == 450 and len(names) > 4:
+                restaurant.remove_menu_item(rng.choice(names))
+                restaurant.add_menu_item(f"New {n}", rng.randint(100, 2000) / 100)
+        names = [item.name for item in restaurant.menu]
+        restaurant.place_orders_bulk([
+            (rng.choice(people).customer_id, rng.sample(names, rng.randint(1, 3))) for _ in range(orders // 10)
+        ])
+    # Backdated orders, each at a moment of its own, land inside the histories
+    start = time.time() - 30 * 86400
+    for n in range(orders // 20):
+        customer = rng.choice(people)
+        items = rng.sample(list(restaurant.menu), rng.randint(1, 3))
+        customer._record_order(items, Money(sum(item.price.cents for item in items)), start + n * 60.5)
+    for customer in rng.sample(people, max(1, customers // 20)):
+        restaurant.remove_customer(customer.customer_id)
+
+
+def state(restaurant: Restaurant, exact: bool) -> dict:
+    """Describe everything a restaurant holds, part by part.
+
+    Args:
+        restaurant: The restaurant
+        exact: Whether to include times and IDs, which differ between
+            two runs of the scenario
+
+    Returns:
+        Each part's description, by name
+    """
+    def order(order):
+        lines = [(item.name, item.price.cents, item.category, quantity) for item, quantity in order.lines]
+        described = (order.customer_id, order.menu_version, order.total_price.cents, lines)
+        return described + (order.id, order._created) if exact else described
+
+    def ledger(ledger, positions):
+        times, amounts, kinds, references, balances = ledger.columns()
+        if exact:
+            return list(zip(times, amounts, kinds, references, balances))
+        # References point at orders; compare them by the order's place in the history
+        return list(zip(amounts, kinds, (positions.get(reference) for reference in references), balances))
+
+    parts = {
+        "menu": (restaurant.menu.version,
+                 [(item.name, item.price.cents, item.category) for item in restaurant.menu]),
+        "next customer ID": restaurant.next_customer_id,
+        "liabilities": restaurant.total_liabilities().cents,
+        "liabilities ledger": ledger(restaurant._liabilities, {}),
+        "customers": [],
+        "orders by time": [order(found) for found in restaurant.orders_between()],
+        "newest orders": [],
+    }
+    for customer in restaurant.iter_customers():
+        positions = {found.id: position for position, found in enumerate(customer.orders)}
+        parts["customers"].append((
+            customer.customer_id, customer.name, customer.email, customer.address, customer.balance.cents,
+            ledger(customer.ledger, positions), [order(found) for found in customer.orders],
+        ))
+    cursor = None
+    while True:
+        page, cursor = restaurant.order_page(cursor, 37)
+        parts["newest orders"].append([order(found) for found in page])
+        if cursor is None:
+            break
+    return parts
+
+
+def compare(name: str, actual: dict, expected: dict):
+    """Fail on the first part that differs from what was expected."""
+    for part, value in expected.items():
+        assert actual[part] == value, f"{name}: {part} differs"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=5_000)
+    parser.add_argument("--cache-size", type=int, default=16,
+                        help="customers the SQLite backend keeps built, small to evict often")
+    parser.add_argument("--batch-size", type=int, default=7, help="writes per SQLite transaction")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    memory = Restaurant("Parity", storage=MemoryBackend())
+    play(memory, args.customers, args.orders, args.seed)
+    expected = state(memory, exact=False)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "parity.db")
+        sqlite = Restaurant("Parity", storage=SQLiteBackend(path, args.cache_size, args.batch_size))
+        play(sqlite, args.customers, args.orders, args.seed)
+        compare("sqlite", state(sqlite, exact=False), expected)
+        stored = state(sqlite, exact=True)
+        sqlite.storage.close()
+
+        reopened = Restaurant("Parity", storage=SQLiteBackend(path, args.cache_size, args.batch_size))
+        compare("reopened sqlite", state(reopened, exact=False), expected)
+        compare("reopened sqlite", state(reopened, exact=True), stored)
+        reopened.storage.close()
+
+    customers = len(expected["customers"])
+    orders = len(expected["orders by time"])
+    print(f"{customers:,} customers, {orders:,} orders, menu version {expected['menu'][0]}")
+    print("memory, sqlite and the reopened sqlite file hold the same restaurant")
+
+
+if __name__ == "__main__":
+    main()
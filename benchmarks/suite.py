@@ -0,0 +1,412 @@
+"""
+Hot-path benchmark suite for the restaurant management system.
+
+Each scenario builds a Restaurant at a given scale, times an operation over
+several repeats and records the median time per operation, and the best
+repeat relative to a calibration loop timed alongside it. A separate,
+untimed pass under tracemalloc records the scenario's peak memory.
+
+Run from the repository root:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --menu-sizes 10 100000 --customers 1000000
+    python -m benchmarks --output new.json --compare results.json --threshold 0.15
+
+With --compare, scenarios whose best calibrated time is slower than the
+baseline's by more than the threshold are measured again, up to
+--retries times, and any still slower are flagged and the exit status
+is 1.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from restro.interface import Interface
+from restro.restaurant import Restaurant
+
+# Calibration workload: loop iterations per run, and runs of which the best counts
+CALIBRATION_LOOPS = 20_000
+CALIBRATION_RUNS = 5
+
+
+class Scenario:
+    """One benchmarked operation at one scale."""
+
+    def __init__(self, name: str, params: Dict[str, int], setup: Callable[[], Any],
+                 run: Callable[[Any], int]):
+        """Initialize a scenario.
+
+        Args:
+            name: Name of the operation
+            params: Scale parameters, part of the result key
+            setup: Builds fresh state for one repeat
+            run: Performs the timed work on that state, returning the
+                number of operations performed
+        """
+        self.name = name
+        self.params = params
+        self.setup = setup
+        self.run = run
+
+    @property
+    def key(self) -> str:
+        """Identifier used to match results against a baseline."""
+        scale = ",".join(f"{name}={value}" for name, value in sorted(self.params.items()))
+        return f"{self.name}[{scale}]"
+
+
+def build_restaurant(menu_size: int, customers: int, orders_per_customer: int = 0,
+                     seed: int = 0) -> Restaurant:
+    """Create a restaurant with a synthetic menu and funded customers."""
+    rng = random.Random(seed)
+    restaurant = Restaurant("Benchmark")
+    for i in range(menu_size):
+        category = "Drink" if i % 4 == 0 else "Food"
+        restaurant.add_menu_item(f"Item {i}", round(rng.uniform(1, 30), 2), category)
+    names = [item.name for item in restaurant.get_menu()]
+    for i in range(customers):
+        customer = restaurant.add_customer(f"Customer {i}", f"c{i}@example.com", "Street")
+        customer.add_funds(1_000_000.0)
+        for _ in range(orders_per_customer):
+            customer.place_order(restaurant, rng.sample(names, min(3, len(names))))
+    return restaurant
+
+
+def scenarios(menu_sizes: List[int], customer_counts: List[int], ops: int) -> List[Scenario]:
+    """Build the scenario list for the requested scales."""
+    found: List[Scenario] = []
+    small_customers = min(customer_counts)
+    for menu_size in menu_sizes:
+        found.extend(menu_scenarios(menu_size, ops))
+        for customers in customer_counts:
+            found.append(place_order_scenario(menu_size, customers, ops))
+            found.append(place_orders_bulk_scenario(menu_size, customers, ops))
+    for customers in customer_counts:
+        found.append(add_customer_scenario(customers, ops))
+        found.append(get_customers_scenario(customers, ops))
+        found.append(search_customers_scenario(customers, ops))
+        found.append(customer_page_scenario(customers, ops))
+    found.append(order_str_scenario(min(menu_sizes), small_customers, ops))
+    return found
+
+
+def place_order_scenario(menu_size: int, customers: int, ops: int) -> Scenario:
+    """Customer.place_order with three items per order."""
+    def setup():
+        restaurant = build_restaurant(menu_size, customers)
+        rng = random.Random(1)
+        names = [item.name for item in restaurant.get_menu()]
+        ids = list(restaurant.customers)
+        plan = [(restaurant.get_customer(rng.choice(ids)), rng.choices(names, k=3)) for _ in range(ops)]
+        return restaurant, plan
+
+    def run(state):
+        restaurant, plan = state
+        for customer, item_names in plan:
+            customer.place_order(restaurant, item_names)
+        return len(plan)
+
+    return Scenario("place_order", {"menu": menu_size, "customers": customers}, setup, run)
+
+
+def place_orders_bulk_scenario(menu_size: int, customers: int, ops: int) -> Scenario:
+    """Restaurant.place_orders_bulk over the same kind of orders as place_order."""
+    def setup():
+        restaurant = build_restaurant(menu_size, customers)
+        rng = random.Random(1)
+        names = [item.name for item in restaurant.get_menu()]
+        ids = list(restaurant.customers)
+        return restaurant, [(rng.choice(ids), rng.choices(names, k=3)) for _ in range(ops)]
+
+    def run(state):
+        restaurant, batch = state
+        restaurant.place_orders_bulk(batch)
+        return len(batch)
+
+    return Scenario("place_orders_bulk", {"menu": menu_size, "customers": customers}, setup, run)
+
+
+def menu_scenarios(menu_size: int, ops: int) -> List[Scenario]:
+    """remove_menu_item, update_menu_item_price and Interface.view_menu."""
+    count = min(ops, menu_size)
+
+    def setup():
+        restaurant = build_restaurant(menu_size, 0)
+        names = [item.name for item in restaurant.get_menu()]
+        return restaurant, random.Random(2).sample(names, count)
+
+    def remove(state):
+        restaurant, names = state
+        for name in names:
+            restaurant.remove_menu_item(name)
+        return len(names)
+
+    def update(state):
+        restaurant, names = state
+        for n, name in enumerate(names):
+            restaurant.update_menu_item_price(name, 1.0 + n % 10)
+        return len(names)
+
+    def view_setup():
+        interface = Interface(build_restaurant(menu_size, 0))
+        return interface
+
+    def view(interface):
+        # The text is kept with the menu version, so only the first view renders it
+        with contextlib.redirect_stdout(io.StringIO()):
+            interface.view_menu()
+        return 1
+
+    params = {"menu": menu_size}
+    return [
+        Scenario("remove_menu_item", params, setup, remove),
+        Scenario("update_menu_item_price", params, setup, update),
+        Scenario("view_menu", params, view_setup, view),
+    ]
+
+
+def add_customer_scenario(customers: int, ops: int) -> Scenario:
+    """Restaurant.add_customer on top of an existing customer base."""
+    def setup():
+        return build_restaurant(10, customers)
+
+    def run(restaurant):
+        for i in range(ops):
+            restaurant.add_customer(f"New {i}", f"new{i}@example.com", "Street")
+        return ops
+
+    return Scenario("add_customer", {"customers": customers}, setup, run)
+
+
+def get_customers_scenario(customers: int, ops: int) -> Scenario:
+    """Restaurant.get_customers listing every customer, several times over a small base."""
+    # A single listing of a small customer base is too short to time reliably
+    calls = max(1, min(ops, ops * 10 // max(customers, 1)))
+
+    def run(restaurant):
+        for _ in range(calls):
+            restaurant.get_customers()
+        return calls
+
+    return Scenario("get_customers", {"customers": customers}, lambda: build_restaurant(10, customers), run)
+
+
+def search_customers_scenario(customers: int, ops: int) -> Scenario:
+    """Restaurant.find_customer_by_email and find_customers_by_name, alternating."""
+    def setup():
+        restaurant = build_restaurant(10, customers)
+        rng = random.Random(1)
+        return restaurant, [rng.randrange(customers) for _ in range(ops)]
+
+    def run(state):
+        restaurant, picks = state
+        for n, pick in enumerate(picks):
+            if n % 2:
+                restaurant.find_customers_by_name(f"Customer {pick}", 10)
+            else:
+                restaurant.find_customer_by_email(f"C{pick}@Example.com")
+        return len(picks)
+
+    return Scenario("search_customers", {"customers": customers}, setup, run)
+
+
+def customer_page_scenario(customers: int, ops: int) -> Scenario:
+    """Restaurant.customer_page, fetching pages of 50 from random cursors."""
+    def setup():
+        restaurant = build_restaurant(10, customers)
+        rng = random.Random(1)
+        ids = list(restaurant.customers)
+        return restaurant, [rng.choice(ids) for _ in range(ops)]
+
+    def run(state):
+        restaurant, cursors = state
+        for cursor in cursors:
+            restaurant.customer_page(cursor, 50)
+        return len(cursors)
+
+    return Scenario("customer_page", {"customers": customers}, setup, run)
+
+
+def order_str_scenario(menu_size: int, customers: int, ops: int) -> Scenario:
+    """Order.__str__ over existing orders."""
+    def setup():
+        restaurant = build_restaurant(max(menu_size, 3), customers, orders_per_customer=1)
+        orders = [order for customer in restaurant.get_customers() for order in customer.orders]
+        return restaurant, (orders * (ops // max(len(orders), 1) + 1))[:ops]
+
+    def run(state):
+        _, orders = state
+        for order in orders:
+            str(order)
+        return len(orders)
+
+    return Scenario("order_str", {"customers": customers}, setup, run)
+
+
+def calibrate() -> float:
+    """Time a fixed pure-Python workload, the best of a few runs, as a measure of machine speed."""
+    best = float("inf")
+    for _ in range(CALIBRATION_RUNS):
+        start = time.perf_counter()
+        total = 0
+        for n in range(CALIBRATION_LOOPS):
+            total += n * n
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(scenario: Scenario, repeats: int) -> Dict[str, Any]:
+    """Time a scenario and record its peak memory.
+
+    Each repeat is timed next to a calibration run, so a scenario can
+    also be compared in units of the machine's speed at the time.
+    """
+    timings = []
+    calibrated = []
+    ops = 0
+    for _ in range(repeats):
+        state = scenario.setup()
+        gc.collect()
+        speed = calibrate()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ops = scenario.run(state)
+            elapsed = time.perf_counter() - start
+        timings.append(elapsed / max(ops, 1))
+        calibrated.append(timings[-1] / speed)
+        del state
+
+    gc.collect()
+    tracemalloc.start()
+    state = scenario.setup()
+    with contextlib.redirect_stdout(io.StringIO()):
+        scenario.run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del state
+
+    return {
+        "key": scenario.key,
+        "name": scenario.name,
+        "params": scenario.params,
+        "ops": ops,
+        "seconds_per_op": statistics.median(timings),
+        "best_seconds_per_op": min(timings),
+        "best_calibrated_per_op": min(calibrated),
+        "peak_bytes": peak,
+    }
+
+
+def merge(result: Dict[str, Any], again: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two measurements of one scenario, keeping the faster of each figure."""
+    merged = dict(result)
+    for field in ("seconds_per_op", "best_seconds_per_op", "best_calibrated_per_op"):
+        merged[field] = min(result[field], again[field])
+    merged["peak_bytes"] = max(result["peak_bytes"], again["peak_bytes"])
+    return merged
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> Dict[str, str]:
+    """Describe every scenario slower than its baseline by more than threshold.
+
+    Scenarios are compared by their best repeat in calibrated units,
+    which machine load and clock changes between the two runs affect far
+    less than the median in seconds; a baseline without them is compared
+    by median seconds.
+
+    Returns:
+        A line for each slower scenario, by scenario key
+    """
+    previous = {result["key"]: result for result in baseline["results"]}
+    slowdowns = {}
+    for result in results:
+        before = previous.get(result["key"])
+        if before is None:
+            continue
+        if "best_calibrated_per_op" in before:
+            old, new, unit = before["best_calibrated_per_op"], result["best_calibrated_per_op"], "calibrated/op"
+        else:
+            old, new, unit = before["seconds_per_op"] * 1e6, result["seconds_per_op"] * 1e6, "us/op"
+        ratio = new / old
+        if ratio > 1 + threshold:
+            slowdowns[result["key"]] = f"SLOWER {result['key']}: {old:.4g} -> {new:.4g} {unit} ({ratio:.2f}x)"
+    return slowdowns
+
+
+def main(argv: Optional[List[str]] = None):
+    """Parse arguments, run the suite and optionally compare with a baseline."""
+    parser = argparse.ArgumentParser(description="Restaurant hot-path benchmark suite")
+    parser.add_argument("--menu-sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--customers", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--ops", type=int, default=2_000, help="operations per timed run")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these scenario names")
+    parser.add_argument("--output", default="bench_results.json", help="where to write results")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default: 0.10)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="times to measure a scenario again when it looks slower than the baseline")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = []
+    run = [scenario for scenario in scenarios(args.menu_sizes, args.customers, args.ops)
+           if not args.only or scenario.name in args.only]
+    for scenario in run:
+        result = measure(scenario, args.repeats)
+        results.append(result)
+        print(f"{result['key']:<55} {result['seconds_per_op'] * 1e6:12.2f} us/op"
+              f"  peak {result['peak_bytes'] / 2**20:9.1f} MiB", flush=True)
+
+    slowdowns: Dict[str, str] = {}
+    if baseline is not None:
+        slowdowns = compare(results, baseline, args.threshold)
+        # Load on the machine only ever slows a run down, so a scenario
+        # that is really slower stays slower however often it is measured
+        for _ in range(args.retries):
+            if not slowdowns:
+                break
+            for position, scenario in enumerate(run):
+                if scenario.key in slowdowns:
+                    print(f"measuring {scenario.key} again", flush=True)
+                    results[position] = merge(results[position], measure(scenario, args.repeats))
+            slowdowns = compare(results, baseline, args.threshold)
+
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ops": args.ops,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        for line in slowdowns.values():
+            print(line)
+        if slowdowns:
+            sys.exit(1)
+        print(f"No slowdowns beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
 """
 Package initialization file for the restaurant management system.
 """
-from .models import MenuItem, Order
+from .models import MenuItem, Order, OrderResult
 from .customer import Customer
 from .admin import Admin
 from .restaurant import Restaurant
 from .interface import Interface
+from .ids import SnowflakeIdGenerator
 
 __all__ = [
     'MenuItem',
     'Order',
+    'OrderResult',
     'Customer',
     'Admin',
     'Restaurant',
-    'Interface'
+    'Interface',
+    'SnowflakeIdGenerator'
 ]
@@ -1,9 +1,12 @@
 """
 Module containing the Admin class for the restaurant management system.
 """
-from typing import List, Optional
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
 from .models import MenuItem
+from .money import Money
 from .customer import Customer
+from .analytics import get_analytics
 
 
 class Admin:
@@ -44,6 +47,36 @@ class Admin:
         """
         return restaurant.get_customers()
     
+    def view_customers_page(self, restaurant, after: Optional[str] = None,
+                            limit: int = 50) -> Tuple[List[Customer], Optional[str]]:
+        """View one page of customer accounts, in registration order.
+        
+        Args:
+            restaurant: The restaurant object
+            after: Cursor returned with the previous page, or None for
+                the first page
+            limit: Most customers on the page
+            
+        Returns:
+            The customers, and the cursor of the next page, None after
+            the last page
+        """
+        return restaurant.customer_page(after, limit)
+    
+    def search_customers(self, restaurant, query: str, limit: int = 10) -> List[Customer]:
+        """Find customer accounts by email, or by the start of their name.
+        
+        Args:
+            restaurant: The restaurant object
+            query: An email, matched exactly but ignoring case, or else
+                the start of a name
+            limit: Most customers to return
+            
+        Returns:
+            Matching customers
+        """
+        return restaurant.search_customers(query, limit)
+    
     def remove_customer(self, restaurant, customer_id: str) -> bool:
         """Remove a customer account.
         
@@ -56,7 +89,7 @@ class Admin:
         """
         return restaurant.remove_customer(customer_id)
     
-    def add_menu_item(self, restaurant, name: str, price: float, category: str = "Food") -> MenuItem:
+    def add_menu_item(self, restaurant, name: str, price: Union[Money, float], category: str = "Food") -> MenuItem:
         """Add a new item to the menu.
         
         Args:
@@ -82,7 +115,7 @@ class Admin:
         """
         return restaurant.remove_menu_item(item_name)
     
-    def update_menu_item_price(self, restaurant, item_name: str, new_price: float) -> bool:
+    def update_menu_item_price(self, restaurant, item_name: str, new_price: Union[Money, float]) -> bool:
         """Update the price of a menu item.
         
         Args:
@@ -94,3 +127,45 @@ class Admin:
             True if successful, False otherwise
         """
         return restaurant.update_menu_item_price(item_name, new_price)
+    
+    def rename_menu_item(self, restaurant, item_name: str, new_name: str) -> bool:
+        """Rename a menu item.
+        
+        Args:
+            restaurant: The restaurant object
+            item_name: Current name of the item
+            new_name: New name for the item
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return restaurant.rename_menu_item(item_name, new_name)
+    
+    def revenue_by_category(self, restaurant, start: Optional[date] = None,
+                            end: Optional[date] = None) -> Dict[str, Money]:
+        """Report revenue per category.
+        
+        Args:
+            restaurant: The restaurant object
+            start: First day to include, all time if not given
+            end: Last day to include, defaults to `start`
+            
+        Returns:
+            Revenue keyed by category
+        """
+        return get_analytics(restaurant).revenue_by_category(start, end)
+    
+    def top_selling_items(self, restaurant, n: int = 10, start: Optional[date] = None,
+                          end: Optional[date] = None) -> List[Tuple[MenuItem, int, Money]]:
+        """Report the best-selling menu items by units sold.
+        
+        Args:
+            restaurant: The restaurant object
+            n: Number of items to report
+            start: First day to include, all time if not given
+            end: Last day to include, defaults to `start`
+            
+        Returns:
+            (item, units, revenue) for up to n items, best seller first
+        """
+        return get_analytics(restaurant).top_items(n, start, end)
@@ -0,0 +1,234 @@
+"""
+Module containing the sales analytics for the restaurant management system.
+
+Running totals of revenue and units sold are updated as each order is
+placed, per menu item, per category, per hour and per day, so reports
+never scan order history. Revenue is totalled in integer cents and
+reported as Money. Every version of an item, as made by price
+changes and renames, counts as the same item and is reported as the
+newest version sold. Days are local calendar days; hours are clock
+hours since the Unix epoch.
+"""
+import heapq
+import threading
+from contextlib import ExitStack
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .locks import NO_LOCK
+from .models import MenuItem, Order
+from .money import Money
+
+
+def _add(table: dict, key, revenue: int, units: int):
+    """Add a sale to the [revenue in cents, units] totals kept under a key."""
+    totals = table.get(key)
+    if totals is None:
+        table[key] = [revenue, units]
+    else:
+        totals[0] += revenue
+        totals[1] += units
+
+
+class SalesAnalytics:
+    """Running sales aggregates, updated once per placed order."""
+
+    def __init__(self, thread_safe: bool = False):
+        """Initialize empty aggregates.
+
+        Args:
+            thread_safe: Whether orders will be recorded from several threads
+        """
+        self._lock = threading.Lock() if thread_safe else NO_LOCK
+        # [revenue in cents, units] by item SKU, category and hour number
+        self._items: Dict[int, list] = {}
+        self._categories: Dict[str, list] = {}
+        self._hours: Dict[int, list] = {}
+        # Per-day breakdowns by date ordinal
+        self._day_items: Dict[int, Dict[int, list]] = {}
+        # Newest version sold of each item, by SKU
+        self._latest: Dict[int, MenuItem] = {}
+        self._day_categories: Dict[int, Dict[str, list]] = {}
+        # (-units, sku) entries; stale entries are dropped when queried
+        self._best_sellers: List[Tuple[int, int]] = []
+        # Bounds of the last day resolved, since orders arrive mostly in time order
+        self._day = 0
+        self._day_start = self._day_end = 0.0
+
+    def record_order(self, order: Order):
+        """Add a placed order to the aggregates.
+
+        Args:
+            order: The order that was placed
+        """
+        timestamp = order._created
+        hour = int(timestamp // 3600)
+        with self._lock:
+            day = self._day_of(timestamp)
+            day_items = self._day_items.get(day)
+            if day_items is None:
+                day_items = self._day_items[day] = {}
+                self._day_categories[day] = {}
+            day_categories = self._day_categories[day]
+
+            order_revenue = 0
+            order_units = 0
+            for item, quantity, price in order._iter_lines():
+                revenue = price * quantity
+                sku = item.sku
+                category = item.category
+                latest = self._latest.get(sku)
+                if latest is None or latest.item_id < item.item_id:
+                    self._latest[sku] = item
+                _add(self._items, sku, revenue, quantity)
+                _add(self._categories, category, revenue, quantity)
+                _add(day_items, sku, revenue, quantity)
+                _add(day_categories, category, revenue, quantity)
+                heapq.heappush(self._best_sellers, (-self._items[sku][1], sku))
+                order_revenue += revenue
+                order_units += quantity
+            _add(self._hours, hour, order_revenue, order_units)
+
+            if len(self._best_sellers) > 2 * len(self._items) + 64:
+                self._best_sellers = [(-totals[1], sku) for sku, totals in self._items.items()]
+                heapq.heapify(self._best_sellers)
+
+    def _day_of(self, timestamp: float) -> int:
+        """Get the date ordinal of the local day containing a timestamp."""
+        if not self._day_start <= timestamp < self._day_end:
+            day = date.fromtimestamp(timestamp)
+            self._day = day.toordinal()
+            self._day_start = datetime.combine(day, time.min).timestamp()
+            self._day_end = datetime.combine(day + timedelta(days=1), time.min).timestamp()
+        return self._day
+
+    def _days(self, start: date, end: date) -> Iterator[int]:
+        """Yield the ordinals of days with sales between two dates, inclusive."""
+        for day in range(start.toordinal(), end.toordinal() + 1):
+            if day in self._day_items:
+                yield day
+
+    def item_sales(self, item: MenuItem) -> Tuple[Money, int]:
+        """Get the all-time (revenue, units) of a menu item, over all its versions."""
+        with self._lock:
+            revenue, units = self._items.get(item.sku, (0, 0))
+            return Money(revenue), units
+
+    def revenue_by_category(self, start: Optional[date] = None,
+                            end: Optional[date] = None) -> Dict[str, Money]:
+        """Get revenue per category.
+
+        Args:
+            start: First day to include, all time if not given
+            end: Last day to include, defaults to `start`
+
+        Returns:
+            Revenue keyed by category
+        """
+        with self._lock:
+            if start is None:
+                return {category: Money(totals[0]) for category, totals in self._categories.items()}
+            revenue: Dict[str, int] = {}
+            for day in self._days(start, end or start):
+                for category, totals in self._day_categories[day].items():
+                    revenue[category] = revenue.get(category, 0) + totals[0]
+            return {category: Money(cents) for category, cents in revenue.items()}
+
+    def top_items(self, n: int = 10, start: Optional[date] = None,
+                  end: Optional[date] = None) -> List[Tuple[MenuItem, int, Money]]:
+        """Get the best-selling items by units sold.
+
+        Args:
+            n: Number of items to return
+            start: First day to include, all time if not given
+            end: Last day to include, defaults to `start`
+
+        Returns:
+            (item, units, revenue) for up to n items, best seller first
+        """
+        with self._lock:
+            if start is None:
+                return [
+                    (self._item(sku), units, Money(self._items[sku][0]))
+                    for units, sku in self._top_all_time(n)
+                ]
+            sales: Dict[int, list] = {}
+            for day in self._days(start, end or start):
+                for sku, (revenue, units) in self._day_items[day].items():
+                    _add(sales, sku, revenue, units)
+            best = heapq.nsmallest(n, sales.items(), key=lambda entry: (-entry[1][1], entry[0]))
+            return [(self._item(sku), units, Money(revenue)) for sku, (revenue, units) in best]
+
+    def _item(self, sku: int) -> MenuItem:
+        """Get the newest version sold of an item."""
+        return self._latest[sku]
+
+    def _top_all_time(self, n: int) -> List[Tuple[int, int]]:
+        """Pop the n best (units, sku) off the heap and push them back."""
+        best = []
+        while self._best_sellers and len(best) < n:
+            negative_units, sku = heapq.heappop(self._best_sellers)
+            # Units only grow, so the current entry of an item surfaces first
+            # and any later entry for it is stale
+            if self._items[sku][1] == -negative_units and all(sku != seen for _, seen in best):
+                best.append((-negative_units, sku))
+        for units, sku in best:
+            heapq.heappush(self._best_sellers, (-units, sku))
+        return best
+
+    def revenue_by_hour(self, day: date) -> Dict[datetime, Money]:
+        """Get the revenue of each hour with sales on a day.
+
+        Args:
+            day: The local day
+
+        Returns:
+            Revenue keyed by the start of each hour
+        """
+        first = int(datetime.combine(day, time.min).timestamp() // 3600)
+        last = int(datetime.combine(day + timedelta(days=1), time.min).timestamp() // 3600)
+        with self._lock:
+            return {
+                datetime.fromtimestamp(hour * 3600): Money(self._hours[hour][0])
+                for hour in range(first, last)
+                if hour in self._hours
+            }
+
+    def total_revenue(self) -> Money:
+        """Get the all-time revenue."""
+        with self._lock:
+            return Money(sum(totals[0] for totals in self._categories.values()))
+
+
+def this_week() -> Tuple[date, date]:
+    """Get the (Monday, today) range of the current week."""
+    today = date.today()
+    return today - timedelta(days=today.weekday()), today
+
+
+def get_analytics(restaurant) -> SalesAnalytics:
+    """Get the analytics attached to a restaurant, attaching them on first use.
+
+    Attaching scans the orders already placed once; every later order is
+    recorded as it is placed.
+
+    Args:
+        restaurant: The restaurant object
+
+    Returns:
+        The attached SalesAnalytics
+    """
+    # Orders are recorded under their customer's lock, so holding every
+    # customer's lock keeps any from slipping between the scan and the
+    # attachment; the registration lock holds the set of customers steady
+    with restaurant._customers_lock, ExitStack() as held:
+        if restaurant.analytics is None:
+            customers = restaurant.get_customers()
+            for customer in customers:
+                held.enter_context(customer._lock)
+            analytics = SalesAnalytics(restaurant.thread_safe)
+            for customer in customers:
+                for order in customer.orders:
+                    analytics.record_order(order)
+            restaurant.analytics = analytics
+        return restaurant.analytics
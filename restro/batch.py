@@ -0,0 +1,322 @@
+"""
+Module containing the non-interactive batch mode for the restaurant management system.
+
+A batch script holds one command per line as a JSON array of the command
+name and its arguments; blank lines and lines starting with # are skipped:
+
+    ["admin_login", "admin", "admin123"]
+    ["add_menu_item", "Burger", 5.99, "Food"]
+    ["register_customer", "Ada", "ada@example.com", "1 Main St"]
+    ["add_funds", "C0001", 20]
+    ["place_order", "C0001", "Burger", "Burger", ["Tea", 3]]
+
+Commands mirror the interactive menus. Admin commands need a successful
+admin_login earlier in the script; customer commands name the customer.
+Each command produces one JSON line:
+
+    {"line": 5, "command": "place_order", "ok": true, "result": {...}}
+    {"line": 6, "command": "add_funds", "ok": false, "error": "..."}
+
+Nothing is prompted or drawn, output is written in blocks, and runs of
+consecutive place_order commands are placed with one bulk call.
+"""
+import inspect
+import json
+import sys
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, TextIO, Tuple
+
+from .admin import Admin
+from .analytics import this_week
+from .models import ORDER_OK, ORDER_CUSTOMER_NOT_FOUND, ORDER_ITEM_NOT_FOUND, order_quantities
+from .money import Money, ZERO
+from .restaurant import Restaurant
+from .service import customer_to_dict, item_to_dict, order_to_dict
+
+# Output lines gathered before each write
+BLOCK_SIZE = 4096
+
+# One shared encoder; json.dumps builds a new one per call for non-default options
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class CommandError(Exception):
+    """A command that could not be carried out."""
+
+
+class BatchRunner:
+    """Runs batch scripts against a restaurant."""
+
+    def __init__(self, restaurant: Restaurant, admin: Optional[Admin] = None,
+                 output: Optional[TextIO] = None, block_size: int = BLOCK_SIZE):
+        """Initialize a runner.
+
+        Args:
+            restaurant: The restaurant to operate on
+            admin: Credentials admin_login checks, the interface's by default
+            output: Stream receiving the JSON lines, stdout by default
+            block_size: Number of output lines gathered per write
+        """
+        self.restaurant = restaurant
+        self.admin = admin if admin is not None else Admin("admin", "admin123")
+        self.output = output if output is not None else sys.stdout
+        self.block_size = block_size
+        self.logged_in = False
+        self.succeeded = 0
+        self.failed = 0
+        self._block: List[str] = []
+        # (line number, customer ID, item names) awaiting one bulk placement
+        self._orders: List[Tuple[int, str, List[str]]] = []
+        self._commands: Dict[str, Callable[..., Any]] = {
+            "admin_login": self.admin_login,
+            "add_menu_item": self.add_menu_item,
+            "remove_menu_item": self.remove_menu_item,
+            "update_menu_item_price": self.update_menu_item_price,
+            "view_menu": self.view_menu,
+            "view_customers": self.view_customers,
+            "remove_customer": self.remove_customer,
+            "search_customers": self.search_customers,
+            "sales_report": self.sales_report,
+            "register_customer": self.register_customer,
+            "view_orders": self.view_orders,
+            "add_funds": self.add_funds,
+            "check_balance": self.check_balance,
+        }
+        # (fewest, most) arguments of each command
+        self._arity = {
+            name: (
+                sum(1 for p in inspect.signature(handler).parameters.values() if p.default is p.empty),
+                len(inspect.signature(handler).parameters),
+            )
+            for name, handler in self._commands.items()
+        }
+        self._admin_commands = {
+            "add_menu_item", "remove_menu_item", "update_menu_item_price",
+            "view_customers", "remove_customer", "search_customers", "sales_report",
+        }
+
+    def run(self, lines: Iterable[str]) -> Tuple[int, int]:
+        """Run a script.
+
+        Args:
+            lines: Lines of the script
+
+        Returns:
+            The numbers of commands that succeeded and failed
+        """
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                command = json.loads(line)
+            except ValueError:
+                self._flush_orders()
+                self._emit(number, None, False, "error", "Invalid JSON.")
+                continue
+            if not isinstance(command, list) or not command or not isinstance(command[0], str):
+                self._flush_orders()
+                self._emit(number, None, False, "error", "A command is a JSON array starting with its name.")
+                continue
+
+            name, args = command[0], command[1:]
+            if name == "place_order":
+                self._queue_order(number, args)
+                continue
+            self._flush_orders()
+            self._execute(number, name, args)
+        self._flush_orders()
+        self._write_block()
+        self.output.flush()
+        return self.succeeded, self.failed
+
+    def _execute(self, number: int, name: str, args: list):
+        """Run one command and emit its result."""
+        handler = self._commands.get(name)
+        try:
+            if handler is None:
+                raise CommandError(f"Unknown command '{name}'.")
+            if name in self._admin_commands and not self.logged_in:
+                raise CommandError("Admin login required.")
+            fewest, most = self._arity[name]
+            if not fewest <= len(args) <= most:
+                raise CommandError(f"'{name}' takes {fewest} to {most} arguments." if fewest != most
+                                   else f"'{name}' takes {fewest} arguments.")
+            result = handler(*args)
+        except CommandError as error:
+            self._emit(number, name, False, "error", str(error))
+        else:
+            self._emit(number, name, True, "result", result)
+
+    def _emit(self, number: int, name: Optional[str], ok: bool, key: str, value: Any):
+        """Add one result line to the output block."""
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self._block.append(_encode({"line": number, "command": name, "ok": ok, key: value}))
+        if len(self._block) >= self.block_size:
+            self._write_block()
+
+    def _write_block(self):
+        """Write the gathered output lines."""
+        if self._block:
+            self._block.append("")
+            self.output.write("\n".join(self._block))
+            self._block.clear()
+
+    def _queue_order(self, number: int, args: list):
+        """Hold a place_order command for the next bulk placement."""
+        try:
+            if len(args) < 2 or not isinstance(args[0], str):
+                raise ValueError("Expected a customer ID and item names.")
+            order_quantities(args[1:])
+        except ValueError as error:
+            self._flush_orders()
+            self._emit(number, "place_order", False, "error", str(error))
+            return
+        self._orders.append((number, args[0], args[1:]))
+        if len(self._orders) >= self.block_size:
+            self._flush_orders()
+
+    def _flush_orders(self):
+        """Place the held orders in one bulk call and emit their results in order."""
+        if not self._orders:
+            return
+        results = self.restaurant.place_orders_bulk(
+            (customer_id, item_names) for _, customer_id, item_names in self._orders
+        )
+        for (number, _, _), result in zip(self._orders, results):
+            if result.status == ORDER_OK:
+                self._emit(number, "place_order", True, "result", order_to_dict(result.order))
+            elif result.status == ORDER_ITEM_NOT_FOUND:
+                self._emit(number, "place_order", False, "error", f"Item '{result.item_name}' not found in menu.")
+            elif result.status == ORDER_CUSTOMER_NOT_FOUND:
+                self._emit(number, "place_order", False, "error", "Customer not found.")
+            else:
+                self._emit(number, "place_order", False, "error", "Insufficient balance.")
+        self._orders.clear()
+
+    def _customer(self, customer_id: str):
+        """Get a customer or fail the command."""
+        customer = self.restaurant.get_customer(_text(customer_id, "Customer ID"))
+        if customer is None:
+            raise CommandError("Customer not found.")
+        return customer
+
+    def admin_login(self, username: str, password: str) -> Dict[str, Any]:
+        """Check the admin's credentials for the rest of the script."""
+        if _text(username, "Username") != self.admin.username or password != self.admin.password:
+            raise CommandError("Invalid credentials. Access denied.")
+        self.logged_in = True
+        return {"admin": username}
+
+    def add_menu_item(self, name: str, price, category: str = "Food") -> Dict[str, Any]:
+        """Add a menu item, rejecting duplicates and non-positive prices."""
+        if self.restaurant.find_menu_item(_text(name, "Name")) is not None:
+            raise CommandError("An item with this name already exists.")
+        price = _positive(price, "Price")
+        category = _text(category, "Category") or "Food"
+        return item_to_dict(self.admin.add_menu_item(self.restaurant, name, price, category))
+
+    def remove_menu_item(self, name: str) -> Dict[str, Any]:
+        """Remove a menu item."""
+        if not self.admin.remove_menu_item(self.restaurant, _text(name, "Name")):
+            raise CommandError(f"Item '{name}' not found.")
+        return {"removed": name}
+
+    def update_menu_item_price(self, name: str, price) -> Dict[str, Any]:
+        """Update the price of a menu item."""
+        price = _positive(price, "Price")
+        if not self.admin.update_menu_item_price(self.restaurant, _text(name, "Name"), price):
+            raise CommandError(f"Item '{name}' not found.")
+        return item_to_dict(self.restaurant.find_menu_item(name))
+
+    def view_menu(self) -> List[Dict[str, Any]]:
+        """List the menu."""
+        return [item_to_dict(item) for item in self.restaurant.get_menu()]
+
+    def view_customers(self, after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """List every customer, or one page of them after a customer ID."""
+        if after is None and limit is None:
+            return [customer_to_dict(customer) for customer in self.restaurant.iter_customers()]
+        if after is not None:
+            _text(after, "Cursor")
+        customers, _ = self.admin.view_customers_page(self.restaurant, after, _count(limit, 50))
+        return [customer_to_dict(customer) for customer in customers]
+
+    def search_customers(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Find customers by email or by the start of their name."""
+        customers = self.admin.search_customers(self.restaurant, _text(query, "Query"), _count(limit, 10))
+        return [customer_to_dict(customer) for customer in customers]
+
+    def remove_customer(self, customer_id: str) -> Dict[str, Any]:
+        """Remove a customer account."""
+        if not self.admin.remove_customer(self.restaurant, _text(customer_id, "Customer ID")):
+            raise CommandError(f"Customer with ID '{customer_id}' not found.")
+        return {"removed": customer_id}
+
+    def sales_report(self) -> Dict[str, Any]:
+        """Report today's revenue by category and this week's best sellers."""
+        best = self.admin.top_selling_items(self.restaurant, 10, *this_week())
+        return {
+            "revenue_by_category": {
+                category: float(revenue)
+                for category, revenue in self.admin.revenue_by_category(self.restaurant, date.today()).items()
+            },
+            "top_items": [
+                {"name": item.name, "units": units, "revenue": float(revenue)} for item, units, revenue in best
+            ],
+        }
+
+    def register_customer(self, name: str, email: str, address: str) -> Dict[str, Any]:
+        """Register a new customer, rejecting emails already in use."""
+        customer = self.restaurant.add_customer(_text(name, "Name"), _text(email, "Email"), _text(address, "Address"))
+        if customer is None:
+            raise CommandError("A customer with this email is already registered.")
+        return customer_to_dict(customer)
+
+    def view_orders(self, customer_id: str) -> List[Dict[str, Any]]:
+        """List a customer's past orders."""
+        return [order_to_dict(order) for order in self._customer(customer_id).view_orders()]
+
+    def add_funds(self, customer_id: str, amount) -> Dict[str, Any]:
+        """Add funds to a customer's balance."""
+        customer = self._customer(customer_id)
+        return {"balance": float(customer.add_funds(_positive(amount, "Amount")))}
+
+    def check_balance(self, customer_id: str) -> Dict[str, Any]:
+        """Get a customer's balance."""
+        return {"balance": float(self._customer(customer_id).check_balance())}
+
+
+def _text(value, label: str) -> str:
+    """Reject arguments that should be strings but are not."""
+    if not isinstance(value, str):
+        raise CommandError(f"{label} must be a string.")
+    return value
+
+
+def _count(value, default: int) -> int:
+    """Reject limits that are not positive integers."""
+    if value is None:
+        return default
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise CommandError("Limit must be a positive integer.")
+    return value
+
+
+def _positive(value, label: str) -> Money:
+    """Convert an amount to Money, rejecting non-numeric, zero and negative amounts as the interface does.
+
+    Numbers are currency units; strings such as "4.99" are parsed exactly.
+    """
+    if not isinstance(value, (int, float, str)) or isinstance(value, bool):
+        raise CommandError(f"Invalid {label.lower()}. Please enter a number.")
+    try:
+        value = Money.of(value)
+    except ValueError:
+        raise CommandError(f"Invalid {label.lower()}. Please enter a number.")
+    if value <= ZERO:
+        raise CommandError(f"{label} must be positive.")
+    return value
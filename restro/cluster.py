@@ -0,0 +1,626 @@
+"""
+Module containing the sharded multi-process restaurant cluster.
+
+One Restaurant in one interpreter places orders on one core at a time.
+A RestaurantCluster spreads customers over worker processes instead,
+each owning a Restaurant shard, and routes every customer operation to
+the shard owning the customer:
+
+    customers   hash-partitioned by customer ID (CRC-32, stable across
+                runs and processes) so each lives in exactly one shard
+    menu        replicated: the router applies each change to its own
+                copy, then broadcasts it to every shard with the menu
+                version it produced, and each shard checks it arrives
+                at the same version, so a menu version means the same
+                menu everywhere
+    admin       scatter-gather: listing, paging, searching and
+                liabilities ask every shard and merge the answers
+
+The router issues customer IDs and keeps the email index, so IDs and
+emails stay unique across shards. It talks to each shard over a pipe,
+one request at a time per shard, and sends a request to every shard
+involved before waiting on any of them, so a bulk order batch split
+across shards is placed by all of them at once. Throughput therefore
+grows with cores for batches and for several threads calling the
+router, while a single call pays a pipe round trip.
+
+Customers come back as plain data, as in the JSON service (see
+restro.service.customer_to_dict). Orders come back as Order objects on
+the router's own items, so they print and total as usual: a shard sends
+an order's packed lines as they are with the ID of each line's item,
+and announces each of its items once, which the router maps to its
+menu items or to off-menu copies.
+Shards keep their state in memory only.
+"""
+import heapq
+import multiprocessing
+import threading
+import zlib
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .directory import _id_order, normalize_customer_name, normalize_email
+from .ids import SnowflakeIdGenerator
+from .menu import MenuVersion
+from .models import MenuItem, Order, OrderResult
+from .money import Money, ZERO
+from .restaurant import Restaurant
+from .service import customer_to_dict
+
+# Restaurant methods that change the menu, replicated to every shard
+MENU_METHODS = ("add_menu_item", "remove_menu_item", "rename_menu_item", "update_menu_item_price")
+
+
+class _Shard:
+    """The worker side of a shard: its Restaurant and the requests it serves.
+
+    Orders travel as (order_id, timestamp, menu_version, total in cents,
+    item IDs, packed lines), with this process's ID of each line's item.
+    Each reply announces the items the router has not seen yet, so the
+    router can map the IDs to its own items.
+    """
+
+    def __init__(self, name: str, worker_id: int):
+        self.restaurant = Restaurant(name, id_generator=SnowflakeIdGenerator(worker_id))
+        # Item IDs already announced, and those to announce with the next reply
+        self._announced: Set[int] = set()
+        self._pending: List[Tuple[int, str, str, Money]] = []
+        self._announced_version = -1
+
+    def _announce(self, item: MenuItem):
+        if item.item_id not in self._announced:
+            self._announced.add(item.item_id)
+            self._pending.append((item.item_id, item.name, item.category, item.price))
+
+    def take_announcements(self) -> List[Tuple[int, str, str, Money]]:
+        """Get (item_id, name, category, price) of the items to announce, once each."""
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _wire(self, order: Order) -> Tuple[int, float, int, int, Tuple[int, ...], bytes]:
+        return (order.id, order._created, order.menu_version, order.total_price.cents,
+                tuple([item.item_id for item in order._items]), order._lines)
+
+    def register(self, customer_id: str, name: str, email: str, address: str) -> Dict[str, Any]:
+        return customer_to_dict(self.restaurant._register_customer(customer_id, name, email, address))
+
+    def get_customer(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        customer = self.restaurant.get_customer(customer_id)
+        return None if customer is None else customer_to_dict(customer)
+
+    def remove_customer(self, customer_id: str) -> Optional[str]:
+        customer = self.restaurant.get_customer(customer_id)
+        if customer is None or not self.restaurant.remove_customer(customer_id):
+            return None
+        return customer.email
+
+    def add_funds(self, customer_id: str, amount: Money) -> Optional[Money]:
+        customer = self.restaurant.get_customer(customer_id)
+        return None if customer is None else customer.add_funds(amount)
+
+    def check_balance(self, customer_id: str) -> Optional[Money]:
+        customer = self.restaurant.get_customer(customer_id)
+        return None if customer is None else customer.check_balance()
+
+    def view_orders(self, customer_id: str) -> Optional[list]:
+        customer = self.restaurant.get_customer(customer_id)
+        if customer is None:
+            return None
+        orders = customer.view_orders()[:]
+        for order in orders:
+            for item in order._items:
+                self._announce(item)
+        return [self._wire(order) for order in orders]
+
+    def place_orders(self, batch: List[Tuple[str, List[str]]]) -> list:
+        # Bulk orders only take items from the current menu
+        menu = self.restaurant.menu
+        if menu.version != self._announced_version:
+            for item in menu:
+                self._announce(item)
+            self._announced_version = menu.version
+        return [(result.status, None if result.order is None else self._wire(result.order), result.item_name)
+                for result in self.restaurant.place_orders_bulk(batch)]
+
+    def change_menu(self, version: int, method: str, args: tuple) -> int:
+        if method not in MENU_METHODS:
+            raise ValueError(f"'{method}' does not change the menu")
+        getattr(self.restaurant, method)(*args)
+        if self.restaurant.menu.version != version:
+            raise RuntimeError(f"Shard menu reached version {self.restaurant.menu.version}, expected {version}")
+        return version
+
+    def customer_page(self, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        return [customer_to_dict(customer) for customer in self.restaurant.customer_page(after, limit)[0]]
+
+    def find_customers_by_name(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        return [customer_to_dict(customer) for customer in self.restaurant.find_customers_by_name(prefix, limit)]
+
+    def total_liabilities(self, when: Union[datetime, float, None]) -> Money:
+        return self.restaurant.total_liabilities(when)
+
+    def customer_count(self) -> int:
+        return len(self.restaurant.customers)
+
+
+# Requests a shard serves
+_COMMANDS = frozenset((
+    "register", "get_customer", "remove_customer", "add_funds", "check_balance", "view_orders",
+    "place_orders", "change_menu", "customer_page", "find_customers_by_name", "total_liabilities",
+    "customer_count",
+))
+
+
+def _serve(connection, name: str, worker_id: int):
+    """Run one shard: answer (command, args) requests until told to stop.
+
+    Replies are (True, result, announcements), or (False, exception,
+    announcements) when the command raised, for the router to raise again.
+    """
+    shard = _Shard(name, worker_id)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        command, args = request
+        try:
+            if command not in _COMMANDS:
+                raise ValueError(f"Unknown shard command '{command}'")
+            reply = (True, getattr(shard, command)(*args))
+        except Exception as error:
+            reply = (False, error)
+        announcements = shard.take_announcements()
+        try:
+            connection.send(reply + (announcements,))
+        except Exception as error:
+            # The result or exception would not pickle; nothing was sent
+            connection.send((False, RuntimeError(f"Shard could not send its reply: {error!r}"), announcements))
+
+
+class RestaurantCluster:
+    """A restaurant whose customers are split across worker processes."""
+
+    def __init__(self, name: str, shards: Optional[int] = None, first_worker_id: int = 0):
+        """Start the shard processes.
+
+        Args:
+            name: The name of the restaurant
+            shards: Number of worker processes, defaults to the CPU count
+            first_worker_id: Order ID worker ID of the first shard, the
+                others following on, see restro.ids; give clusters
+                sharing an order ID space disjoint ranges
+        """
+        shards = shards or multiprocessing.cpu_count()
+        if shards < 1:
+            raise ValueError("A cluster needs at least one shard")
+        self.name = name
+        # The router's copy of the menu, read without asking the shards
+        self._menu_restaurant = Restaurant(name, thread_safe=True)
+        self._menu_lock = threading.Lock()
+        # Router items standing for shard items, by (name, category, cents),
+        # and by each shard's item IDs
+        self._items: Dict[Tuple[str, str, int], MenuItem] = {}
+        self._shard_items: List[Dict[int, MenuItem]] = [{} for _ in range(shards)]
+        # Case-folded email -> customer ID, over every shard
+        self._emails: Dict[str, str] = {}
+        self._customers_lock = threading.Lock()
+        self.next_customer_id = 1
+
+        context = multiprocessing.get_context()
+        self._connections = []
+        self._processes = []
+        for shard in range(shards):
+            ours, theirs = context.Pipe()
+            process = context.Process(target=_serve, args=(theirs, name, first_worker_id + shard),
+                                      name=f"{name} shard {shard}", daemon=True)
+            process.start()
+            theirs.close()
+            self._connections.append(ours)
+            self._processes.append(process)
+        # One request in flight per shard; several are taken in shard order
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._closed = False
+
+    @property
+    def shards(self) -> int:
+        """The number of shards."""
+        return len(self._connections)
+
+    def shard_of(self, customer_id: str) -> int:
+        """Get the index of the shard owning a customer.
+
+        Args:
+            customer_id: ID of the customer
+
+        Returns:
+            The shard index, the same in every process and run
+        """
+        return zlib.crc32(customer_id.encode()) % len(self._connections)
+
+    def _receive(self, shard: int) -> Tuple[bool, Any]:
+        """Read a shard's reply and learn the items it announces. Caller holds the shard's lock."""
+        ok, value, announcements = self._connections[shard].recv()
+        items = self._shard_items[shard]
+        for item_id, name, category, price in announcements:
+            items[item_id] = self._local_item(name, category, price)
+        return ok, value
+
+    def _local_item(self, name: str, category: str, price: Money) -> MenuItem:
+        """Get the router's item for a shard item: the menu item if it matches, else an off-menu copy."""
+        key = (name, category, price.cents)
+        item = self._items.get(key)
+        if item is None:
+            current = self._menu_restaurant.find_menu_item(name)
+            if current is not None and current.price == price and current.category == category:
+                item = current
+            else:
+                item = MenuItem(name, price, category, None if current is None else current.sku)
+            item = self._items.setdefault(key, item)
+        return item
+
+    @staticmethod
+    def _result(reply: Tuple[bool, Any]) -> Any:
+        """Unwrap a shard's reply, raising the exception it reports."""
+        ok, value = reply
+        if not ok:
+            raise value
+        return value
+
+    def _call(self, shard: int, command: str, *args) -> Any:
+        """Send a request to one shard and wait for its reply."""
+        if self._closed:
+            raise RuntimeError("The cluster is closed")
+        connection = self._connections[shard]
+        with self._locks[shard]:
+            connection.send((command, args))
+            reply = self._receive(shard)
+        return self._result(reply)
+
+    def _scatter(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, Any]:
+        """Send a request to each of several shards, then gather the replies.
+
+        Every reply is read before any error is raised, so no shard is
+        left with an unread reply.
+
+        Args:
+            requests: (command, args) by shard index
+
+        Returns:
+            The results by shard index
+        """
+        if self._closed:
+            raise RuntimeError("The cluster is closed")
+        shards = sorted(requests)
+        with ExitStack() as held:
+            for shard in shards:
+                held.enter_context(self._locks[shard])
+            for shard in shards:
+                self._connections[shard].send(requests[shard])
+            replies = {shard: self._receive(shard) for shard in shards}
+        return {shard: self._result(reply) for shard, reply in replies.items()}
+
+    def _broadcast(self, command: str, *args) -> List[Any]:
+        """Send the same request to every shard and gather the replies in shard order."""
+        results = self._scatter({shard: (command, args) for shard in range(len(self._connections))})
+        return [results[shard] for shard in range(len(self._connections))]
+
+    @property
+    def menu(self) -> MenuVersion:
+        """The current version of the menu."""
+        return self._menu_restaurant.menu
+
+    def get_menu(self) -> MenuVersion:
+        """Get the current menu.
+
+        Returns:
+            The current menu version, iterable over its items
+        """
+        return self._menu_restaurant.get_menu()
+
+    def find_menu_item(self, item_name: str) -> Optional[MenuItem]:
+        """Find a menu item by name, as Restaurant.find_menu_item."""
+        return self._menu_restaurant.find_menu_item(item_name)
+
+    def search_menu(self, query: str, limit: int = 10) -> List[MenuItem]:
+        """Search the menu, as Restaurant.search_menu."""
+        return self._menu_restaurant.search_menu(query, limit)
+
+    def _change_menu(self, method: str, *args) -> Any:
+        """Apply a menu change to the router's copy, then replicate it to every shard.
+
+        Changes that leave the menu as it was are not broadcast.
+        """
+        with self._menu_lock:
+            before = self._menu_restaurant.menu.version
+            result = getattr(self._menu_restaurant, method)(*args)
+            version = self._menu_restaurant.menu.version
+            if version != before:
+                self._broadcast("change_menu", version, method, args)
+            return result
+
+    def add_menu_item(self, name: str, price: Union[Money, float], category: str = "Food") -> MenuItem:
+        """Add an item to the menu of every shard, as Restaurant.add_menu_item."""
+        return self._change_menu("add_menu_item", name, Money.of(price), category)
+
+    def remove_menu_item(self, item_name: str) -> bool:
+        """Remove an item from the menu of every shard, as Restaurant.remove_menu_item."""
+        return self._change_menu("remove_menu_item", item_name)
+
+    def rename_menu_item(self, item_name: str, new_name: str) -> bool:
+        """Rename an item on the menu of every shard, as Restaurant.rename_menu_item."""
+        return self._change_menu("rename_menu_item", item_name, new_name)
+
+    def update_menu_item_price(self, item_name: str, new_price: Union[Money, float]) -> bool:
+        """Reprice an item on the menu of every shard, as Restaurant.update_menu_item_price."""
+        return self._change_menu("update_menu_item_price", item_name, Money.of(new_price))
+
+    def add_customer(self, name: str, email: str, address: str) -> Optional[Dict[str, Any]]:
+        """Add a new customer to the shard owning their new ID.
+
+        Args:
+            name: Customer's name
+            email: Customer's email, which no other customer in any shard
+                may use, ignoring case
+            address: Customer's address
+
+        Returns:
+            The customer as a dict, or None if the email is taken
+        """
+        key = normalize_email(email)
+        with self._customers_lock:
+            if key in self._emails:
+                return None
+            customer_id = f"C{self.next_customer_id:04d}"
+            self.next_customer_id += 1
+            self._emails[key] = customer_id
+        try:
+            return self._call(self.shard_of(customer_id), "register", customer_id, name, email, address)
+        except BaseException:
+            with self._customers_lock:
+                del self._emails[key]
+            raise
+
+    def get_customer(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """Get a customer by ID.
+
+        Args:
+            customer_id: ID of the customer to get
+
+        Returns:
+            The customer as a dict if found, None otherwise
+        """
+        return self._call(self.shard_of(customer_id), "get_customer", customer_id)
+
+    def remove_customer(self, customer_id: str) -> bool:
+        """Remove a customer.
+
+        Args:
+            customer_id: ID of the customer to remove
+
+        Returns:
+            True if successful, False otherwise
+        """
+        email = self._call(self.shard_of(customer_id), "remove_customer", customer_id)
+        if email is None:
+            return False
+        with self._customers_lock:
+            self._emails.pop(normalize_email(email), None)
+        return True
+
+    def add_funds(self, customer_id: str, amount: Union[Money, float]) -> Optional[Money]:
+        """Add funds to a customer's balance.
+
+        Args:
+            customer_id: ID of the customer
+            amount: Amount to add, as Money or a number of currency units
+
+        Returns:
+            The updated balance, or None if there is no such customer
+
+        Raises:
+            ValueError: If the amount is not positive
+        """
+        amount = Money.of(amount)
+        if amount <= ZERO:
+            raise ValueError("Amount must be positive.")
+        return self._call(self.shard_of(customer_id), "add_funds", customer_id, amount)
+
+    def check_balance(self, customer_id: str) -> Optional[Money]:
+        """Get a customer's balance.
+
+        Args:
+            customer_id: ID of the customer
+
+        Returns:
+            The balance, or None if there is no such customer
+        """
+        return self._call(self.shard_of(customer_id), "check_balance", customer_id)
+
+    def view_orders(self, customer_id: str) -> Optional[List[Order]]:
+        """Get a customer's orders, oldest first.
+
+        Args:
+            customer_id: ID of the customer
+
+        Returns:
+            The orders, or None if there is no such customer
+        """
+        shard = self.shard_of(customer_id)
+        wires = self._call(shard, "view_orders", customer_id)
+        if wires is None:
+            return None
+        return [self._order(shard, customer_id, wire) for wire in wires]
+
+    def _order(self, shard: int, customer_id: str, wire: Tuple[int, float, int, int, Tuple[int, ...], bytes]) -> Order:
+        """Rebuild an order a shard sent, its lines moved onto the router's items."""
+        order_id, timestamp, menu_version, total_cents, item_ids, lines = wire
+        items = tuple(map(self._shard_items[shard].__getitem__, item_ids))
+        return Order._from_lines(customer_id, order_id, timestamp, Money(total_cents), menu_version, items, lines)
+
+    def place_order(self, customer_id: str, item_names: List[str]) -> OrderResult:
+        """Place an order for a customer.
+
+        Args:
+            customer_id: ID of the customer
+            item_names: Names of the items to order
+
+        Returns:
+            The outcome, as from Restaurant.place_orders_bulk
+        """
+        return self.place_orders_bulk([(customer_id, item_names)])[0]
+
+    def place_orders_bulk(self, batch: Iterable[Tuple[str, List[str]]]) -> List[OrderResult]:
+        """Place many orders at once, every shard placing its share in parallel.
+
+        Each shard places its customers' orders as Restaurant.place_orders_bulk,
+        in batch order, against its current menu version.
+
+        Args:
+            batch: Pairs of (customer_id, item_names)
+
+        Returns:
+            One OrderResult per input pair, in the same order
+        """
+        batch = list(batch)
+        positions: Dict[int, List[int]] = {}
+        shares: Dict[int, List[Tuple[str, List[str]]]] = {}
+        for position, (customer_id, item_names) in enumerate(batch):
+            shard = self.shard_of(customer_id)
+            positions.setdefault(shard, []).append(position)
+            shares.setdefault(shard, []).append((customer_id, list(item_names)))
+        replies = self._scatter({shard: ("place_orders", (share,)) for shard, share in shares.items()})
+
+        results: List[Optional[OrderResult]] = [None] * len(batch)
+        for shard, outcomes in replies.items():
+            for position, (status, wire, item_name) in zip(positions[shard], outcomes):
+                customer_id = batch[position][0]
+                order = None if wire is None else self._order(shard, customer_id, wire)
+                results[position] = OrderResult(customer_id, status, order, item_name)
+        return results
+
+    def customer_count(self) -> int:
+        """Get the number of customers across all shards."""
+        return sum(self._broadcast("customer_count"))
+
+    def customer_page(self, after: Optional[str] = None,
+                      limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get a page of customers in registration order, gathered from every shard.
+
+        Args:
+            after: Cursor returned with the previous page, or None for
+                the first page
+            limit: Most customers on the page
+
+        Returns:
+            The customers as dicts, and the cursor of the next page, None
+            after the last page
+        """
+        pages = self._broadcast("customer_page", after, limit)
+        customers = list(heapq.merge(*pages, key=lambda customer: _id_order(customer["customer_id"])))[:limit]
+        cursor = customers[-1]["customer_id"] if len(customers) == limit else None
+        return customers, cursor
+
+    def iter_customers(self, page_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """Yield every customer in registration order, a page at a time.
+
+        Args:
+            page_size: Customers fetched per page
+        """
+        cursor = None
+        while True:
+            customers, cursor = self.customer_page(cursor, page_size)
+            yield from customers
+            if cursor is None:
+                return
+
+    def get_customers(self) -> List[Dict[str, Any]]:
+        """Get all customers, in registration order.
+
+        Returns:
+            List of every customer as a dict
+        """
+        return list(self.iter_customers())
+
+    def find_customer_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Look up a customer by email, ignoring case, asking only their shard.
+
+        Args:
+            email: Email of the customer
+
+        Returns:
+            The customer as a dict if found, None otherwise
+        """
+        customer_id = self._emails.get(normalize_email(email))
+        return None if customer_id is None else self.get_customer(customer_id)
+
+    def find_customers_by_name(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Find customers whose name starts with a prefix, ignoring case.
+
+        Args:
+            prefix: Start of the name
+            limit: Most customers to return
+
+        Returns:
+            Matching customers as dicts, in name order
+        """
+        matches = self._broadcast("find_customers_by_name", prefix, limit)
+        merged = heapq.merge(*matches, key=lambda customer: (normalize_customer_name(customer["name"]),
+                                                             customer["customer_id"]))
+        return list(merged)[:limit]
+
+    def search_customers(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Find customers by email, or by the start of their name.
+
+        Args:
+            query: An email, matched exactly but ignoring case, or else
+                the start of a name
+            limit: Most customers to return
+
+        Returns:
+            Matching customers as dicts
+        """
+        if "@" in query:
+            customer = self.find_customer_by_email(query)
+            return [] if customer is None else [customer]
+        return self.find_customers_by_name(query, limit)
+
+    def total_liabilities(self, when: Union[datetime, float, None] = None) -> Money:
+        """Get the total the restaurant owes its customers, summed over every shard.
+
+        Args:
+            when: Moment to report for, as a datetime or epoch seconds,
+                defaults to now
+
+        Returns:
+            The sum of customer balances, as Restaurant.total_liabilities
+        """
+        return sum(self._broadcast("total_liabilities", when), ZERO)
+
+    def close(self):
+        """Stop the shard processes. Their state is lost."""
+        if self._closed:
+            return
+        self._closed = True
+        for lock, connection in zip(self._locks, self._connections):
+            with lock:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+        for process, connection in zip(self._processes, self._connections):
+            process.join()
+            connection.close()
+
+    def __enter__(self) -> "RestaurantCluster":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def __str__(self) -> str:
+        """Return a string representation of the cluster."""
+        return f"Restaurant: {self.name} ({self.shards} shards)"
@@ -1,13 +1,23 @@
 """
 Module containing the Customer class for the restaurant management system.
 """
-from typing import List, Optional
-from .models import MenuItem, Order
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+from .history import OrderHistory
+from .ledger import Ledger, DEPOSIT, ORDER, ADJUSTMENT
+from .models import MenuItem, Order, ORDER_INSUFFICIENT_FUNDS, ORDER_ITEM_NOT_FOUND, MAX_QUANTITY, parse_order_entry
+from .money import Money, ZERO
+from .locks import NO_LOCK
+from . import wal
 
 
 class Customer:
     """Represents a customer who can place orders."""
     
+    __slots__ = ("name", "email", "address", "customer_id", "orders", "_ledger", "_restaurant", "_lock",
+                 "__weakref__")
+    
     def __init__(self, name: str, email: str, address: str, customer_id: str):
         """Initialize a customer.
         
@@ -21,8 +31,62 @@ class Customer:
         self.email = email
         self.address = address
         self.customer_id = customer_id
-        self.balance = 0.0
-        self.orders: List[Order] = []
+        # Orders in the order they were placed, see restro.history
+        self.orders = OrderHistory()
+        # Every change to the balance, created with the first one
+        self._ledger: Optional[Ledger] = None
+        # Restaurant this customer is registered with, set on registration
+        self._restaurant = None
+        # Guards the ledger and orders when the restaurant is thread safe
+        self._lock = NO_LOCK
+    
+    @property
+    def ledger(self) -> Ledger:
+        """The customer's ledger of deposits, orders and adjustments."""
+        if self._ledger is None:
+            self._ledger = Ledger()
+        return self._ledger
+    
+    @property
+    def balance(self) -> Money:
+        """The customer's balance, the sum of their ledger."""
+        ledger = self._ledger
+        return ZERO if ledger is None else Money(ledger.total)
+    
+    @balance.setter
+    def balance(self, value: Union[Money, float]):
+        # Setting the balance directly records the difference as an adjustment
+        self._post(time.time(), Money.of(value).cents - self.balance.cents, ADJUSTMENT)
+    
+    def balance_at(self, when: Union[datetime, float]) -> Money:
+        """Get the customer's balance as of a past moment.
+        
+        Args:
+            when: The moment, as a datetime or epoch seconds
+            
+        Returns:
+            The balance after every ledger entry made up to that moment
+        """
+        with self._lock:
+            return ZERO if self._ledger is None else self._ledger.balance_at(when)
+    
+    def _post(self, timestamp: float, cents: int, kind: int, reference: int = 0):
+        """Record a ledger entry, and the matching change in the restaurant's liabilities.
+        
+        Caller holds the customer's lock.
+        
+        Args:
+            timestamp: When the entry took effect, in epoch seconds
+            cents: Signed amount in cents
+            kind: One of the ledger entry kinds
+            reference: ID of the order an ORDER entry pays for
+        """
+        ledger = self._ledger
+        if ledger is None:
+            ledger = self._ledger = Ledger()
+        ledger.append(timestamp, cents, kind, reference)
+        if self._restaurant is not None:
+            self._restaurant._post_liability(timestamp, cents, kind, reference)
         
     def view_menu(self, restaurant):
         """View the restaurant's menu.
@@ -35,45 +99,136 @@ class Customer:
         """
         return restaurant.get_menu()
     
-    def place_order(self, restaurant, item_names: List[str]) -> Optional[Order]:
+    def place_order(self, restaurant, item_names: List[Union[str, Tuple[str, int]]]) -> Optional[Order]:
         """Place an order by selecting items from the menu.
         
+        Repeats of an item, however spelled, are totalled into one line
+        first, so the work done is per distinct item rather than per unit.
+        
         Args:
             restaurant: The restaurant object
-            item_names: List of item names to order
+            item_names: Item names to order, one unit each, or (name,
+                quantity) pairs
             
         Returns:
             The created Order object if successful, None otherwise
+            
+        Raises:
+            ValueError: If a quantity is not a positive whole number
         """
+        normalize = restaurant._normalize_name
+        # One menu version prices the whole order, however the menu changes meanwhile
         menu = restaurant.get_menu()
         items = []
-        total_cost = 0.0
-        
-        # Find requested items in the menu
-        for item_name in item_names:
-            found = False
-            for menu_item in menu:
-                if menu_item.name.lower() == item_name.lower():
-                    items.append(menu_item)
-                    total_cost += menu_item.price
-                    found = True
+        quantities = []
+        # Line of each item so far, by name key
+        lines: Dict[str, int] = {}
+        total_cents = 0
+        
+        # Total the units of each item, looking each item up in the menu once
+        for entry in item_names:
+            if entry.__class__ is str:
+                item_name = entry
+                quantity = 1
+            else:
+                item_name, quantity = parse_order_entry(entry)
+            key = normalize(item_name)
+            line = lines.get(key)
+            if line is None:
+                menu_item = menu.find(key)
+                if menu_item is None:
                     break
-            if not found:
-                print(f"Item '{item_name}' not found in menu.")
-                return None
-        
-        # Check if customer has enough balance
-        if self.balance < total_cost:
-            print(f"Insufficient balance. Order total: ${total_cost:.2f}, Your balance: ${self.balance:.2f}")
-            return None
-        
-        # Create and process the order
-        order = Order(items, self.customer_id)
-        self.balance -= total_cost
-        self.orders.append(order)
+                lines[key] = len(items)
+                items.append(menu_item)
+                quantities.append(quantity)
+            else:
+                menu_item = items[line]
+                quantities[line] += quantity
+                if quantities[line] > MAX_QUANTITY:
+                    raise ValueError(f"Quantity of '{item_name}' must be a whole number from 1 to {MAX_QUANTITY}")
+            total_cents += menu_item.price.cents * quantity
+        else:
+            total_cost = Money(total_cents)
+            with self._lock:
+                # Check if customer has enough balance
+                if self.balance < total_cost:
+                    if restaurant.metrics is not None:
+                        restaurant.metrics.reject("customer.place_order", ORDER_INSUFFICIENT_FUNDS)
+                    print(f"Insufficient balance. Order total: ${total_cost:.2f}, Your balance: ${self.balance:.2f}")
+                    return None
+                
+                return self._record_order(items, total_cost, menu_version=menu.version, quantities=quantities)
+        
+        if restaurant.metrics is not None:
+            restaurant.metrics.reject("customer.place_order", ORDER_ITEM_NOT_FOUND)
+        print(f"Item '{item_name}' not found in menu.")
+        # A failed order must not wait for the search index to be built
+        suggestions = restaurant.suggest_menu_items(item_name, build=False)
+        if suggestions:
+            print(f"Did you mean: {', '.join(item.name for item in suggestions)}?")
+        return None
+    
+    def _record_order(self, items: List[MenuItem], total_cost: Money,
+                      timestamp: Union[datetime, float, None] = None,
+                      order_id: Optional[int] = None, menu_version: Optional[int] = None,
+                      quantities: Optional[List[int]] = None) -> Order:
+        """Create an order for already validated items and debit the balance.
+        
+        Caller holds the customer's lock.
+        
+        Args:
+            items: Menu items in the order, one entry per unit, or one per
+                line when `quantities` is given
+            total_cost: Total price of the items
+            timestamp: When the order was placed, as a datetime or epoch
+                seconds, defaults to now
+            order_id: Numeric ID of the order, defaults to one from the
+                restaurant's ID generator
+            menu_version: Version of the menu the items were taken from,
+                defaults to the restaurant's current version
+            quantities: Units of each entry of `items`
+            
+        Returns:
+            The created Order object
+        """
+        restaurant = self._restaurant
+        if restaurant is not None:
+            if order_id is None:
+                order_id = restaurant.id_generator.next_id()
+            if menu_version is None:
+                menu_version = restaurant.get_menu().version
+        order = Order(items, self.customer_id, timestamp, total_cost, order_id, menu_version or 0, quantities)
+        self._post(order._created, -total_cost.cents, ORDER, order.id)
+        self._add_order(order)
+        if restaurant is not None:
+            if restaurant.log is not None:
+                self._log(wal.PLACE_ORDER, order._created, order.id, order.menu_version,
+                          *wal.order_entries(order))
+            if restaurant.analytics is not None:
+                restaurant.analytics.record_order(order)
+            if restaurant.kitchen is not None:
+                # The estimate is made when someone asks for it, through ready_at
+                restaurant.kitchen.enqueue(order)
         return order
     
-    def check_balance(self) -> float:
+    def _add_order(self, order: Order):
+        """Add an order to the history, and to the restaurant's time index once built.
+        
+        Caller holds the customer's lock.
+        
+        Args:
+            order: The order, placed or restored
+        """
+        restaurant = self._restaurant
+        if restaurant is None:
+            self.orders.append(order)
+            return
+        with restaurant._orders_lock:
+            self.orders.append(order)
+            if restaurant._order_index is not None:
+                restaurant._order_index.append(order)
+    
+    def check_balance(self) -> Money:
         """Check the customer's available balance.
         
         Returns:
@@ -81,30 +236,83 @@ class Customer:
         """
         return self.balance
     
-    def view_orders(self) -> List[Order]:
-        """View a list of past orders.
+    def view_orders(self, start: Union[datetime, float, None] = None,
+                    end: Union[datetime, float, None] = None) -> List[Order]:
+        """View past orders, oldest first.
         
+        Args:
+            start: Only orders placed from this moment on, as a datetime
+                or epoch seconds
+            end: Only orders placed before this moment
+            
         Returns:
-            List of the customer's past orders
+            The customer's order history itself, not to be changed, or
+            a list of the orders placed in the span when one is given
         """
-        return self.orders
+        if start is None and end is None:
+            return self.orders
+        with self._lock:
+            return list(self.orders.between(start, end))
     
-    def add_funds(self, amount: float) -> float:
+    def order_page(self, before: Optional[Order] = None, limit: int = 20) -> Tuple[List[Order], Optional[Order]]:
+        """Get a page of past orders, newest first.
+        
+        Args:
+            before: Cursor returned with the previous page, or None for
+                the newest orders
+            limit: Most orders on the page
+            
+        Returns:
+            The orders, and the cursor of the next page, None after the
+            last page
+        """
+        with self._lock:
+            return self.orders.page(before, limit)
+    
+    def add_funds(self, amount: Union[Money, float]) -> Money:
         """Add funds to the customer's balance.
         
         Args:
-            amount: Amount to add to the balance
+            amount: Amount to add to the balance, as Money or a number of
+                currency units
             
         Returns:
             The updated balance
         """
-        if amount <= 0:
+        amount = Money.of(amount)
+        if amount <= ZERO:
+            if self._restaurant is not None and self._restaurant.metrics is not None:
+                self._restaurant.metrics.reject("customer.add_funds", "invalid_amount")
             print("Amount must be positive.")
             return self.balance
         
-        self.balance += amount
+        with self._lock:
+            return self._deposit(amount)
+    
+    def _deposit(self, amount: Money, timestamp: Optional[float] = None) -> Money:
+        """Credit an already validated amount to the balance.
+        
+        Caller holds the customer's lock.
+        
+        Args:
+            amount: Amount to add to the balance
+            timestamp: When the deposit was made, in epoch seconds,
+                defaults to now
+            
+        Returns:
+            The updated balance
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._post(timestamp, amount.cents, DEPOSIT)
+        self._log(wal.ADD_FUNDS, float(amount), timestamp)
         return self.balance
     
+    def _log(self, op: str, *args):
+        """Append a record for this customer to the restaurant's operation log."""
+        if self._restaurant is not None and self._restaurant.log is not None:
+            self._restaurant.log.append(op, self.customer_id, *args)
+    
     def __str__(self) -> str:
         """Return a string representation of the customer."""
         return f"Customer ID: {self.customer_id}, Name: {self.name}, Email: {self.email}"
@@ -0,0 +1,221 @@
+"""
+Module containing the customer directory of the restaurant management system.
+
+The directory indexes registered customers beside the ID mapping:
+
+    emails  case-folded email -> customer ID, unique
+    names   (case-folded name, customer ID), sorted, for prefix search
+    order   customer IDs in registration order, sorted, for paging
+
+The sorted indexes are kept as short sorted blocks under a list of each
+block's last value, so a lookup is two bisects and an insert shifts one
+block rather than a million-entry list. Pages start after a cursor, the
+last customer ID of the previous page, so paging never builds the full
+customer list and stays correct while customers come and go.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Values per block; blocks split in two at twice this size
+BLOCK_SIZE = 512
+
+
+def normalize_email(email: str) -> str:
+    """Return the key under which an email is looked up."""
+    return email.strip().casefold()
+
+
+def normalize_customer_name(name: str) -> str:
+    """Return the key under which a customer name is searched."""
+    return name.casefold()
+
+
+def _id_order(customer_id: str) -> Tuple[int, str]:
+    """Sort key putting customer IDs in registration order.
+
+    Restaurants issue IDs that grow in value, C0009 before C0010 before
+    C10000, so shorter IDs sort first and equal lengths compare as text.
+    """
+    return len(customer_id), customer_id
+
+
+class SortedBlocks:
+    """A sorted collection of distinct values kept as a list of sorted blocks."""
+
+    __slots__ = ("_blocks", "_maxes", "_length")
+
+    def __init__(self, values: Iterable = ()):
+        """Build the collection.
+
+        Args:
+            values: Initial values, in any order, all distinct
+        """
+        values = sorted(values)
+        self._blocks: List[list] = [values[i:i + BLOCK_SIZE] for i in range(0, len(values), BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._length = len(values)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def add(self, value):
+        """Insert a value that is not in the collection."""
+        blocks, maxes = self._blocks, self._maxes
+        self._length += 1
+        if not maxes:
+            blocks.append([value])
+            maxes.append(value)
+            return
+        index = bisect_left(maxes, value)
+        if index == len(maxes):
+            # Past the end, as new registrations nearly always are
+            index -= 1
+            blocks[index].append(value)
+            maxes[index] = value
+        else:
+            insort(blocks[index], value)
+        block = blocks[index]
+        if len(block) > 2 * BLOCK_SIZE:
+            blocks[index:index + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            maxes[index:index + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+
+    def discard(self, value) -> bool:
+        """Remove a value, if present.
+
+        Returns:
+            True if the value was removed
+        """
+        blocks, maxes = self._blocks, self._maxes
+        index = bisect_left(maxes, value)
+        if index == len(maxes):
+            return False
+        block = blocks[index]
+        position = bisect_left(block, value)
+        if block[position] != value:
+            return False
+        del block[position]
+        self._length -= 1
+        if not block:
+            del blocks[index]
+            del maxes[index]
+        elif position == len(block):
+            maxes[index] = block[-1]
+        return True
+
+    def iter_from(self, start, inclusive: bool = True) -> Iterator:
+        """Yield the values from `start` on, in order.
+
+        The collection must not change while the iterator is in use.
+
+        Args:
+            start: Smallest value of interest
+            inclusive: Whether a value equal to `start` is yielded
+        """
+        find = bisect_left if inclusive else bisect_right
+        index = find(self._maxes, start)
+        if index == len(self._maxes):
+            return
+        block = self._blocks[index]
+        yield from block[find(block, start):]
+        for block in self._blocks[index + 1:]:
+            yield from block
+
+
+class CustomerDirectory:
+    """Email, name prefix and registration order indexes over customers.
+
+    A directory does no locking; the restaurant serializes its use.
+    """
+
+    def __init__(self, identities: Iterable[Tuple[str, str, str]] = ()):
+        """Build the directory.
+
+        Args:
+            identities: (customer_id, name, email) of each customer, in
+                registration order. Should two customers share an email,
+                as in logs written before emails were unique, the first
+                keeps it in the index.
+        """
+        self._emails: Dict[str, str] = {}
+        names = []
+        order = []
+        for customer_id, name, email in identities:
+            self._emails.setdefault(normalize_email(email), customer_id)
+            names.append((normalize_customer_name(name), customer_id))
+            order.append(_id_order(customer_id))
+        self._names = SortedBlocks(names)
+        self._order = SortedBlocks(order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def email_owner(self, email: str) -> Optional[str]:
+        """Get the ID of the customer using an email, ignoring case.
+
+        Args:
+            email: Email to look up
+
+        Returns:
+            The customer ID if found, None otherwise
+        """
+        return self._emails.get(normalize_email(email))
+
+    def add(self, customer_id: str, name: str, email: str):
+        """Index a newly registered customer."""
+        self._emails.setdefault(normalize_email(email), customer_id)
+        self._names.add((normalize_customer_name(name), customer_id))
+        self._order.add(_id_order(customer_id))
+
+    def discard(self, customer_id: str, name: str, email: str):
+        """Stop indexing a removed customer."""
+        key = normalize_email(email)
+        if self._emails.get(key) == customer_id:
+            del self._emails[key]
+        self._names.discard((normalize_customer_name(name), customer_id))
+        self._order.discard(_id_order(customer_id))
+
+    def with_name_prefix(self, prefix: str, limit: int) -> List[str]:
+        """Get the IDs of customers whose name starts with a prefix, ignoring case.
+
+        Args:
+            prefix: Start of the name
+            limit: Most IDs to return
+
+        Returns:
+            Customer IDs in name order
+        """
+        prefix = normalize_customer_name(prefix)
+        found = []
+        if limit <= 0:
+            return found
+        for name, customer_id in self._names.iter_from((prefix,)):
+            if not name.startswith(prefix):
+                break
+            found.append(customer_id)
+            if len(found) == limit:
+                break
+        return found
+
+    def page(self, after: Optional[str], limit: int) -> List[str]:
+        """Get a page of customer IDs in registration order.
+
+        Args:
+            after: Cursor, the last ID of the previous page, or None for
+                the first page
+            limit: Most IDs to return
+
+        Returns:
+            Customer IDs following the cursor
+        """
+        if after is None:
+            values = self._order.iter_from((0, ""))
+        else:
+            values = self._order.iter_from(_id_order(after), inclusive=False)
+        found = []
+        if limit <= 0:
+            return found
+        for _, customer_id in values:
+            found.append(customer_id)
+            if len(found) == limit:
+                break
+        return found
@@ -0,0 +1,375 @@
+"""
+Module containing streaming export and import for the restaurant management system.
+
+Customers, the menu and orders are written as CSV with a header row, or
+as JSON lines, one object per record:
+
+    customers   customer_id, name, email, address, balance
+    menu        name, price, category
+    orders      CSV: one row per order line, with columns order_id,
+                customer_id, timestamp, menu_version, item, category,
+                quantity and price, the rows of an order together
+                JSONL: order_id, customer_id, timestamp, menu_version,
+                total and lines, a list of {item, category, quantity, price}
+
+Amounts are currency units, written from whole cents so reading them
+back is exact, and timestamps are epoch seconds. The format follows the
+file name (.csv or .jsonl), and a further .gz compresses the file;
+either can be given explicitly instead.
+
+Exporters walk the restaurant with generators and write records in
+blocks, so memory stays flat however many orders there are. Importers
+read records one at a time and hand them to the restaurant's restore
+methods, which apply them in batches. Import customers before their
+orders, into a restaurant without an operation log, and checkpoint a
+snapshot afterwards to make the result durable.
+"""
+import csv
+import gzip
+import io
+import json
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .money import Money, ZERO
+from .restaurant import Restaurant
+
+CSV = "csv"
+JSONL = "jsonl"
+
+# Records gathered before each write
+BLOCK_SIZE = 4096
+
+CUSTOMER_FIELDS = ("customer_id", "name", "email", "address", "balance")
+MENU_FIELDS = ("name", "price", "category")
+ORDER_FIELDS = ("order_id", "customer_id", "timestamp", "menu_version", "item", "category", "quantity", "price")
+
+# Stand-in line for orders without any
+_NO_LINES = (("", "", 0, ZERO),)
+
+# One shared encoder; json.dumps builds a new one per call for non-default options
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class _Memo(dict):
+    """Dictionary computing and keeping the value of each missing key."""
+
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, key):
+        value = self[key] = self.function(key)
+        return value
+
+
+def _format(path: str, format: Optional[str], compress: Optional[bool]) -> Tuple[str, bool]:
+    """Settle the format and compression of a file from its name, unless given."""
+    name = path.lower()
+    if compress is None:
+        compress = name.endswith(".gz")
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if format is None:
+        format = CSV if name.endswith(".csv") else JSONL if name.endswith((".jsonl", ".json")) else None
+    if format not in (CSV, JSONL):
+        raise ValueError(f"Cannot tell the format of '{path}'; pass format='csv' or format='jsonl'")
+    return format, compress
+
+
+def _open(path: str, mode: str, compress: bool):
+    """Open a text file for streaming, gzip-compressed or not."""
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def iter_customers(restaurant: Restaurant) -> Iterator[Tuple[str, str, str, str, Money]]:
+    """Yield (customer_id, name, email, address, balance) of every customer, in registration order."""
+    for customer in restaurant.iter_customers():
+        yield customer.customer_id, customer.name, customer.email, customer.address, customer.balance
+
+
+def iter_menu(restaurant: Restaurant) -> Iterator[Tuple[str, Money, str]]:
+    """Yield (name, price, category) of every menu item, in menu order."""
+    for item in restaurant.get_menu():
+        yield item.name, item.price, item.category
+
+
+def iter_orders(restaurant: Restaurant) -> Iterator[Tuple[int, str, float, int, List[Tuple[str, str, int, Money]]]]:
+    """Yield every order, customer by customer, oldest first.
+
+    Yields:
+        (order_id, customer_id, timestamp, menu_version, lines), where
+        lines are (item name, category, quantity, price at purchase)
+    """
+    for customer in restaurant.iter_customers():
+        # A copy, so orders placed meanwhile cannot disturb the walk
+        for order in customer.orders[:]:
+            lines = []
+            for item, quantity, cents in order._iter_lines():
+                lines.append((item.name, item.category, quantity, Money(cents)))
+            yield order.id, order.customer_id, order._created, order.menu_version, lines
+
+
+def _write_csv(path: str, compress: bool, fields: Tuple[str, ...], rows: Iterable[tuple]):
+    """Write CSV rows in blocks, each formatted in memory and written at once."""
+    with _open(path, "w", compress) as out:
+        block = io.StringIO()
+        writer = csv.writer(block)
+        writer.writerow(fields)
+        pending = 0
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending == BLOCK_SIZE:
+                out.write(block.getvalue())
+                block.seek(0)
+                block.truncate()
+                pending = 0
+        out.write(block.getvalue())
+
+
+def _write_jsonl(path: str, compress: bool, objects: Iterable[dict]):
+    """Write JSON lines in blocks."""
+    with _open(path, "w", compress) as out:
+        block = []
+        for value in objects:
+            block.append(_encode(value))
+            if len(block) == BLOCK_SIZE:
+                block.append("")
+                out.write("\n".join(block))
+                block.clear()
+        if block:
+            block.append("")
+            out.write("\n".join(block))
+
+
+def export_customers(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                     compress: Optional[bool] = None) -> int:
+    """Write every customer to a file.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the file to write
+        format: CSV or JSONL, by default from the file name
+        compress: Whether to gzip the file, by default if the name ends in .gz
+
+    Returns:
+        The number of customers written
+    """
+    format, compress = _format(path, format, compress)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in iter_customers(restaurant):
+            count += 1
+            yield record
+
+    if format == CSV:
+        _write_csv(path, compress, CUSTOMER_FIELDS,
+                   ((customer_id, name, email, address, str(balance))
+                    for customer_id, name, email, address, balance in counted()))
+    else:
+        _write_jsonl(path, compress, (
+            {"customer_id": customer_id, "name": name, "email": email, "address": address, "balance": float(balance)}
+            for customer_id, name, email, address, balance in counted()
+        ))
+    return count
+
+
+def export_menu(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                compress: Optional[bool] = None) -> int:
+    """Write the menu to a file.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the file to write
+        format: CSV or JSONL, by default from the file name
+        compress: Whether to gzip the file, by default if the name ends in .gz
+
+    Returns:
+        The number of items written
+    """
+    format, compress = _format(path, format, compress)
+    menu = list(iter_menu(restaurant))
+    if format == CSV:
+        _write_csv(path, compress, MENU_FIELDS, ((name, str(price), category) for name, price, category in menu))
+    else:
+        _write_jsonl(path, compress, (
+            {"name": name, "price": float(price), "category": category} for name, price, category in menu
+        ))
+    return len(menu)
+
+
+def export_orders(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                  compress: Optional[bool] = None) -> int:
+    """Write every customer's orders to a file, without holding them all in memory.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the file to write
+        format: CSV or JSONL, by default from the file name
+        compress: Whether to gzip the file, by default if the name ends in .gz
+
+    Returns:
+        The number of orders written
+    """
+    format, compress = _format(path, format, compress)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in iter_orders(restaurant):
+            count += 1
+            yield record
+
+    if format == CSV:
+        # Few distinct prices recur on every line, so each is formatted once
+        price_text = _Memo(str)
+        _write_csv(path, compress, ORDER_FIELDS, (
+            (order_id, customer_id, timestamp, menu_version, name, category, quantity, price_text[price])
+            for order_id, customer_id, timestamp, menu_version, lines in counted()
+            # An order without lines still gets a row, with quantity 0
+            for name, category, quantity, price in lines or _NO_LINES
+        ))
+    else:
+        _write_jsonl(path, compress, (
+            {
+                "order_id": order_id,
+                "customer_id": customer_id,
+                "timestamp": timestamp,
+                "menu_version": menu_version,
+                "total": float(sum(price * quantity for _, _, quantity, price in lines)),
+                "lines": [
+                    {"item": name, "category": category, "quantity": quantity, "price": float(price)}
+                    for name, category, quantity, price in lines
+                ],
+            }
+            for order_id, customer_id, timestamp, menu_version, lines in counted()
+        ))
+    return count
+
+
+def _read_csv(path: str, compress: bool, fields: Tuple[str, ...]) -> Iterator[List[str]]:
+    """Yield the rows of a CSV file after checking its header."""
+    with _open(path, "r", compress) as source:
+        rows = csv.reader(source)
+        header = next(rows, None)
+        if header is None or tuple(header) != fields:
+            raise ValueError(f"'{path}' does not start with the header {','.join(fields)}")
+        yield from rows
+
+
+def _read_jsonl(path: str, compress: bool) -> Iterator[dict]:
+    """Yield the objects of a JSON lines file, skipping blank lines."""
+    with _open(path, "r", compress) as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_customers(path: str, format: Optional[str] = None,
+                   compress: Optional[bool] = None) -> Iterator[Tuple[str, str, str, str, Money]]:
+    """Stream (customer_id, name, email, address, balance) records from an export."""
+    format, compress = _format(path, format, compress)
+    if format == CSV:
+        for customer_id, name, email, address, balance in _read_csv(path, compress, CUSTOMER_FIELDS):
+            yield customer_id, name, email, address, Money.parse(balance)
+    else:
+        for record in _read_jsonl(path, compress):
+            yield (record["customer_id"], record["name"], record["email"], record["address"],
+                   Money.of(record["balance"]))
+
+
+def read_menu(path: str, format: Optional[str] = None,
+              compress: Optional[bool] = None) -> Iterator[Tuple[str, Money, str]]:
+    """Stream (name, price, category) records from an export."""
+    format, compress = _format(path, format, compress)
+    if format == CSV:
+        for name, price, category in _read_csv(path, compress, MENU_FIELDS):
+            yield name, Money.parse(price), category
+    else:
+        for record in _read_jsonl(path, compress):
+            yield record["name"], Money.of(record["price"]), record["category"]
+
+
+def read_orders(path: str, format: Optional[str] = None, compress: Optional[bool] = None
+                ) -> Iterator[Tuple[int, str, float, int, List[Tuple[str, str, int, Money]]]]:
+    """Stream (order_id, customer_id, timestamp, menu_version, lines) records from an export.
+
+    CSV rows of one order are gathered back into one record; an order's
+    rows must be consecutive, as export_orders writes them.
+    """
+    format, compress = _format(path, format, compress)
+    if format == JSONL:
+        for record in _read_jsonl(path, compress):
+            yield (record["order_id"], record["customer_id"], float(record["timestamp"]), record["menu_version"],
+                   [(line["item"], line["category"], line["quantity"], Money.of(line["price"]))
+                    for line in record["lines"]])
+        return
+
+    # Few distinct prices recur on every line, so each is parsed once
+    parsed = _Memo(Money.parse)
+    current = None
+    lines: List[Tuple[str, str, int, Money]] = []
+    for order_id, customer_id, timestamp, menu_version, name, category, quantity, price in _read_csv(
+            path, compress, ORDER_FIELDS):
+        if order_id != current:
+            if current is not None:
+                yield int(current), owner, float(placed_at), int(version), lines
+            current, owner, placed_at, version = order_id, customer_id, timestamp, menu_version
+            lines = []
+        if quantity != "0":
+            lines.append((name, category, int(quantity), parsed[price]))
+    if current is not None:
+        yield int(current), owner, float(placed_at), int(version), lines
+
+
+def import_customers(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                     compress: Optional[bool] = None) -> int:
+    """Register the customers in an export, balances included.
+
+    Args:
+        restaurant: The restaurant object, without an operation log
+        path: Path of the file to read
+        format: CSV or JSONL, by default from the file name
+        compress: Whether the file is gzipped, by default if the name ends in .gz
+
+    Returns:
+        The number of customers imported
+    """
+    return restaurant.restore_customers(read_customers(path, format, compress))
+
+
+def import_menu(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                compress: Optional[bool] = None) -> int:
+    """Add the menu items in an export, replacing items of the same name.
+
+    Args:
+        restaurant: The restaurant object, without an operation log
+        path: Path of the file to read
+        format: CSV or JSONL, by default from the file name
+        compress: Whether the file is gzipped, by default if the name ends in .gz
+
+    Returns:
+        The number of items imported
+    """
+    return restaurant.restore_menu_items(read_menu(path, format, compress))
+
+
+def import_orders(restaurant: Restaurant, path: str, format: Optional[str] = None,
+                  compress: Optional[bool] = None) -> int:
+    """Add the orders in an export to their customers' history, without debiting them.
+
+    Args:
+        restaurant: The restaurant object, without an operation log,
+            holding every customer the orders name
+        path: Path of the file to read
+        format: CSV or JSONL, by default from the file name
+        compress: Whether the file is gzipped, by default if the name ends in .gz
+
+    Returns:
+        The number of orders imported
+    """
+    return restaurant.restore_orders(read_orders(path, format, compress))
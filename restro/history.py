@@ -0,0 +1,160 @@
+"""
+Module containing the time-ordered order histories of the restaurant management system.
+
+An OrderHistory is a list of orders kept sorted by the time they were
+placed, with the times alongside in an array of epoch seconds:
+
+    orders  the Order objects, oldest first
+    times   f64   when each was placed, in epoch seconds
+
+so the orders placed between two moments are two bisects away, and
+pages of the newest orders are slices, however long the history. Orders
+nearly always arrive in time order and are appended; one dated before
+the last (a replayed, restored or backdated order) is inserted at its
+place, after any placed at the same moment.
+
+Each customer keeps one history of their orders. A restaurant builds
+one more of every customer's orders on first use, the time index behind
+`Restaurant.orders_between` and `Restaurant.order_page`, unless a SQLite
+backend answers those from its database.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from operator import attrgetter
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .ledger import epoch_seconds
+from .models import Order
+
+_created = attrgetter("_created")
+
+
+class OrderHistory(list):
+    """A list of orders sorted by the time they were placed.
+
+    Read it as a list. Orders are only added with `append` and `extend`,
+    and taken out with `discard`, which keep it sorted; other list
+    mutations would not. Like a Ledger, a history does no locking; its
+    owner serializes changes and queries.
+    """
+
+    __slots__ = ("_times",)
+
+    def __init__(self, orders: Iterable[Order] = ()):
+        """Build a history.
+
+        Args:
+            orders: Initial orders, in any order
+        """
+        # sorted() is stable, so orders placed at one moment keep their order
+        list.__init__(self, sorted(orders, key=_created))
+        # Histories start empty by the million, so the array comes with the first order
+        self._times = array('d', map(_created, self)) if self else ()
+
+    def append(self, order: Order):
+        """Add an order at its place in time.
+
+        Args:
+            order: The order
+        """
+        times = self._times
+        timestamp = order._created
+        if not times:
+            list.append(self, order)
+            self._times = array('d', (timestamp,))
+        elif timestamp >= times[-1]:
+            list.append(self, order)
+            times.append(timestamp)
+        else:
+            index = bisect_right(times, timestamp)
+            list.insert(self, index, order)
+            times.insert(index, timestamp)
+
+    def extend(self, orders: Iterable[Order]):
+        for order in orders:
+            self.append(order)
+
+    def __iadd__(self, orders: Iterable[Order]) -> "OrderHistory":
+        self.extend(orders)
+        return self
+
+    def discard(self, orders: Iterable[Order]):
+        """Take orders out of the history, ignoring any not in it.
+
+        Args:
+            orders: The orders, matched by ID
+        """
+        for order in orders:
+            index = self._position(order)
+            if index is not None:
+                list.__delitem__(self, index)
+                del self._times[index]
+
+    def _position(self, order: Order) -> Optional[int]:
+        """Find the index of an order, by ID among those placed at its moment."""
+        times = self._times
+        timestamp = order._created
+        for index in range(bisect_left(times, timestamp), bisect_right(times, timestamp)):
+            if list.__getitem__(self, index).id == order.id:
+                return index
+        return None
+
+    def _span(self, start: Union[datetime, float, None], end: Union[datetime, float, None]) -> Tuple[int, int]:
+        """Get the index range of the orders placed from `start` up to `end`."""
+        times = self._times
+        low = 0 if start is None else bisect_left(times, epoch_seconds(start))
+        high = len(times) if end is None else bisect_left(times, epoch_seconds(end))
+        return low, max(low, high)
+
+    def between(self, start: Union[datetime, float, None] = None, end: Union[datetime, float, None] = None,
+                newest_first: bool = False) -> Iterator[Order]:
+        """Iterate over the orders placed in a span of time, without copying the history.
+
+        The history must not change while the iterator is in use.
+
+        Args:
+            start: First moment of the span, as a datetime or epoch
+                seconds, or None from the first order
+            end: Moment the span ends, itself excluded, or None up to
+                the last order
+            newest_first: Whether to go from the newest order back
+
+        Returns:
+            An iterator over the orders
+        """
+        low, high = self._span(start, end)
+        positions = range(high - 1, low - 1, -1) if newest_first else range(low, high)
+        return map(self.__getitem__, positions)
+
+    def count_between(self, start: Union[datetime, float, None] = None,
+                      end: Union[datetime, float, None] = None) -> int:
+        """Count the orders placed in a span of time, as `between` yields them."""
+        low, high = self._span(start, end)
+        return high - low
+
+    def page(self, before: Optional[Order] = None, limit: int = 20) -> Tuple[List[Order], Optional[Order]]:
+        """Get a page of orders, newest first.
+
+        Args:
+            before: Cursor returned with the previous page, or None for
+                the newest page
+            limit: Most orders on the page
+
+        Returns:
+            The orders, and the cursor of the next page, None after the
+            last page
+
+        Raises:
+            ValueError: If the cursor is not an order of this history
+        """
+        if before is None:
+            high = len(self)
+        else:
+            high = self._position(before)
+            if high is None:
+                raise ValueError(f"Order {before.order_id} is not in this history")
+        low = max(0, high - limit)
+        orders = list.__getitem__(self, slice(low, high))
+        orders.reverse()
+        return orders, orders[-1] if low and orders else None
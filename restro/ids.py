@@ -0,0 +1,90 @@
+"""
+Module containing the ID generators for the restaurant management system.
+
+IDs are 63-bit integers laid out Snowflake-style:
+
+    41 bits  milliseconds since ID_EPOCH
+    10 bits  worker ID
+    12 bits  sequence within the millisecond
+
+so they sort by creation time, stay unique across threads through a lock
+and across processes through distinct worker IDs, and cost no string
+formatting until they are displayed.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+# 2024-01-01T00:00:00Z in milliseconds since the Unix epoch
+ID_EPOCH_MS = 1_704_067_200_000
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class SnowflakeIdGenerator:
+    """Generates unique, time-ordered integer IDs.
+
+    Any object with a `next_id() -> int` method can stand in for this
+    class wherever an ID generator is accepted.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        """Initialize a generator.
+
+        Args:
+            worker_id: ID from 0 to 1023 unique among the processes sharing
+                an ID space. Defaults to one derived from the process ID,
+                re-derived in forked children; pass explicit IDs when
+                processes must never collide.
+        """
+        self._derived = worker_id is None
+        if worker_id is None:
+            worker_id = os.getpid() & MAX_WORKER_ID
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        """Return a new ID, greater than every ID this generator returned before."""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back: keep counting
+                # from the last millisecond used, borrowing the next one when
+                # its sequence runs out
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def _reset_after_fork(self):
+        """Give a forked child its own worker ID and a fresh lock."""
+        self._lock = threading.Lock()
+        if self._derived:
+            self.worker_id = os.getpid() & MAX_WORKER_ID
+
+
+def id_timestamp(generated_id: int) -> float:
+    """Return the creation time of an ID in epoch seconds (millisecond precision)."""
+    return ((generated_id >> (WORKER_BITS + SEQUENCE_BITS)) + ID_EPOCH_MS) / 1000
+
+
+_default_generator = SnowflakeIdGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_default_generator._reset_after_fork)
+
+
+def default_generator() -> SnowflakeIdGenerator:
+    """Return the process-wide generator used when none is configured."""
+    return _default_generator
@@ -1,21 +1,44 @@
 """
 Module for creating an interactive interface for the restaurant management system.
 """
+import re
 import sys
-from typing import List, Optional
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import List, Optional, Tuple
 
 from .admin import Admin
+from .analytics import this_week
 from .customer import Customer
 from .models import MenuItem
+from .money import Money, ZERO
 from .restaurant import Restaurant
 
+try:
+    import readline
+except ImportError:  # not available on every platform
+    readline = None
+
+# Customers listed per screen
+CUSTOMER_PAGE_SIZE = 20
+
+# Past orders shown per screen
+ORDER_PAGE_SIZE = 10
+
+# An order entry with a quantity, such as "Coffee x 10" or "coffee x10"
+QUANTITY_ENTRY = re.compile(r"(.*\S)\s+[xX]\s*(\d+)")
+
 
 class Interface:
     """User interface for the restaurant management system."""
     
-    def __init__(self):
-        """Initialize the interface."""
-        self.restaurant = Restaurant("Delicious Eats")
+    def __init__(self, restaurant: Optional[Restaurant] = None):
+        """Initialize the interface.
+        
+        Args:
+            restaurant: The restaurant to manage, a new one if not given
+        """
+        self.restaurant = restaurant if restaurant is not None else Restaurant("Delicious Eats")
         self.admin = Admin("admin", "admin123")
         self.current_customer: Optional[Customer] = None
         
@@ -49,9 +72,11 @@ class Interface:
             print("4. View Menu")
             print("5. View All Customers")
             print("6. Remove Customer")
-            print("7. Logout")
+            print("7. View Sales Report")
+            print("8. Search Customers")
+            print("9. Logout")
             
-            choice = input("Enter your choice (1-7): ")
+            choice = input("Enter your choice (1-9): ")
             
             if choice == "1":
                 self.add_menu_item()
@@ -66,6 +91,10 @@ class Interface:
             elif choice == "6":
                 self.remove_customer()
             elif choice == "7":
+                self.view_sales_report()
+            elif choice == "8":
+                self.search_customers()
+            elif choice == "9":
                 print("Logging out...")
                 break
             else:
@@ -77,14 +106,13 @@ class Interface:
         name = input("Enter item name: ")
         
         # Check if item already exists
-        for item in self.restaurant.get_menu():
-            if item.name.lower() == name.lower():
-                print("An item with this name already exists.")
-                return
+        if self.restaurant.find_menu_item(name) is not None:
+            print("An item with this name already exists.")
+            return
         
         try:
-            price = float(input("Enter item price: $"))
-            if price <= 0:
+            price = Money.parse(input("Enter item price: $"))
+            if price <= ZERO:
                 print("Price must be positive.")
                 return
         except ValueError:
@@ -123,8 +151,8 @@ class Interface:
         name = input("Enter the name of the item to update: ")
         
         try:
-            new_price = float(input("Enter the new price: $"))
-            if new_price <= 0:
+            new_price = Money.parse(input("Enter the new price: $"))
+            if new_price <= ZERO:
                 print("Price must be positive.")
                 return
         except ValueError:
@@ -144,29 +172,49 @@ class Interface:
             print("The menu is empty.")
             return
         
-        print("\n===== Restaurant Menu =====")
-        for i, item in enumerate(menu, 1):
-            print(f"{i}. {item}")
+        # The text is kept with the menu version; write it out in one go
+        sys.stdout.write(f"\n===== Restaurant Menu =====\n{menu.render()}")
     
-    def view_all_customers(self):
-        """Display all registered customers."""
-        customers = self.admin.view_customers(self.restaurant)
+    def view_all_customers(self) -> bool:
+        """Display registered customers a page at a time.
+        
+        Returns:
+            True if there are any customers
+        """
+        customers, cursor = self.admin.view_customers_page(self.restaurant, None, CUSTOMER_PAGE_SIZE)
         
         if not customers:
             print("No customers registered.")
-            return
+            return False
         
         print("\n===== Registered Customers =====")
+        shown = 0
+        while True:
+            for shown, customer in enumerate(customers, shown + 1):
+                print(f"{shown}. {customer}")
+            if cursor is None or input("Press Enter for more, or q to stop: ").strip().lower() == "q":
+                return True
+            customers, cursor = self.admin.view_customers_page(self.restaurant, cursor, CUSTOMER_PAGE_SIZE)
+    
+    def search_customers(self):
+        """Find customers by email or by the start of their name."""
+        print("\n===== Search Customers =====")
+        query = input("Enter an email or the start of a name: ").strip()
+        if not query:
+            print("Nothing to search for.")
+            return
+        
+        customers = self.admin.search_customers(self.restaurant, query, CUSTOMER_PAGE_SIZE)
+        if not customers:
+            print("No matching customers.")
+            return
         for i, customer in enumerate(customers, 1):
             print(f"{i}. {customer}")
     
     def remove_customer(self):
         """Remove a customer account."""
         print("\n===== Remove Customer =====")
-        self.view_all_customers()
-        
-        customers = self.admin.view_customers(self.restaurant)
-        if not customers:
+        if not self.view_all_customers():
             return
         
         customer_id = input("Enter the Customer ID to remove: ")
@@ -175,6 +223,23 @@ class Interface:
         else:
             print(f"Customer with ID '{customer_id}' not found.")
     
+    def view_sales_report(self):
+        """Display today's revenue by category and this week's best sellers."""
+        print("\n===== Sales Report =====")
+        revenue = self.admin.revenue_by_category(self.restaurant, date.today())
+        print("Revenue by category today:")
+        if not revenue:
+            print("  No sales yet today.")
+        for category, amount in sorted(revenue.items()):
+            print(f"  {category}: ${amount:.2f}")
+        
+        best = self.admin.top_selling_items(self.restaurant, 10, *this_week())
+        print("Top items this week:")
+        if not best:
+            print("  No sales yet this week.")
+        for i, (item, units, amount) in enumerate(best, 1):
+            print(f"  {i}. {item.name} - {units} sold, ${amount:.2f}")
+    
     def customer_login(self):
         """Handle customer login."""
         print("\n===== Customer Login =====")
@@ -196,6 +261,9 @@ class Interface:
         address = input("Enter your address: ")
         
         customer = self.admin.add_customer(self.restaurant, name, email, address)
+        if customer is None:
+            print("A customer with this email is already registered.")
+            return
         print(f"Registration successful! Your Customer ID is: {customer.customer_id}")
         print("Please remember this ID for future logins.")
         
@@ -240,36 +308,125 @@ class Interface:
         
         print(f"Your balance: ${self.current_customer.check_balance():.2f}")
         
-        item_names: List[str] = []
-        while True:
-            item_name = input("Enter item name to add to order (or 'done' to finish): ")
-            if item_name.lower() == 'done':
-                break
-            item_names.append(item_name)
-        
-        if not item_names:
+        entries: List[Tuple[str, int]] = []
+        with self.menu_completion():
+            while True:
+                entry = input("Enter item name, or 'name x qty', to add to order (or 'done' to finish): ")
+                if entry.lower() == 'done':
+                    break
+                item_name, quantity = self.split_quantity(entry)
+                if quantity < 1:
+                    print("Quantity must be at least 1.")
+                    continue
+                item_name = self.resolve_item_name(item_name)
+                if item_name is not None:
+                    entries.append((item_name, quantity))
+        
+        if not entries:
             print("No items selected.")
             return
         
-        order = self.current_customer.place_order(self.restaurant, item_names)
+        try:
+            order = self.current_customer.place_order(self.restaurant, entries)
+        except ValueError as error:
+            print(f"{error}.")
+            return
         if order:
             print("Order placed successfully:")
             print(order)
+            kitchen = self.restaurant.kitchen
+            ready = None if kitchen is None else kitchen.ready_at(order.id)
+            if ready is not None:
+                print(f"Estimated ready at {datetime.fromtimestamp(ready):%H:%M}")
             print(f"Remaining balance: ${self.current_customer.check_balance():.2f}")
     
+    def split_quantity(self, entry: str) -> Tuple[str, int]:
+        """Split an order entry into an item name and a quantity.
+        
+        Args:
+            entry: An item name, or "name x qty"; an item actually named
+                like "name x qty" is taken as it is
+            
+        Returns:
+            The item name and the quantity, 1 when none is given
+        """
+        match = QUANTITY_ENTRY.fullmatch(entry.strip())
+        if match is None or self.restaurant.find_menu_item(entry) is not None:
+            return entry, 1
+        return match.group(1), int(match.group(2))
+    
+    def resolve_item_name(self, item_name: str) -> Optional[str]:
+        """Check an entered item name, offering close matches for a typo.
+        
+        Args:
+            item_name: Name as entered
+            
+        Returns:
+            The name to add to the order, or None to skip it
+        """
+        if self.restaurant.find_menu_item(item_name) is not None:
+            return item_name
+        
+        suggestions = self.restaurant.suggest_menu_items(item_name)
+        if not suggestions:
+            print(f"Item '{item_name}' not found in menu.")
+            return None
+        
+        print(f"Item '{item_name}' not found. Did you mean:")
+        for i, item in enumerate(suggestions, 1):
+            print(f"  {i}. {item}")
+        choice = input("Enter a number to add it, or press Enter to skip: ")
+        if choice.isdigit() and 1 <= int(choice) <= len(suggestions):
+            return suggestions[int(choice) - 1].name
+        return None
+    
+    @contextmanager
+    def menu_completion(self):
+        """Complete menu item names with Tab while the block runs."""
+        if readline is None:
+            yield
+            return
+        
+        matches: List[str] = []
+        
+        def complete(text: str, state: int) -> Optional[str]:
+            if state == 0:
+                matches[:] = [item.name for item in self.restaurant.complete_menu_item(text)]
+            return matches[state] if state < len(matches) else None
+        
+        previous_completer = readline.get_completer()
+        previous_delims = readline.get_completer_delims()
+        readline.set_completer(complete)
+        # Item names contain spaces, so complete the whole line
+        readline.set_completer_delims("")
+        readline.parse_and_bind("tab: complete")
+        try:
+            yield
+        finally:
+            readline.set_completer(previous_completer)
+            readline.set_completer_delims(previous_delims)
+    
     def view_order_history(self):
         """View customer's order history."""
-        orders = self.current_customer.view_orders()
+        customer = self.current_customer
+        orders, cursor = customer.order_page(None, ORDER_PAGE_SIZE)
         
         if not orders:
             print("You have no past orders.")
             return
         
-        print("\n===== Your Order History =====")
-        for i, order in enumerate(orders, 1):
-            print(f"Order #{i}:")
-            print(order)
-            print("---")
+        # Newest first, each numbered by its place in the whole history
+        number = len(customer.orders)
+        heading = "\n===== Your Order History =====\n"
+        while True:
+            # Each order keeps its text, so this only joins the page for one write
+            sys.stdout.write(heading + "".join([f"Order #{n}:\n{order}\n---\n"
+                                                for n, order in zip(range(number, 0, -1), orders)]))
+            number -= len(orders)
+            heading = ""
+            if cursor is None or input("Press Enter for older orders, or q to stop: ").strip().lower() == "q":
+                return
+            orders, cursor = customer.order_page(cursor, ORDER_PAGE_SIZE)
     
     def add_funds(self):
         """Add funds to customer's balance."""
@@ -277,8 +434,8 @@ class Interface:
         print(f"Current balance: ${self.current_customer.check_balance():.2f}")
         
         try:
-            amount = float(input("Enter amount to add: $"))
-            if amount <= 0:
+            amount = Money.parse(input("Enter amount to add: $"))
+            if amount <= ZERO:
                 print("Amount must be positive.")
                 return
         except ValueError:
@@ -0,0 +1,422 @@
+"""
+Module containing the kitchen dispatch of the restaurant management system.
+
+A placed order is split into one ticket per station: the lines of each
+item go to the station of the item's category, such as Food or Drink,
+and categories without a station of their own go to the first station.
+A ticket takes the prep time of each of its units, one after another,
+on one of its station's cooks; the order is ready when its last ticket
+is.
+
+Whenever a cook is free, the station starts the waiting ticket with the
+lowest priority key, without preempting tickets already started. The
+key of a ticket is
+
+    prep_seconds + aging * submitted_at
+
+which ranks the waiting tickets at any moment by prep time less `aging`
+times the time waited, the waiting term being common to all of them;
+the keys never change, so they sit in a heap. Quick tickets overtake
+slow ones, keeping latency low, but only tickets submitted less than
+prep_seconds / aging after a ticket can overtake it, so none starves.
+An aging of 0 is shortest job first, and a large one first come, first
+served, which also settles ties.
+
+The ready time of a waiting ticket is estimated by running its
+station's cooks forward over the tickets ranked ahead of it; tickets
+submitted later that overtake it can only push it back. Estimates are
+made only when asked for, by `submit` or `ready_at`; orders a
+restaurant places are only queued with `enqueue`.
+
+A kitchen has no clock of its own: it advances to the time each order
+was placed, or to an explicit `now`. `attach_kitchen` dispatches every
+order a restaurant places from then on, and `simulate` replays recorded
+orders through a kitchen, a day's worth in seconds, to size stations and
+measure throughput and queueing latency.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .locks import NO_LOCK
+from .models import MenuItem, Order
+
+# Cooks per station, by the category the station prepares
+DEFAULT_STATIONS: Dict[str, int] = {"Food": 3, "Drink": 2}
+# Prep seconds per unit of items without a prep time of their own, by category
+DEFAULT_PREP_SECONDS: Dict[str, float] = {"Food": 600.0, "Drink": 120.0}
+# Prep seconds per unit of items of any other category
+FALLBACK_PREP_SECONDS = 300.0
+# Seconds of prep time one second of waiting is worth in a ticket's priority
+DEFAULT_AGING = 1.0
+
+
+class _Ticket:
+    """The part of one order prepared at one station."""
+
+    __slots__ = ("order_id", "prep", "submitted", "key", "sequence", "finish")
+
+    def __init__(self, order_id: int, prep: float, submitted: float, key: float, sequence: int):
+        self.order_id = order_id
+        self.prep = prep
+        self.submitted = submitted
+        self.key = key
+        self.sequence = sequence
+        # Set when a cook starts the ticket
+        self.finish: Optional[float] = None
+
+
+class Station:
+    """The cooks preparing the items of one category, and their queue."""
+
+    def __init__(self, name: str, capacity: int):
+        """Initialize an idle station.
+
+        Args:
+            name: The category the station prepares
+            capacity: Number of tickets prepared at once
+
+        Raises:
+            ValueError: If the capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError(f"Station '{name}' needs at least one cook")
+        self.name = name
+        self.capacity = capacity
+        # (priority key, sequence, ticket) of tickets waiting for a cook
+        self._waiting: List[Tuple[float, int, _Ticket]] = []
+        # (finish time, sequence, ticket) of tickets being prepared
+        self._running: List[Tuple[float, int, _Ticket]] = []
+        self.tickets = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.max_queue = 0
+
+    @property
+    def queued(self) -> int:
+        """Number of tickets waiting for a cook."""
+        return len(self._waiting)
+
+    @property
+    def busy(self) -> int:
+        """Number of tickets being prepared."""
+        return len(self._running)
+
+    def _start(self, ticket: _Ticket, at: float):
+        """Give a ticket to a free cook at a given time."""
+        ticket.finish = finish = at + ticket.prep
+        wait = at - ticket.submitted
+        self.tickets += 1
+        self.busy_seconds += ticket.prep
+        self.wait_seconds += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        heapq.heappush(self._running, (finish, ticket.sequence, ticket))
+
+    def _estimate(self, ticket: _Ticket) -> float:
+        """Estimate when a waiting ticket will be ready, barring later arrivals."""
+        ahead = sorted(entry for entry in self._waiting if (entry[0], entry[1]) < (ticket.key, ticket.sequence))
+        # Every cook is busy while tickets wait; each ticket ahead takes the first one free
+        cooks = [finish for finish, _, _ in self._running]
+        heapq.heapify(cooks)
+        for _, _, other in ahead:
+            heapq.heapreplace(cooks, cooks[0] + other.prep)
+        return cooks[0] + ticket.prep
+
+
+class Kitchen:
+    """Dispatches orders to stations and estimates when they will be ready."""
+
+    def __init__(self, stations: Optional[Dict[str, int]] = None,
+                 prep_seconds: Optional[Dict[str, float]] = None,
+                 aging: float = DEFAULT_AGING, thread_safe: bool = False):
+        """Initialize an idle kitchen.
+
+        Args:
+            stations: Cooks per station by category, DEFAULT_STATIONS if
+                not given; the first station also takes the categories
+                without a station
+            prep_seconds: Prep seconds per unit by item name; other items
+                take DEFAULT_PREP_SECONDS for their category
+            aging: Seconds of prep time one second of waiting is worth in
+                a ticket's priority
+            thread_safe: Whether orders will be submitted from several threads
+
+        Raises:
+            ValueError: If there are no stations, a station has no cooks,
+                or aging is negative
+        """
+        if stations is None:
+            stations = DEFAULT_STATIONS
+        if not stations:
+            raise ValueError("A kitchen needs at least one station")
+        if aging < 0:
+            raise ValueError("Aging must not be negative")
+        self.stations: Dict[str, Station] = {name: Station(name, capacity) for name, capacity in stations.items()}
+        self._default_station = next(iter(self.stations.values()))
+        self._prep_seconds: Dict[str, float] = dict(prep_seconds or {})
+        # (station, prep seconds per unit) by item ID, resolved on first sight
+        self._routes: Dict[int, Tuple[Station, float]] = {}
+        self.aging = aging
+        self._lock = threading.Lock() if thread_safe else NO_LOCK
+        # Time the kitchen has advanced to, and when the first order came in
+        self._clock = -math.inf
+        self._opened: Optional[float] = None
+        self._sequence = 0
+        # [tickets not ready, latest finish, submitted at, [(station, ticket)]] by order ID
+        self._pending: Dict[int, list] = {}
+        self.completed = 0
+        # Seconds from submission to ready of each completed order
+        self._latencies = array('d')
+
+    def set_prep_time(self, item_name: str, seconds: float):
+        """Set the prep time per unit of an item, for orders submitted from now on.
+
+        Args:
+            item_name: Name of the menu item
+            seconds: Prep seconds per unit
+        """
+        with self._lock:
+            self._prep_seconds[item_name] = seconds
+            self._routes.clear()
+
+    def _route(self, item: MenuItem) -> Tuple[Station, float]:
+        """Resolve the station and prep time of an item."""
+        station = self.stations.get(item.category, self._default_station)
+        prep = self._prep_seconds.get(item.name)
+        if prep is None:
+            prep = DEFAULT_PREP_SECONDS.get(item.category, FALLBACK_PREP_SECONDS)
+        route = self._routes[item.item_id] = (station, prep)
+        return route
+
+    def submit(self, order: Order, now: Optional[float] = None) -> float:
+        """Queue an order's tickets at their stations.
+
+        Args:
+            order: The order that was placed
+            now: When the kitchen receives it, in epoch seconds, defaults
+                to when the order was placed
+
+        Returns:
+            The estimated time the order will be ready, in epoch seconds
+        """
+        with self._lock:
+            pending = self._enqueue(order, order._created if now is None else now)
+            return self._estimate(pending)
+
+    def enqueue(self, order: Order, now: Optional[float] = None):
+        """Queue an order's tickets at their stations, without estimating when it will be ready.
+
+        Args:
+            order: The order that was placed
+            now: When the kitchen receives it, in epoch seconds, defaults
+                to when the order was placed
+        """
+        with self._lock:
+            self._enqueue(order, order._created if now is None else now)
+
+    def _enqueue(self, order: Order, at: float) -> list:
+        """Split an order into station tickets at a given time, returning its pending entry."""
+        if at < self._clock:
+            at = self._clock
+        self._advance(at)
+        if self._opened is None:
+            self._opened = at
+
+        # Total the prep time of each station's part of the order
+        routes = self._routes
+        prep_by_station: Dict[Station, float] = {}
+        for item, quantity, _ in order._iter_lines():
+            route = routes.get(item.item_id)
+            if route is None:
+                route = self._route(item)
+            station, prep = route
+            prep_by_station[station] = prep_by_station.get(station, 0.0) + prep * quantity
+
+        tickets = []
+        pending = [len(prep_by_station), at, at, tickets]
+        if not prep_by_station:
+            # Nothing to prepare
+            self._complete(pending)
+            return pending
+        self._pending[order.id] = pending
+        aging = self.aging
+        for station, prep in prep_by_station.items():
+            ticket = _Ticket(order.id, prep, at, prep + aging * at, self._sequence)
+            self._sequence += 1
+            tickets.append((station, ticket))
+            if len(station._running) < station.capacity:
+                station._start(ticket, at)
+            else:
+                heapq.heappush(station._waiting, (ticket.key, ticket.sequence, ticket))
+                if len(station._waiting) > station.max_queue:
+                    station.max_queue = len(station._waiting)
+        return pending
+
+    def _advance(self, until: float):
+        """Finish every ticket due by a given time, starting waiting ones as cooks free up."""
+        for station in self.stations.values():
+            running = station._running
+            waiting = station._waiting
+            while running and running[0][0] <= until:
+                finish, _, ticket = heapq.heappop(running)
+                self._finish(ticket)
+                if waiting:
+                    station._start(heapq.heappop(waiting)[2], finish)
+        if until > self._clock:
+            self._clock = until
+
+    def _finish(self, ticket: _Ticket):
+        """Count a ready ticket towards its order."""
+        pending = self._pending[ticket.order_id]
+        pending[0] -= 1
+        if ticket.finish > pending[1]:
+            pending[1] = ticket.finish
+        if pending[0] == 0:
+            del self._pending[ticket.order_id]
+            self._complete(pending)
+
+    def _complete(self, pending: list):
+        """Record a ready order."""
+        self.completed += 1
+        self._latencies.append(pending[1] - pending[2])
+
+    def _estimate(self, pending: list) -> float:
+        """Estimate when a pending order will be ready."""
+        ready = pending[1]
+        for station, ticket in pending[3]:
+            finish = ticket.finish if ticket.finish is not None else station._estimate(ticket)
+            if finish > ready:
+                ready = finish
+        return ready
+
+    def ready_at(self, order_id: int, now: Optional[float] = None) -> Optional[float]:
+        """Estimate when an order will be ready.
+
+        Args:
+            order_id: Numeric ID of the order
+            now: Time to advance the kitchen to first, in epoch seconds,
+                defaults to the current time
+
+        Returns:
+            The estimated ready time in epoch seconds, or None if the
+            order is ready or was never submitted
+        """
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            pending = self._pending.get(order_id)
+            return None if pending is None else self._estimate(pending)
+
+    def advance(self, now: Optional[float] = None):
+        """Finish every ticket due by a given time.
+
+        Args:
+            now: Time to advance to, in epoch seconds, defaults to the
+                current time
+        """
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+
+    def drain(self) -> float:
+        """Run every queued ticket to completion.
+
+        Returns:
+            The time the last order became ready, in epoch seconds
+        """
+        with self._lock:
+            while self._pending:
+                # Each pass finishes the earliest running tickets and starts the next
+                self._advance(min(station._running[0][0] for station in self.stations.values()
+                                  if station._running))
+            return self._clock
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize throughput, latency and station load so far.
+
+        Returns:
+            {"orders", "pending", "seconds", "orders_per_hour", "latency",
+            "stations"}: "latency" holds the mean, p50, p95, p99 and max
+            seconds from submission to ready of completed orders, and
+            "stations" holds each station's "capacity", "tickets",
+            "utilization", "mean_wait", "max_wait", "max_queue" and
+            "queued", waits in seconds
+        """
+        with self._lock:
+            span = 0.0 if self._opened is None else self._clock - self._opened
+            latencies = sorted(self._latencies)
+            count = len(latencies)
+
+            def percentile(fraction: float) -> float:
+                return latencies[max(0, math.ceil(fraction * count) - 1)] if count else 0.0
+
+            stations = {
+                name: {
+                    "capacity": station.capacity,
+                    "tickets": station.tickets,
+                    "utilization": station.busy_seconds / (station.capacity * span) if span else 0.0,
+                    "mean_wait": station.wait_seconds / station.tickets if station.tickets else 0.0,
+                    "max_wait": station.max_wait,
+                    "max_queue": station.max_queue,
+                    "queued": len(station._waiting),
+                }
+                for name, station in self.stations.items()
+            }
+            return {
+                "orders": self.completed,
+                "pending": len(self._pending),
+                "seconds": span,
+                "orders_per_hour": self.completed / span * 3600 if span else 0.0,
+                "latency": {
+                    "mean": sum(latencies) / count if count else 0.0,
+                    "p50": percentile(0.50),
+                    "p95": percentile(0.95),
+                    "p99": percentile(0.99),
+                    "max": latencies[-1] if count else 0.0,
+                },
+                "stations": stations,
+            }
+
+
+def attach_kitchen(restaurant, kitchen: Optional[Kitchen] = None) -> Kitchen:
+    """Dispatch every order a restaurant places from now on to a kitchen.
+
+    Args:
+        restaurant: The restaurant object
+        kitchen: The kitchen, one with the default stations if not given
+
+    Returns:
+        The attached Kitchen
+    """
+    if kitchen is None:
+        kitchen = Kitchen(thread_safe=restaurant.thread_safe)
+    restaurant.kitchen = kitchen
+    return kitchen
+
+
+def simulate(orders: Iterable[Order], stations: Optional[Dict[str, int]] = None,
+             prep_seconds: Optional[Dict[str, float]] = None,
+             aging: float = DEFAULT_AGING) -> Dict[str, Any]:
+    """Replay recorded orders through a kitchen at the times they were placed.
+
+    Only the orders' events are processed, so a day of orders replays in
+    seconds.
+
+    Args:
+        orders: The orders, in any order
+        stations: Cooks per station, as for Kitchen
+        prep_seconds: Prep seconds per unit by item name, as for Kitchen
+        aging: Priority weight of waiting time, as for Kitchen
+
+    Returns:
+        The kitchen's report once every order is ready, see Kitchen.report
+    """
+    kitchen = Kitchen(stations, prep_seconds, aging)
+    # Nobody waits on the estimates, so skip them
+    for order in sorted(orders, key=lambda order: order._created):
+        kitchen._enqueue(order, order._created)
+    kitchen.drain()
+    return kitchen.report()
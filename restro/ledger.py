@@ -0,0 +1,189 @@
+"""
+Module containing the append-only money ledger of the restaurant management system.
+
+Every change to a customer's balance is one ledger entry, held in
+parallel arrays rather than one object per entry:
+
+    times       f64   when the entry took effect, in epoch seconds
+    amounts     i64   signed amount in cents, deposits positive
+    kinds       u8    DEPOSIT, ORDER, ADJUSTMENT or CLOSURE
+    references  u64   ID of the order an ORDER entry pays for, else 0
+    balances    i64   running balance after the entry, in cents
+
+Entries are kept in time order with their running balances, so the
+balance at any moment is one bisect. Entries nearly always arrive in
+time order and extend the running balances as they go; an entry dated
+before the last one (a replayed or backdated order, or one from a
+thread that took its time just before another's) is inserted at its
+place with a bisect, and the next point-in-time query recomputes the
+running balances from the earliest such place on.
+
+A restaurant keeps one more ledger of every customer entry, plus a
+CLOSURE entry when a customer is removed, whose balance is the total
+the restaurant owes its customers.
+"""
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from itertools import accumulate, chain, islice
+from typing import Iterator, Tuple, Union
+
+from .money import Money, ZERO
+
+# Entry kinds
+DEPOSIT = 0
+ORDER = 1
+ADJUSTMENT = 2
+CLOSURE = 3
+
+KIND_NAMES = ("deposit", "order", "adjustment", "closure")
+
+
+def epoch_seconds(when: Union[datetime, float]) -> float:
+    """Convert a datetime, or epoch seconds, to epoch seconds."""
+    return when.timestamp() if isinstance(when, datetime) else float(when)
+
+
+class LedgerEntry:
+    """One ledger entry, as read back from a Ledger."""
+
+    __slots__ = ("timestamp", "amount", "kind", "reference", "balance")
+
+    def __init__(self, timestamp: datetime, amount: Money, kind: int, reference: int, balance: Money):
+        """Initialize a ledger entry.
+
+        Args:
+            timestamp: When the entry took effect
+            amount: Signed amount, positive for money coming in
+            kind: One of DEPOSIT, ORDER, ADJUSTMENT or CLOSURE
+            reference: ID of the order an ORDER entry pays for, else 0
+            balance: Balance after the entry
+        """
+        self.timestamp = timestamp
+        self.amount = amount
+        self.kind = kind
+        self.reference = reference
+        self.balance = balance
+
+    def __repr__(self) -> str:
+        return (f"LedgerEntry({self.timestamp:%Y-%m-%d %H:%M:%S}, {KIND_NAMES[self.kind]}, "
+                f"{self.amount}, balance {self.balance})")
+
+
+class Ledger:
+    """Append-only ledger of signed amounts with point-in-time balances.
+
+    A ledger does no locking; its owner serializes appends and queries.
+    """
+
+    __slots__ = ("_times", "_amounts", "_kinds", "_references", "_balances", "total", "_stale")
+
+    def __init__(self):
+        """Initialize an empty ledger."""
+        self._times = array('d')
+        self._amounts = array('q')
+        self._kinds = array('B')
+        self._references = array('Q')
+        # Running balances, valid up to _stale
+        self._balances = array('q')
+        # Balance after every entry, in cents
+        self.total = 0
+        # Index of the first entry whose running balance is out of date, or None
+        self._stale = None
+
+    @classmethod
+    def from_columns(cls, times: array, amounts: array, kinds: array, references: array,
+                     balances: array) -> "Ledger":
+        """Rebuild a ledger from the arrays returned by `columns`.
+
+        Args:
+            times: Entry times, ascending
+            amounts: Entry amounts in cents
+            kinds: Entry kinds
+            references: Entry references
+            balances: Running balances in cents
+
+        Returns:
+            The Ledger object, which takes ownership of the arrays
+        """
+        ledger = cls.__new__(cls)
+        ledger._times = times
+        ledger._amounts = amounts
+        ledger._kinds = kinds
+        ledger._references = references
+        ledger._balances = balances
+        ledger.total = balances[-1] if balances else 0
+        ledger._stale = None
+        return ledger
+
+    def append(self, timestamp: float, cents: int, kind: int, reference: int = 0):
+        """Record an entry.
+
+        Args:
+            timestamp: When the entry took effect, in epoch seconds
+            cents: Signed amount in cents
+            kind: One of DEPOSIT, ORDER, ADJUSTMENT or CLOSURE
+            reference: ID of the order an ORDER entry pays for
+        """
+        times = self._times
+        total = self.total = self.total + cents
+        if not times or timestamp >= times[-1]:
+            if self._stale is None:
+                self._balances.append(total)
+            times.append(timestamp)
+            self._amounts.append(cents)
+            self._kinds.append(kind)
+            self._references.append(reference)
+            return
+        # After any entries made at the same moment, as a stable sort would put it
+        index = bisect_right(times, timestamp)
+        times.insert(index, timestamp)
+        self._amounts.insert(index, cents)
+        self._kinds.insert(index, kind)
+        self._references.insert(index, reference)
+        if self._stale is None or index < self._stale:
+            self._stale = index
+
+    @property
+    def balance(self) -> Money:
+        """Balance after every entry."""
+        return Money(self.total)
+
+    def balance_at(self, when: Union[datetime, float]) -> Money:
+        """Get the balance as of a moment, counting entries made at that moment.
+
+        Args:
+            when: The moment, as a datetime or epoch seconds
+
+        Returns:
+            The balance, zero before the first entry
+        """
+        if self._stale is not None:
+            self._rebalance()
+        index = bisect_right(self._times, epoch_seconds(when))
+        return Money(self._balances[index - 1]) if index else ZERO
+
+    def _rebalance(self):
+        """Recompute the running balances from the first out-of-date one on."""
+        stale = self._stale
+        balances = self._balances
+        start = balances[stale - 1] if stale else 0
+        balances[stale:] = array('q', islice(accumulate(chain((start,), self._amounts[stale:])), 1, None))
+        self._stale = None
+
+    def columns(self) -> Tuple[array, array, array, array, array]:
+        """Get the times, amounts, kinds, references and running balances, in time order.
+
+        The arrays are the ledger's own and must not be changed.
+        """
+        if self._stale is not None:
+            self._rebalance()
+        return self._times, self._amounts, self._kinds, self._references, self._balances
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __iter__(self) -> Iterator[LedgerEntry]:
+        """Yield the entries in time order."""
+        for timestamp, amount, kind, reference, balance in zip(*self.columns()):
+            yield LedgerEntry(datetime.fromtimestamp(timestamp), Money(amount), kind, reference, Money(balance))
@@ -0,0 +1,7 @@
+"""
+Module containing the locks used by the restaurant's concurrency-safe mode.
+"""
+from contextlib import nullcontext
+
+# Stand-in for a lock when a restaurant is not shared between threads
+NO_LOCK = nullcontext()
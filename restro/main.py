@@ -1,13 +1,96 @@
 """
 Main entry point for the Restaurant Management System application.
 """
+import argparse
+import asyncio
+import os
+import sys
+from typing import List, Optional
+
+from restro.admin import Admin
 from restro.interface import Interface
+from restro.restaurant import Restaurant
+from restro import batch, kitchen, metrics, service, snapshot, wal
+from restro.storage import SQLiteBackend
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Restaurant Management System")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="run the HTTP/JSON service instead of the interactive interface")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the commands in FILE ('-' for stdin) and print JSON results")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="binary snapshot to load state from at startup")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="on exit, write the snapshot and empty the log")
+    parser.add_argument("--log", metavar="PATH",
+                        help="operation log to recover state from and append to")
+    parser.add_argument("--sync-every", type=int, default=1, metavar="N",
+                        help="log records written per fsync (default: 1)")
+    parser.add_argument("--sync-delay", type=float, default=None, metavar="SECONDS",
+                        help="longest time a log record may stay unsynced")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record metrics and write them to PATH in the Prometheus text format")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, metavar="SECONDS",
+                        help="seconds between writes of the metrics file (default: 15)")
+    parser.add_argument("--storage", metavar="PATH",
+                        help="keep customers, orders and the menu in the SQLite database at PATH")
+    parser.add_argument("--kitchen", action="store_true",
+                        help="dispatch orders to kitchen stations and show when they will be ready")
+    args = parser.parse_args(argv)
+    if args.storage and (args.log or args.snapshot):
+        parser.error("--storage cannot be combined with --log or --snapshot")
+    if args.checkpoint and not args.snapshot:
+        parser.error("--checkpoint requires --snapshot")
+    return args
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Run the Restaurant Management System application."""
-    interface = Interface()
-    interface.run()
+    args = parse_args(argv)
+    if args.storage:
+        restaurant = Restaurant("Delicious Eats", storage=SQLiteBackend(args.storage))
+    elif args.snapshot and os.path.exists(args.snapshot):
+        restaurant = snapshot.load_snapshot(args.snapshot)
+    else:
+        restaurant = Restaurant("Delicious Eats")
+    if args.log:
+        wal.recover(restaurant, args.log, args.sync_every, args.sync_delay)
+    if args.kitchen:
+        kitchen.attach_kitchen(restaurant)
+    metrics_writer = None
+    if args.metrics:
+        metrics_writer = metrics.MetricsFileWriter(restaurant, args.metrics, args.metrics_interval)
+    
+    try:
+        if args.serve:
+            host, _, port = args.serve.rpartition(":")
+            api = service.RestaurantService(restaurant, Admin("admin", "admin123"))
+            print(f"Serving {restaurant.name} on {host or '127.0.0.1'}:{port}")
+            try:
+                asyncio.run(api.serve_forever(host or "127.0.0.1", int(port)))
+            except KeyboardInterrupt:
+                pass
+        elif args.batch:
+            runner = batch.BatchRunner(restaurant, Admin("admin", "admin123"))
+            if args.batch == "-":
+                runner.run(sys.stdin)
+            else:
+                with open(args.batch, encoding="utf-8") as script:
+                    runner.run(script)
+        else:
+            interface = Interface(restaurant)
+            interface.run()
+    finally:
+        if metrics_writer is not None:
+            metrics_writer.close()
+        if args.checkpoint and args.snapshot:
+            snapshot.checkpoint(restaurant, args.snapshot)
+        if restaurant.log is not None:
+            restaurant.log.close()
+        restaurant.storage.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,236 @@
+"""
+Module containing the immutable, versioned menu of the restaurant management system.
+
+A MenuVersion is never changed once published. Writers derive the next
+version from the current one and publish it; readers take the current
+version and use it for as long as they like without locking, and every
+order records the version it was priced against.
+
+Deriving a version shares almost all of its structure with its parent:
+
+    chunks   items in menu order, in tuples of CHUNK_SIZE slots; a
+             removed item leaves an empty slot until the next compaction
+    buckets  FANOUT x FANOUT small dicts, in a two-level tree of tuples,
+             mapping a case-folded name to the item it finds and the
+             slots of the items using it, in menu order
+
+A change copies the one chunk and the one bucket it touches, plus the
+tuples pointing at them, so publishing costs O(n / CHUNK_SIZE +
+n / FANOUT**2) rather than a copy of the whole menu.
+
+Since a version never changes, its display text is built once, on first
+display, and kept with it; a menu change invalidates it by publishing a
+new version, whose text reuses each unchanged item's own kept text.
+"""
+from collections.abc import Sequence
+from itertools import chain
+from typing import Iterator, Optional, Tuple
+
+from .models import MenuItem
+
+# Slots per chunk, and branches per level of the index; powers of two
+CHUNK_SIZE = 256
+FANOUT = 32
+_SHIFT = FANOUT.bit_length() - 1
+
+_EMPTY_BUCKET: dict = {}
+_EMPTY_BUCKETS = ((_EMPTY_BUCKET,) * FANOUT,) * FANOUT
+
+
+def normalize_name(name: str) -> str:
+    """Return the key under which a menu item name is looked up."""
+    return name.lower()
+
+
+class MenuVersion(Sequence):
+    """One immutable version of a restaurant's menu."""
+
+    __slots__ = ("version", "_chunks", "_buckets", "_slots", "_length", "_text")
+
+    def __init__(self, items=(), version: int = 0):
+        """Build a menu version from scratch.
+
+        Args:
+            items: Menu items in menu order
+            version: Version number of the menu
+        """
+        items = tuple(items)
+        buckets = [[_EMPTY_BUCKET] * FANOUT for _ in range(FANOUT)]
+        for slot, item in enumerate(items):
+            key = normalize_name(item.name)
+            code = hash(key)
+            branch = buckets[code >> _SHIFT & (FANOUT - 1)]
+            bucket = branch[code & (FANOUT - 1)]
+            if bucket is _EMPTY_BUCKET:
+                bucket = branch[code & (FANOUT - 1)] = {}
+            found = bucket.get(key)
+            bucket[key] = (item, (slot,)) if found is None else (found[0], found[1] + (slot,))
+        self.version = version
+        self._chunks = tuple(items[start:start + CHUNK_SIZE] for start in range(0, len(items), CHUNK_SIZE))
+        self._buckets = tuple(map(tuple, buckets)) if items else _EMPTY_BUCKETS
+        self._slots = len(items)
+        self._length = len(items)
+        self._text = None
+
+    def _derive(self, chunks, buckets, slots: int, length: int) -> "MenuVersion":
+        """Make the next version from changed parts, sharing the rest."""
+        menu = MenuVersion.__new__(MenuVersion)
+        menu.version = self.version + 1
+        menu._chunks = chunks
+        menu._buckets = buckets
+        menu._slots = slots
+        menu._length = length
+        menu._text = None
+        return menu
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[MenuItem]:
+        items = chain.from_iterable(self._chunks)
+        # Items are always true, so only the empty slots are dropped
+        return items if self._slots == self._length else filter(None, items)
+
+    def __getitem__(self, index):
+        """Get the item at a menu position, or a list for a slice.
+
+        Positions skip removed slots, so this walks the menu; iterate
+        rather than index when visiting every item.
+        """
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("menu index out of range")
+        for item in self:
+            if index == 0:
+                return item
+            index -= 1
+
+    def render(self) -> str:
+        """Get the menu as display text, built on first use.
+
+        Returns:
+            One numbered line per item, "1. Burger ($5.99) - Food", each
+            ending in a newline
+        """
+        if self._text is None:
+            self._text = "".join([f"{number}. {item}\n" for number, item in enumerate(self, 1)])
+        return self._text
+
+    def __repr__(self) -> str:
+        return f"MenuVersion(version={self.version}, items={self._length})"
+
+    def _slots_of(self, key: str) -> Tuple[int, ...]:
+        """Get the slots of the items looked up by a key, in menu order."""
+        code = hash(key)
+        found = self._buckets[code >> _SHIFT & (FANOUT - 1)][code & (FANOUT - 1)].get(key)
+        return () if found is None else found[1]
+
+    def find(self, key: str) -> Optional[MenuItem]:
+        """Look up the first item using a name.
+
+        Args:
+            key: Case-folded item name
+
+        Returns:
+            The MenuItem if found, None otherwise
+        """
+        code = hash(key)
+        found = self._buckets[code >> _SHIFT & (FANOUT - 1)][code & (FANOUT - 1)].get(key)
+        return None if found is None else found[0]
+
+    def keys(self) -> Iterator[str]:
+        """Yield the distinct case-folded names on the menu."""
+        for branch in self._buckets:
+            for bucket in branch:
+                yield from bucket
+
+    def appended(self, key: str, item: MenuItem) -> "MenuVersion":
+        """Get the next version, with an item added to the end of the menu.
+
+        Args:
+            key: Case-folded name of the item
+            item: The new item
+
+        Returns:
+            The next MenuVersion
+        """
+        slot = self._slots
+        chunks = self._chunks
+        if slot % CHUNK_SIZE:
+            chunks = chunks[:-1] + (chunks[-1] + (item,),)
+        else:
+            chunks = chunks + ((item,),)
+        buckets = self._with_slots(chunks, ((key, self._slots_of(key) + (slot,)),))
+        return self._derive(chunks, buckets, slot + 1, self._length + 1)
+
+    def replaced(self, key: str, item: MenuItem, new_key: Optional[str] = None) -> "MenuVersion":
+        """Get the next version, with the item a key finds replaced in place.
+
+        Args:
+            key: Case-folded name of the item to replace, which must be
+                on the menu
+            item: The replacement item
+            new_key: Case-folded name of the replacement, if it differs
+                from `key`; no other item may use it
+
+        Returns:
+            The next MenuVersion
+        """
+        slots = self._slots_of(key)
+        chunks = self._with_item(slots[0], item)
+        if new_key is None or new_key == key:
+            changes = ((key, slots),)
+        else:
+            changes = ((key, slots[1:]), (new_key, slots[:1]))
+        return self._derive(chunks, self._with_slots(chunks, changes), self._slots, self._length)
+
+    def removed(self, key: str) -> "MenuVersion":
+        """Get the next version, without the item a key finds.
+
+        Args:
+            key: Case-folded name of the item to remove, which must be on
+                the menu
+
+        Returns:
+            The next MenuVersion
+        """
+        slots = self._slots_of(key)
+        if 2 * (self._slots - self._length + 1) > max(self._length, CHUNK_SIZE):
+            # Mostly empty slots: rebuild compactly rather than share
+            removed = self.find(key)
+            return MenuVersion((item for item in self if item is not removed), self.version + 1)
+        chunks = self._with_item(slots[0], None)
+        buckets = self._with_slots(chunks, ((key, slots[1:]),))
+        return self._derive(chunks, buckets, self._slots, self._length - 1)
+
+    def _with_item(self, slot: int, item: Optional[MenuItem]) -> tuple:
+        """Get the chunks with one slot changed, copying only its chunk."""
+        number, offset = divmod(slot, CHUNK_SIZE)
+        chunk = self._chunks[number]
+        return self._chunks[:number] + (chunk[:offset] + (item,) + chunk[offset + 1:],) + self._chunks[number + 1:]
+
+    def _with_slots(self, chunks: tuple, changes) -> tuple:
+        """Get the buckets with the slots of some keys changed, copying only those buckets.
+
+        Args:
+            chunks: Chunks of the new version, holding the items found
+            changes: (key, slots) pairs; empty slots drop the key
+        """
+        buckets = self._buckets
+        for key, slots in changes:
+            code = hash(key)
+            top = code >> _SHIFT & (FANOUT - 1)
+            number = code & (FANOUT - 1)
+            branch = buckets[top]
+            bucket = dict(branch[number])
+            if slots:
+                head = slots[0]
+                bucket[key] = (chunks[head // CHUNK_SIZE][head % CHUNK_SIZE], slots)
+            else:
+                bucket.pop(key, None)
+            branch = branch[:number] + (bucket,) + branch[number + 1:]
+            buckets = buckets[:top] + (branch,) + buckets[top + 1:]
+        return buckets
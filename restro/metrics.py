@@ -0,0 +1,355 @@
+"""
+Module containing the opt-in operational metrics of the restaurant management system.
+
+Metrics count calls to the main entry points of Restaurant, Customer and
+Admin, time them into latency histograms with fixed log-scale buckets,
+and count errors (calls that raised) and rejects (requests turned down,
+such as an order for an unknown item or beyond the customer's balance).
+
+Instrumentation costs nothing while no restaurant has metrics enabled:
+`enable_metrics` installs timing wrappers on the entry points, and they
+come off again once the last such restaurant is disabled or garbage
+collected. The wrappers replace the methods of the Restaurant, Customer
+and Admin classes, so while any restaurant records metrics every
+restaurant in the process goes through them; a wrapper finds its
+restaurant's Metrics and passes straight through when there are none.
+Reject counters sit on the reject paths themselves, behind the same
+`restaurant.metrics is not None` check as the log and analytics.
+
+A wrapper adds one to two microseconds to each call, so only entry
+points that do several microseconds of work are instrumented. Getters
+that answer from memory in about a microsecond or less, such as
+`get_customer`, `find_menu_item`, `check_balance`, `balance_at`,
+`view_orders` and `total_liabilities`, are left alone: timing them
+would cost more than the call itself. `benchmarks.metrics_overhead`
+measures the cost.
+
+Bucket i counts calls that took under 2**i microseconds (precisely
+1024 * 2**i nanoseconds), from 1 us to about 17 s, plus an overflow
+bucket; the bucket of a duration is a bit_length, with no search.
+
+`metrics_snapshot` returns the counts as plain data, and
+`write_prometheus` writes them in the Prometheus text format to a local
+file, replaced atomically, for a node exporter's textfile collector.
+"""
+import functools
+import os
+import threading
+import weakref
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Tuple
+
+from .admin import Admin
+from .customer import Customer
+from .locks import NO_LOCK
+from .restaurant import Restaurant
+
+# Log-scale latency buckets: bucket i holds durations under 1024 * 2**i ns
+BUCKETS = 25
+_SHIFT = 10
+BUCKET_BOUNDS = tuple((1 << (_SHIFT + i)) / 1e9 for i in range(BUCKETS))
+
+# Instrumented methods of each class
+ENTRY_POINTS: Dict[type, Tuple[str, ...]] = {
+    Restaurant: (
+        "add_menu_item", "remove_menu_item", "rename_menu_item", "update_menu_item_price",
+        "search_menu", "add_customer", "remove_customer", "customer_page", "search_customers",
+        "place_orders_bulk", "orders_between", "order_page",
+    ),
+    Customer: ("place_order", "add_funds", "order_page"),
+    Admin: (
+        "add_customer", "view_customers", "view_customers_page", "search_customers", "remove_customer",
+        "add_menu_item", "remove_menu_item", "update_menu_item_price", "rename_menu_item",
+        "revenue_by_category", "top_selling_items",
+    ),
+}
+
+
+class _Operation:
+    """Call count, errors and latency histogram of one entry point."""
+
+    __slots__ = ("buckets", "total_ns", "errors")
+
+    def __init__(self):
+        self.buckets = [0] * (BUCKETS + 1)
+        self.total_ns = 0
+        self.errors = 0
+
+
+class Metrics:
+    """Counters and latency histograms for one restaurant."""
+
+    def __init__(self, thread_safe: bool = False):
+        """Initialize empty metrics.
+
+        Args:
+            thread_safe: Whether calls will be recorded from several threads
+        """
+        self._operations: Dict[str, _Operation] = {}
+        self._rejects: Dict[Tuple[str, str], int] = {}
+        # None rather than NO_LOCK: entering a null context costs more than the update
+        self._lock = threading.Lock() if thread_safe else None
+
+    def observe(self, operation: str, elapsed_ns: int, failed: bool = False):
+        """Record one call of an entry point.
+
+        Args:
+            operation: Name of the entry point, e.g. "customer.place_order"
+            elapsed_ns: How long the call took, in nanoseconds
+            failed: Whether the call raised
+        """
+        index = (elapsed_ns >> _SHIFT).bit_length()
+        lock = self._lock
+        if lock is not None:
+            lock.acquire()
+        try:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = _Operation()
+            stats.buckets[index if index < BUCKETS else BUCKETS] += 1
+            stats.total_ns += elapsed_ns
+            if failed:
+                stats.errors += 1
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def reject(self, operation: str, reason: str):
+        """Count a request an entry point turned down.
+
+        Args:
+            operation: Name of the entry point
+            reason: Why, e.g. one of the ORDER_* outcome codes
+        """
+        key = (operation, reason)
+        with self._lock or NO_LOCK:
+            self._rejects[key] = self._rejects.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a consistent copy of every counter.
+
+        Returns:
+            {"operations": {name: {"calls", "errors", "seconds", "buckets"}},
+            "rejects": {name: {reason: count}}}, where "buckets" lists
+            the count of each bucket, the overflow bucket last, and
+            "seconds" is the total time spent in the entry point
+        """
+        with self._lock or NO_LOCK:
+            operations = {
+                name: {
+                    "calls": sum(stats.buckets),
+                    "errors": stats.errors,
+                    "seconds": stats.total_ns / 1e9,
+                    "buckets": list(stats.buckets),
+                }
+                for name, stats in sorted(self._operations.items())
+            }
+            rejects: Dict[str, Dict[str, int]] = {}
+            for (operation, reason), count in sorted(self._rejects.items()):
+                rejects.setdefault(operation, {})[reason] = count
+        return {"operations": operations, "rejects": rejects}
+
+
+def prometheus_text(snapshot: Dict[str, Any]) -> str:
+    """Render a metrics snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot: As returned by `metrics_snapshot`
+
+    Returns:
+        The exposition text, ending in a newline
+    """
+    lines = [
+        "# HELP restro_operation_seconds Latency of restaurant entry points.",
+        "# TYPE restro_operation_seconds histogram",
+    ]
+    for name, stats in snapshot["operations"].items():
+        cumulative = 0
+        for bound, count in zip(BUCKET_BOUNDS, stats["buckets"]):
+            cumulative += count
+            lines.append(f'restro_operation_seconds_bucket{{operation="{name}",le="{bound:.9g}"}} {cumulative}')
+        lines.append(f'restro_operation_seconds_bucket{{operation="{name}",le="+Inf"}} {stats["calls"]}')
+        lines.append(f'restro_operation_seconds_sum{{operation="{name}"}} {stats["seconds"]!r}')
+        lines.append(f'restro_operation_seconds_count{{operation="{name}"}} {stats["calls"]}')
+    lines.append("# HELP restro_operation_errors_total Calls of restaurant entry points that raised.")
+    lines.append("# TYPE restro_operation_errors_total counter")
+    for name, stats in snapshot["operations"].items():
+        lines.append(f'restro_operation_errors_total{{operation="{name}"}} {stats["errors"]}')
+    lines.append("# HELP restro_rejects_total Requests turned down by restaurant entry points.")
+    lines.append("# TYPE restro_rejects_total counter")
+    for name, reasons in snapshot["rejects"].items():
+        for reason, count in reasons.items():
+            lines.append(f'restro_rejects_total{{operation="{name}",reason="{reason}"}} {count}')
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _restaurant_metrics(restaurant, args):
+    return restaurant.metrics
+
+
+def _customer_metrics(customer, args):
+    restaurant = customer._restaurant
+    return None if restaurant is None else restaurant.metrics
+
+
+def _admin_metrics(admin, args):
+    # Admin methods take the restaurant first
+    return getattr(args[0], "metrics", None) if args else None
+
+
+_METRICS_OF: Dict[type, Callable] = {
+    Restaurant: _restaurant_metrics,
+    Customer: _customer_metrics,
+    Admin: _admin_metrics,
+}
+
+# Finalizers of the restaurants with metrics enabled, by id, and the methods
+# the wrappers replaced
+_enabled: Dict[int, weakref.finalize] = {}
+_originals: List[Tuple[type, str, Callable]] = []
+# Reentrant, since a finalizer may run in a collection under the lock
+_install_lock = threading.RLock()
+
+
+def _instrument(method: Callable, operation: str, metrics_of: Callable) -> Callable:
+    """Wrap a method to time its calls into the metrics of its restaurant."""
+    @functools.wraps(method)
+    def instrumented(self, *args, **kwargs):
+        metrics = metrics_of(self, args)
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            metrics.observe(operation, perf_counter_ns() - start, True)
+            raise
+        metrics.observe(operation, perf_counter_ns() - start)
+        return result
+
+    return instrumented
+
+
+def _install():
+    """Put the timing wrappers on every entry point. Caller holds the install lock."""
+    for cls, names in ENTRY_POINTS.items():
+        prefix = cls.__name__.lower()
+        for name in names:
+            method = cls.__dict__[name]
+            _originals.append((cls, name, method))
+            setattr(cls, name, _instrument(method, f"{prefix}.{name}", _METRICS_OF[cls]))
+
+
+def _uninstall():
+    """Restore the entry points the wrappers replaced. Caller holds the install lock."""
+    while _originals:
+        cls, name, method = _originals.pop()
+        setattr(cls, name, method)
+
+
+def _forget(key: int):
+    """Drop a collected restaurant, taking the wrappers off after the last."""
+    with _install_lock:
+        _enabled.pop(key, None)
+        if not _enabled:
+            _uninstall()
+
+
+def enable_metrics(restaurant: Restaurant) -> Metrics:
+    """Start recording metrics for a restaurant, if not already.
+
+    Args:
+        restaurant: The restaurant object
+
+    Returns:
+        The restaurant's Metrics
+    """
+    with _install_lock:
+        if restaurant.metrics is None:
+            restaurant.metrics = Metrics(restaurant.thread_safe)
+            key = id(restaurant)
+            _enabled[key] = weakref.finalize(restaurant, _forget, key)
+            if not _originals:
+                _install()
+        return restaurant.metrics
+
+
+def disable_metrics(restaurant: Restaurant):
+    """Stop recording metrics for a restaurant and drop those recorded.
+
+    Once no restaurant records metrics, the entry points are restored
+    and cost nothing again.
+
+    Args:
+        restaurant: The restaurant object
+    """
+    with _install_lock:
+        restaurant.metrics = None
+        finalizer = _enabled.pop(id(restaurant), None)
+        if finalizer is not None:
+            finalizer.detach()
+        if not _enabled:
+            _uninstall()
+
+
+def metrics_snapshot(restaurant: Restaurant) -> Dict[str, Any]:
+    """Get the restaurant's metrics as plain data.
+
+    Args:
+        restaurant: The restaurant object
+
+    Returns:
+        As Metrics.snapshot, empty when metrics are disabled
+    """
+    metrics = restaurant.metrics
+    if metrics is None:
+        return {"operations": {}, "rejects": {}}
+    return metrics.snapshot()
+
+
+def write_prometheus(restaurant: Restaurant, path: str):
+    """Write the restaurant's metrics to a file in the Prometheus text format.
+
+    The file is written next to `path` and renamed into place, so a
+    scraper never reads a partial file.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the file, conventionally ending in .prom
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as out:
+        out.write(prometheus_text(metrics_snapshot(restaurant)))
+    os.replace(temp_path, path)
+
+
+class MetricsFileWriter:
+    """Rewrites a restaurant's Prometheus metrics file at a fixed interval."""
+
+    def __init__(self, restaurant: Restaurant, path: str, interval: float = 15.0):
+        """Enable metrics for a restaurant and start writing them.
+
+        Args:
+            restaurant: The restaurant object
+            path: Path of the metrics file
+            interval: Seconds between writes
+        """
+        self.restaurant = restaurant
+        self.path = path
+        self.interval = interval
+        enable_metrics(restaurant)
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._write_periodically, daemon=True)
+        self._writer.start()
+
+    def _write_periodically(self):
+        """Background loop writing the file until closed."""
+        while not self._closed.wait(self.interval):
+            write_prometheus(self.restaurant, self.path)
+
+    def close(self):
+        """Stop the background writes and write the file one last time."""
+        self._closed.set()
+        self._writer.join()
+        write_prometheus(self.restaurant, self.path)
@@ -1,52 +1,418 @@
 """
 Module containing the MenuItem and Order classes for the restaurant management system.
 """
+import threading
+import time
+from array import array
+from itertools import count
 from datetime import datetime
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .ids import default_generator
+from .money import Money
+
+# Outcome codes reported by Restaurant.place_orders_bulk
+ORDER_OK = "ok"
+ORDER_CUSTOMER_NOT_FOUND = "customer_not_found"
+ORDER_ITEM_NOT_FOUND = "item_not_found"
+ORDER_INSUFFICIENT_FUNDS = "insufficient_funds"
+
+# Bytes per packed order line: price at purchase in cents and quantity
+_LINE_SIZE = 12
+
+# Most units of one item in an order. Lines pack quantities as u32, but
+# Order.items still lists an order unit by unit, so keep it to a real order
+MAX_QUANTITY = 10_000
+
+# Item IDs are handed out under a lock, so items made on several threads never share one
+_items_lock = threading.Lock()
+_next_item_id = count()
 
 
 class MenuItem:
-    """Represents a food or drink item on the restaurant menu."""
+    """Represents a food or drink item on the restaurant menu.
     
-    def __init__(self, name: str, price: float, category: str = "Food"):
+    Items are immutable: a price change or rename makes a new item, a new
+    version of the same stock-keeping unit, so orders and older menu
+    versions keep the item exactly as it was. That makes the display text
+    safe to build once and keep.
+    """
+    
+    __slots__ = ("name", "price", "category", "item_id", "sku", "_text")
+    
+    def __init__(self, name: str, price: Union[Money, float], category: str = "Food", sku: Optional[int] = None):
         """Initialize a menu item.
         
         Args:
             name: The name of the menu item
-            price: The price of the menu item
+            price: The price of the menu item, as Money or a number of
+                currency units
             category: The category of the item (e.g., "Food", "Drink")
+            sku: ID shared by every version of the item, this item's own
+                item_id for a new item
         """
-        self.name = name
-        self.price = price
-        self.category = category
+        if type(price) is not Money:
+            price = Money.of(price)
+        with _items_lock:
+            item_id = next(_next_item_id)
+        set_field = object.__setattr__
+        set_field(self, "name", name)
+        set_field(self, "price", price)
+        set_field(self, "category", category)
+        set_field(self, "item_id", item_id)
+        set_field(self, "sku", item_id if sku is None else sku)
+        set_field(self, "_text", None)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("MenuItem is immutable; use with_price or with_name")
+    
+    def with_price(self, price: Union[Money, float]) -> "MenuItem":
+        """Get a new version of this item at another price."""
+        return MenuItem(self.name, price, self.category, self.sku)
+    
+    def with_name(self, name: str) -> "MenuItem":
+        """Get a new version of this item under another name."""
+        return MenuItem(name, self.price, self.category, self.sku)
         
     def __str__(self) -> str:
         """Return a string representation of the menu item."""
-        return f"{self.name} (${self.price:.2f}) - {self.category}"
+        text = self._text
+        if text is None:
+            text = f"{self.name} (${self.price:.2f}) - {self.category}"
+            object.__setattr__(self, "_text", text)
+        return text
+
+
+def parse_order_entry(entry: Union[str, Tuple[str, int]]) -> Tuple[str, int]:
+    """Split an order entry into an item name and a quantity.
+    
+    Args:
+        entry: An item name, for one unit, or a (name, quantity) pair
+        
+    Returns:
+        The item name and the quantity
+        
+    Raises:
+        ValueError: If the entry is neither, or the quantity is not a
+            positive whole number up to MAX_QUANTITY
+    """
+    if isinstance(entry, str):
+        return entry, 1
+    if not (isinstance(entry, (tuple, list)) and len(entry) == 2 and isinstance(entry[0], str)):
+        raise ValueError(f"Expected an item name or a (name, quantity) pair, got {entry!r}")
+    name, quantity = entry
+    if type(quantity) is not int or not 0 < quantity <= MAX_QUANTITY:
+        raise ValueError(f"Quantity of '{name}' must be a whole number from 1 to {MAX_QUANTITY}")
+    return name, quantity
+
+
+def order_quantities(entries: Iterable[Union[str, Tuple[str, int]]],
+                     key: Optional[Callable[[str], str]] = None) -> Dict[str, int]:
+    """Total the units ordered of each item, in one pass over the entries.
+    
+    Args:
+        entries: Item names, one unit each, or (name, quantity) pairs
+        key: Function giving the key under which names count as the same
+            item, such as the menu's name normalization; exact names if
+            not given
+        
+    Returns:
+        Units by item name, each name spelled as first entered, in order
+        of first entry
+        
+    Raises:
+        ValueError: As parse_order_entry, or if the units of one item
+            add up to more than MAX_QUANTITY
+    """
+    quantities: Dict[str, int] = {}
+    spellings: Dict[str, str] = {}
+    for entry in entries:
+        if entry.__class__ is str:
+            name = entry
+            quantity = 1
+        else:
+            name, quantity = parse_order_entry(entry)
+        if key is not None:
+            name = spellings.setdefault(key(name), name)
+        total = quantities.get(name)
+        if total is not None:
+            quantity += total
+            if quantity > MAX_QUANTITY:
+                raise ValueError(f"Quantity of '{name}' must be a whole number from 1 to {MAX_QUANTITY}")
+        quantities[name] = quantity
+    return quantities
+
+
+def _pack(items: Tuple[MenuItem, ...], prices: array, quantities: array) -> Optional[bytes]:
+    """Pack the prices and quantities of an order's lines.
+    
+    Args:
+        items: The item of each line
+        prices: Price at purchase of each line, in cents
+        quantities: Units of each line
+        
+    Returns:
+        n prices in cents (i64) followed by n quantities (u32), so both
+        stay aligned, or None when every line is one unit at its item's
+        price, as most are
+    """
+    if quantities.count(1) == len(quantities) and all(
+            price == item.price.cents for item, price in zip(items, prices)):
+        return None
+    return prices.tobytes() + quantities.tobytes()
+
+
+def _pack_lines(items: List[MenuItem], prices: List[int]) -> Tuple[Tuple[MenuItem, ...], Optional[bytes]]:
+    """Pack order units into lines, folding consecutive units of one item at one price.
+    
+    Args:
+        items: Menu items, one entry per unit
+        prices: Price at purchase of each entry, in cents
+        
+    Returns:
+        The item of each line, and their prices and quantities packed
+        as by _pack
+    """
+    line_items = []
+    quantities = array('I')
+    line_prices = array('q')
+    last = None
+    last_price = None
+    for item, price in zip(items, prices):
+        if item is last and price == last_price:
+            quantities[-1] += 1
+        else:
+            last = item
+            last_price = price
+            line_items.append(item)
+            quantities.append(1)
+            line_prices.append(price)
+    line_items = tuple(line_items)
+    return line_items, _pack(line_items, line_prices, quantities)
 
 
 class Order:
-    """Represents an order placed by a customer."""
+    """Represents an order placed by a customer.
+    
+    An order holds the item of each line in a tuple, so it reads the same
+    however the menu moves on, with the lines' prices at purchase and
+    quantities packed into one immutable buffer, left out when every line
+    is one unit at its item's price. An order is built from (item,
+    quantity) lines, or from one entry per unit with consecutive repeats
+    of an item folded into one line. The ID is a time-ordered integer
+    from an ID generator and the timestamp is kept as epoch seconds;
+    `timestamp`, `order_id` and `items` are built when read.
+    `menu_version` is the version of the menu the order was priced
+    against. Orders never change, so the display text is built on first
+    use and kept.
+    """
     
-    def __init__(self, items: List[MenuItem], customer_id: str):
+    __slots__ = ("id", "customer_id", "total_price", "menu_version", "_created", "_items", "_lines", "_text")
+    
+    def __init__(self, items: List[MenuItem], customer_id: str,
+                 timestamp: Union[datetime, float, None] = None, total_price: Optional[Money] = None,
+                 order_id: Optional[int] = None, menu_version: int = 0,
+                 quantities: Optional[List[int]] = None):
         """Initialize an order.
         
         Args:
-            items: List of menu items in the order
+            items: List of menu items in the order, one entry per unit, or
+                one per line when `quantities` is given
             customer_id: ID of the customer who placed the order
+            timestamp: When the order was placed, as a datetime or epoch
+                seconds, defaults to now
+            total_price: Precomputed total of the item prices, if known
+            order_id: Numeric ID of the order, defaults to one from the
+                process-wide generator in restro.ids
+            menu_version: Version of the menu the items were taken from
+            quantities: Units of each entry of `items`
         """
-        self.items = items
+        if order_id is None:
+            order_id = default_generator().next_id()
+        self.id = order_id
         self.customer_id = customer_id
-        self.total_price = sum(item.price for item in items)
-        self.timestamp = datetime.now()
-        self.order_id = f"{customer_id}-{self.timestamp.strftime('%Y%m%d%H%M%S')}"
+        if total_price is None:
+            if quantities is None:
+                total_price = Money(sum(item.price.cents for item in items))
+            else:
+                total_price = Money(sum(item.price.cents * quantity for item, quantity in zip(items, quantities)))
+        self.total_price = total_price
+        self.menu_version = menu_version
+        if timestamp is None:
+            timestamp = time.time()
+        elif isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self._created = timestamp
+        self._text = None
+        if quantities is not None:
+            self._items = tuple(items)
+            # Items are priced as they are, so only quantities can call for packed lines
+            if quantities.count(1) == len(quantities):
+                self._lines = None
+            else:
+                self._lines = (array('q', [item.price.cents for item in items]).tobytes()
+                               + array('I', quantities).tobytes())
+            return
+        
+        line_items = []
+        counts = array('I')
+        last = None
+        for item in items:
+            if item is last:
+                counts[-1] += 1
+            else:
+                last = item
+                line_items.append(item)
+                counts.append(1)
+        self._items = tuple(line_items)
+        if counts.count(1) == len(counts):
+            self._lines = None
+        else:
+            self._lines = array('q', [item.price.cents for item in line_items]).tobytes() + counts.tobytes()
+    
+    @classmethod
+    def _restore(cls, customer_id: str, order_id: int, timestamp: float, total_price: Money,
+                 items: List[MenuItem], prices: List[int], menu_version: int = 0,
+                 quantities: Optional[List[int]] = None) -> "Order":
+        """Rebuild a recorded order with the prices it was placed at.
+        
+        Args:
+            customer_id: ID of the customer who placed the order
+            order_id: Numeric ID of the order
+            timestamp: When the order was placed, in epoch seconds
+            total_price: Total of the order
+            items: Menu items in the order, one entry per unit, or one per
+                line when `quantities` is given
+            prices: Price at purchase of each entry of `items`, in cents
+            menu_version: Version of the menu the order was priced against
+            quantities: Units of each entry of `items`, which are then
+                packed as lines as they are
+            
+        Returns:
+            The rebuilt Order object
+        """
+        order = cls.__new__(cls)
+        order.id = order_id
+        order.customer_id = customer_id
+        order.total_price = total_price
+        order.menu_version = menu_version
+        order._created = timestamp
+        if quantities is None:
+            order._items, order._lines = _pack_lines(items, prices)
+        else:
+            order._items = tuple(items)
+            order._lines = _pack(order._items, array('q', prices), array('I', quantities))
+        order._text = None
+        return order
+    
+    @classmethod
+    def _from_lines(cls, customer_id: str, order_id: int, timestamp: float, total_price: Money,
+                    menu_version: int, items: Tuple[MenuItem, ...], lines: Optional[bytes]) -> "Order":
+        """Rebuild an order from lines already packed, see _pack.
+        
+        Args:
+            customer_id: ID of the customer who placed the order
+            order_id: Numeric ID of the order
+            timestamp: When the order was placed, in epoch seconds
+            total_price: Total of the order
+            menu_version: Version of the menu the order was priced against
+            items: The item of each line
+            lines: The packed prices and quantities, or None for one
+                unit of each item at its price
+            
+        Returns:
+            The rebuilt Order object
+        """
+        order = cls.__new__(cls)
+        order.id = order_id
+        order.customer_id = customer_id
+        order.total_price = total_price
+        order.menu_version = menu_version
+        order._created = timestamp
+        order._items = items
+        order._lines = lines
+        order._text = None
+        return order
+    
+    def _iter_lines(self) -> Iterator[Tuple[MenuItem, int, int]]:
+        """Yield (item, quantity, price_at_purchase_in_cents) for each line."""
+        items = self._items
+        if self._lines is None:
+            return ((item, 1, item.price.cents) for item in items)
+        view = memoryview(self._lines)
+        split = 8 * len(items)
+        return zip(items, view[split:].cast('I'), view[:split].cast('q'))
+    
+    def _packed(self) -> bytes:
+        """Get the packed prices and quantities, packing them if the order left them out."""
+        lines = self._lines
+        if lines is None:
+            items = self._items
+            lines = array('q', [item.price.cents for item in items]).tobytes() + array('I', [1]).tobytes() * len(items)
+        return lines
+    
+    @property
+    def items(self) -> List[MenuItem]:
+        """List of menu items in the order, one entry per unit."""
+        if self._lines is None:
+            return list(self._items)
+        return [item for item, quantity, _ in self._iter_lines() for _ in range(quantity)]
+    
+    @property
+    def lines(self) -> List[Tuple[MenuItem, int]]:
+        """(menu item, quantity) of each line of the order."""
+        if self._lines is None:
+            return [(item, 1) for item in self._items]
+        return list(zip(self._items, memoryview(self._lines)[8 * len(self._items):].cast('I')))
+    
+    @property
+    def timestamp(self) -> datetime:
+        """When the order was placed."""
+        return datetime.fromtimestamp(self._created)
+    
+    @property
+    def order_id(self) -> str:
+        """Display form of the order ID, prefixed with the customer ID."""
+        return f"{self.customer_id}-{self.id}"
         
     def __str__(self) -> str:
         """Return a string representation of the order."""
-        items_str = "\n".join(f"  - {item}" for item in self.items)
-        return (
-            f"Order ID: {self.order_id}\n"
-            f"Date: {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Items:\n{items_str}\n"
-            f"Total: ${self.total_price:.2f}"
-        )
+        if self._text is None:
+            items_str = "\n".join(f"  - {item}" if quantity == 1 else f"  - {item} x {quantity}"
+                                   for item, quantity in self.lines)
+            self._text = (
+                f"Order ID: {self.order_id}\n"
+                f"Date: {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"Items:\n{items_str}\n"
+                f"Total: ${self.total_price:.2f}"
+            )
+        return self._text
+
+
+class OrderResult:
+    """Outcome of one order in a bulk placement."""
+    
+    __slots__ = ("customer_id", "status", "order", "item_name")
+    
+    def __init__(self, customer_id: str, status: str, order: Optional[Order] = None,
+                 item_name: Optional[str] = None):
+        """Initialize an order result.
+        
+        Args:
+            customer_id: ID of the customer the order was placed for
+            status: One of the ORDER_* outcome codes
+            order: The created Order when the status is ORDER_OK
+            item_name: The first unknown item name for ORDER_ITEM_NOT_FOUND
+        """
+        self.customer_id = customer_id
+        self.status = status
+        self.order = order
+        self.item_name = item_name
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the order was placed."""
+        return self.status == ORDER_OK
+    
+    def __repr__(self) -> str:
+        """Return a debugging representation of the result."""
+        return f"OrderResult({self.customer_id!r}, {self.status!r})"
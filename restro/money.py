@@ -0,0 +1,184 @@
+"""
+Module containing the Money type for the restaurant management system.
+
+Amounts are held as a whole number of cents, so sums of prices, deposits
+and debits stay exact however many of them there are. Money supports
+what amounts need (adding, subtracting, multiplying by a quantity and
+comparing) and formats with the usual float format specifications, so
+f"${balance:.2f}" works as it did with floats.
+
+Floats, ints and decimal strings convert in through Money.of and
+Money.parse, and float(money) converts out, for callers still working
+in floats; floats are rounded to the nearest cent on the way in. For
+the same callers, Money equals the int or float it converts from, so
+balance == 0.0 holds for an empty balance; ordering needs Money on
+both sides.
+"""
+import math
+import re
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Union
+
+# Minor units per currency unit
+CENTS = 100
+
+_AMOUNT = re.compile(r"\s*\$?\s*([+-]?)(\d*)(?:\.(\d{0,2}))?\s*")
+_CENT = Decimal("0.01")
+
+
+class Money:
+    """An exact amount of money in integer cents. Never changed once made."""
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: int = 0):
+        """Initialize an amount.
+
+        Args:
+            cents: The amount in cents, so Money(599) is $5.99
+        """
+        self.cents = cents
+
+    @classmethod
+    def of(cls, value: Union["Money", int, float, Decimal, str]) -> "Money":
+        """Convert a number of currency units, or a decimal string, to Money.
+
+        Args:
+            value: Money, returned as is; an int, float or Decimal number
+                of currency units, rounded half-even to the cent; or a
+                string as accepted by `parse`
+
+        Returns:
+            The amount as Money
+
+        Raises:
+            TypeError: For any other type of value
+            ValueError: For NaN, infinities and malformed strings
+        """
+        kind = type(value)
+        if kind is Money:
+            return value
+        if kind is int:
+            return cls(value * CENTS)
+        if kind is float:
+            if not math.isfinite(value):
+                raise ValueError(f"Not an amount of money: {value!r}")
+            scaled = value * CENTS
+            cents = round(scaled)
+            # Whole cents, as almost every float amount is, skip the decimal rounding
+            if abs(scaled - cents) <= 1e-9 * max(1.0, abs(scaled)):
+                return cls(cents)
+            return cls.of(Decimal(repr(value)))
+        if kind is Decimal:
+            if not value.is_finite():
+                raise ValueError(f"Not an amount of money: {value!r}")
+            return cls(int(value.quantize(_CENT, ROUND_HALF_EVEN).scaleb(2)))
+        if kind is str:
+            return cls.parse(value)
+        raise TypeError(f"Cannot convert {kind.__name__} to Money")
+
+    @classmethod
+    def parse(cls, text: str) -> "Money":
+        """Parse an amount as typed, e.g. "5", "5.9", "$5.99" or "-0.50".
+
+        Args:
+            text: A decimal number with at most two decimal places
+
+        Returns:
+            The amount as Money
+
+        Raises:
+            ValueError: If the text is not such a number
+        """
+        match = _AMOUNT.fullmatch(text)
+        if match is None or not (match[2] or match[3]):
+            raise ValueError(f"Not an amount of money: {text!r}")
+        cents = int(match[2] or 0) * CENTS + int((match[3] or "").ljust(2, "0"))
+        return cls(-cents if match[1] == "-" else cents)
+
+    def to_decimal(self) -> Decimal:
+        """Get the amount as an exact Decimal number of currency units."""
+        return Decimal(self.cents).scaleb(-2)
+
+    def __float__(self) -> float:
+        return self.cents / CENTS
+
+    def __str__(self) -> str:
+        units, cents = divmod(abs(self.cents), CENTS)
+        return f"{'-' if self.cents < 0 else ''}{units}.{cents:02d}"
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __format__(self, spec: str) -> str:
+        return format(self.to_decimal(), spec) if spec else str(self)
+
+    def __add__(self, other: "Money") -> "Money":
+        if type(other) is not Money:
+            return NotImplemented
+        return Money(self.cents + other.cents)
+
+    def __radd__(self, other) -> "Money":
+        # sum() starts from the int 0
+        if type(other) is int and other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other: "Money") -> "Money":
+        if type(other) is not Money:
+            return NotImplemented
+        return Money(self.cents - other.cents)
+
+    def __mul__(self, quantity: int) -> "Money":
+        if type(quantity) is not int:
+            return NotImplemented
+        return Money(self.cents * quantity)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Money":
+        return Money(-self.cents)
+
+    def __abs__(self) -> "Money":
+        return Money(abs(self.cents))
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __eq__(self, other) -> bool:
+        kind = type(other)
+        if kind is Money:
+            return self.cents == other.cents
+        # Callers still working in floats compare to the cent, as Money.of rounds
+        if kind is int or (kind is float and math.isfinite(other)):
+            return self.cents == Money.of(other).cents
+        if kind is float:
+            return False
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # Equal to the hash of the int or float number of units it equals
+        return hash(self.cents / CENTS)
+
+    def __lt__(self, other: "Money") -> bool:
+        if type(other) is not Money:
+            return NotImplemented
+        return self.cents < other.cents
+
+    def __le__(self, other: "Money") -> bool:
+        if type(other) is not Money:
+            return NotImplemented
+        return self.cents <= other.cents
+
+    def __gt__(self, other: "Money") -> bool:
+        if type(other) is not Money:
+            return NotImplemented
+        return self.cents > other.cents
+
+    def __ge__(self, other: "Money") -> bool:
+        if type(other) is not Money:
+            return NotImplemented
+        return self.cents >= other.cents
+
+
+ZERO = Money(0)
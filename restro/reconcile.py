@@ -0,0 +1,461 @@
+"""
+Module containing the parallel log replay and reconciliation engine.
+
+Replaying a long operation log one record at a time through Customer is
+bound to a single core. Funds and orders only touch the customer they
+name, so the replay is split instead:
+
+1. The menu records (add, remove, rename, price change) are located with
+   byte searches over the mapped log, without parsing the rest, and
+   replayed in order into a history of every menu version.
+2. The log is cut into chunks at line boundaries, and worker processes
+   replay the customer records of each chunk, pricing each order against
+   the menu version it names, producing per-customer partial totals.
+3. The partial totals are merged per customer in chunk order, which keeps
+   each customer's order history in log order.
+
+Chunks are byte ranges rather than customer hash partitions, so each
+worker parses only its share of the log. The merge then does what a
+customer partitioning would: all records of a customer end up in one
+place.
+"""
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import wal
+from .ledger import DEPOSIT, ORDER
+from .models import Order, order_quantities
+from .money import Money, ZERO
+from .restaurant import Restaurant
+
+# Target bytes per chunk; more chunks than workers evens out their load
+CHUNK_SIZE = 32 * 1024 * 1024
+
+_MENU_OPS = (wal.ADD_ITEM, wal.REMOVE_ITEM, wal.RENAME_ITEM, wal.UPDATE_PRICE)
+
+# Menu history for replay: item key -> [(menu version, ((entry, price in cents), ...)), ...]
+# in version order, each tuple of entries in menu order with the first being
+# the item the name resolves to from that version on. Entries number item
+# versions in creation order, starting with the base restaurant's menu, and
+# every effective menu record makes one menu version.
+MenuState = Dict[str, List[Tuple[int, tuple]]]
+
+
+class CustomerReplay:
+    """A customer's totals recomputed from the log."""
+
+    __slots__ = ("customer_id", "details", "funds", "spent", "order_count", "history", "deposits", "removed")
+
+    def __init__(self, customer_id: str):
+        """Initialize empty totals.
+
+        Args:
+            customer_id: ID of the customer
+        """
+        self.customer_id = customer_id
+        # (name, email, address) if the log registers the customer
+        self.details: Optional[Tuple[str, str, str]] = None
+        # In cents
+        self.funds = 0
+        self.spent = 0
+        self.order_count = 0
+        # (order_id, timestamp, menu_version, total, entries, prices, quantities) per order, if kept
+        self.history: List[tuple] = []
+        # (timestamp, amount) per deposit, if kept; None for deposits logged undated
+        self.deposits: List[Tuple[Optional[float], int]] = []
+        self.removed = False
+
+    def merge(self, later: "CustomerReplay"):
+        """Add the totals of a later chunk of the log."""
+        if later.details is not None:
+            self.details = later.details
+        self.funds += later.funds
+        self.spent += later.spent
+        self.order_count += later.order_count
+        self.history.extend(later.history)
+        self.deposits.extend(later.deposits)
+        self.removed = self.removed or later.removed
+
+
+class Divergence:
+    """A customer whose live state differs from the replayed log."""
+
+    __slots__ = ("customer_id", "expected_balance", "live_balance", "expected_orders", "live_orders")
+
+    def __init__(self, customer_id: str, expected_balance: Optional[Money], live_balance: Optional[Money],
+                 expected_orders: Optional[int], live_orders: Optional[int]):
+        """Initialize a divergence.
+
+        Args:
+            customer_id: ID of the customer
+            expected_balance: Balance from the log, None if the log has no such customer
+            live_balance: Live balance, None if the restaurant has no such customer
+            expected_orders: Order count from the log
+            live_orders: Live order count
+        """
+        self.customer_id = customer_id
+        self.expected_balance = expected_balance
+        self.live_balance = live_balance
+        self.expected_orders = expected_orders
+        self.live_orders = live_orders
+
+    def __repr__(self) -> str:
+        return (
+            f"Divergence({self.customer_id!r}, balance {self.expected_balance!r} != {self.live_balance!r}, "
+            f"orders {self.expected_orders!r} != {self.live_orders!r})"
+        )
+
+
+def _entries(menu: MenuState, key: str, version: int) -> tuple:
+    """Get the (entry, price in cents) pairs using a key in a menu version."""
+    history = menu.get(key)
+    if not history:
+        return ()
+    since, entries = history[-1]
+    if since <= version:
+        return entries
+    for since, entries in reversed(history):
+        if since <= version:
+            return entries
+    return ()
+
+
+def _apply_menu_record(menu: MenuState, record: list, next_entry: int, version: int) -> Tuple[int, int]:
+    """Apply a menu record to a replay menu history, as Restaurant would.
+
+    Returns:
+        The next free entry number and the current menu version
+    """
+    op = record[0]
+    key = Restaurant._normalize_name(record[1])
+    entries = _entries(menu, key, version)
+    if op == wal.ADD_ITEM:
+        changes = [(key, entries + ((next_entry, Money.of(record[2]).cents),))]
+    elif not entries:
+        return next_entry, version
+    elif op == wal.UPDATE_PRICE:
+        changes = [(key, ((next_entry, Money.of(record[2]).cents),) + entries[1:])]
+    elif op == wal.REMOVE_ITEM:
+        changes = [(key, entries[1:])]
+    else:
+        new_key = Restaurant._normalize_name(record[2])
+        renamed = (next_entry, entries[0][1])
+        if new_key == key:
+            changes = [(key, (renamed,) + entries[1:])]
+        elif _entries(menu, new_key, version):
+            return next_entry, version
+        else:
+            changes = [(key, entries[1:]), (new_key, (renamed,))]
+
+    version += 1
+    for changed, new_entries in changes:
+        menu.setdefault(changed, []).append((version, new_entries))
+    # Removals make no new item version
+    return next_entry + (op != wal.REMOVE_ITEM), version
+
+
+def _menu_state(restaurant: Restaurant) -> MenuState:
+    """Get the replay menu history of a restaurant's current menu."""
+    menu = restaurant.get_menu()
+    current: Dict[str, tuple] = {}
+    for entry, item in enumerate(menu):
+        key = Restaurant._normalize_name(item.name)
+        current[key] = current.get(key, ()) + ((entry, item.price.cents),)
+    return {key: [(menu.version, entries)] for key, entries in current.items()}
+
+
+def _chunk_bounds(data: mmap.mmap, size: int, chunks: int) -> List[Tuple[int, int]]:
+    """Cut [0, size) into byte ranges ending at line boundaries."""
+    bounds = []
+    start = 0
+    for number in range(1, chunks + 1):
+        if start >= size:
+            break
+        end = size if number == chunks else data.find(b"\n", max(start, size * number // chunks)) + 1
+        if end <= 0:
+            end = size
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def _menu_records(data: mmap.mmap, size: int) -> List[Tuple[int, list]]:
+    """Find and parse the menu records of a log, in log order."""
+    found = []
+    for op in _MENU_OPS:
+        marker = b'["' + op.encode() + b'",'
+        if data[:len(marker)] == marker:
+            found.append(0)
+        position = data.find(b"\n" + marker, 0, size)
+        while position != -1:
+            found.append(position + 1)
+            position = data.find(b"\n" + marker, position + 1, size)
+    found.sort()
+    records = []
+    for start in found:
+        end = data.find(b"\n", start, size)
+        if end == -1:
+            break  # torn final record
+        records.append((start, json.loads(data[start:end])))
+    return records
+
+
+def _replay_chunk(path: str, start: int, end: int, menu: MenuState, versions: List[int],
+                  keep_history: bool) -> Dict[str, CustomerReplay]:
+    """Replay the customer records of one chunk of the log. Runs in a worker process.
+
+    `versions` holds the menu version current at the start of the chunk,
+    then the one after each menu record in it, for orders logged without
+    a menu version.
+    """
+    with open(path, "rb") as log_file:
+        log_file.seek(start)
+        data = log_file.read(end - start)
+    lines = data.split(b"\n")
+    # The last piece is empty, or a torn final record
+    del lines[-1]
+
+    normalize = Restaurant._normalize_name
+    pending_versions = iter(versions)
+    current_version = next(pending_versions)
+    customers: Dict[str, CustomerReplay] = {}
+    for line in lines:
+        record = json.loads(line)
+        op = record[0]
+        if op == wal.PLACE_ORDER:
+            customer = customers.get(record[1])
+            if customer is None:
+                customer = customers[record[1]] = CustomerReplay(record[1])
+            order_id, version, names = wal.parse_order(record)
+            if version is None:
+                version = current_version
+            quantities = order_quantities(names)
+            total = 0
+            entries = []
+            prices = []
+            for name, quantity in quantities.items():
+                item = _entries(menu, normalize(name), version)
+                if not item:
+                    raise ValueError(f"Order for {record[1]} names unknown item {name!r}")
+                entry, price = item[0]
+                total += price * quantity
+                entries.append(entry)
+                prices.append(price)
+            customer.spent += total
+            customer.order_count += 1
+            if keep_history:
+                customer.history.append((order_id, record[2], version, total, entries, prices,
+                                         list(quantities.values())))
+        elif op == wal.ADD_FUNDS:
+            customer = customers.get(record[1])
+            if customer is None:
+                customer = customers[record[1]] = CustomerReplay(record[1])
+            amount = Money.of(record[2]).cents
+            customer.funds += amount
+            if keep_history:
+                customer.deposits.append((record[3] if len(record) > 3 else None, amount))
+        elif op == wal.ADD_CUSTOMER:
+            customer = customers.get(record[1])
+            if customer is None:
+                customer = customers[record[1]] = CustomerReplay(record[1])
+            customer.details = tuple(record[2:5])
+        elif op == wal.REMOVE_CUSTOMER:
+            customer = customers.get(record[1])
+            if customer is None:
+                customer = customers[record[1]] = CustomerReplay(record[1])
+            customer.removed = True
+        elif op in _MENU_OPS:
+            current_version = next(pending_versions)
+        elif op == wal.GENERATION:
+            continue
+        else:
+            raise ValueError(f"Unknown log operation: {op!r}")
+    return customers
+
+
+def replay_customers(path: str, base: Optional[Restaurant] = None, workers: Optional[int] = None,
+                     keep_history: bool = False) -> Tuple[Dict[str, CustomerReplay], List[list]]:
+    """Replay the customer records of a log in parallel.
+
+    Args:
+        path: Path of the log file
+        base: Restaurant the log starts from, an empty one if not given
+        workers: Number of worker processes, defaults to the CPU count;
+            1 replays in this process
+        keep_history: Whether to keep every order, not only totals
+
+    Returns:
+        The replayed customers by ID in first-seen order, and the log's
+        menu records in order
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    # A log left behind by a checkpoint holds nothing the base lacks
+    if size == 0 or (base is not None and not wal.replay_needed(base, path)):
+        return {}, []
+    with open(path, "rb") as log_file:
+        data = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        chunks = max(workers, -(-size // CHUNK_SIZE)) if workers > 1 else 1
+        bounds = _chunk_bounds(data, size, chunks)
+        menu_records = _menu_records(data, size)
+    finally:
+        data.close()
+
+    # Every menu version up front; each chunk gets the versions current along it
+    menu = _menu_state(base) if base is not None else {}
+    next_entry = len(base.get_menu()) if base is not None else 0
+    version = base.get_menu().version if base is not None else 0
+    chunk_versions = [[] for _ in bounds]
+    chunk = 0
+    chunk_versions[0].append(version)
+    for offset, record in menu_records:
+        while offset >= bounds[chunk][1]:
+            chunk += 1
+            chunk_versions[chunk].append(version)
+        next_entry, version = _apply_menu_record(menu, record, next_entry, version)
+        chunk_versions[chunk].append(version)
+    for later in range(chunk + 1, len(bounds)):
+        chunk_versions[later].append(version)
+    tasks = [
+        (path, start, end, menu, versions, keep_history)
+        for (start, end), versions in zip(bounds, chunk_versions)
+    ]
+
+    if workers == 1:
+        results = [_replay_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_replay_chunk, *zip(*tasks)))
+
+    customers: Dict[str, CustomerReplay] = {}
+    for result in results:
+        for customer_id, partial in result.items():
+            merged = customers.get(customer_id)
+            if merged is None:
+                customers[customer_id] = partial
+            else:
+                merged.merge(partial)
+    return customers, [record for _, record in menu_records]
+
+
+def replay_log(path: str, restaurant: Optional[Restaurant] = None,
+               workers: Optional[int] = None) -> Restaurant:
+    """Rebuild a restaurant from a log with a parallel replay.
+
+    The result matches replaying the log with wal.apply_record, including
+    order histories, the prices orders were placed at and the ledgers.
+
+    Args:
+        path: Path of the log file
+        restaurant: Restaurant the log starts from, which must not have a
+            log attached; a new one if not given
+        workers: Number of worker processes, defaults to the CPU count
+
+    Returns:
+        The restaurant with the log applied
+    """
+    if restaurant is None:
+        restaurant = Restaurant("Restaurant")
+    customers, menu_records = replay_customers(path, restaurant, workers, keep_history=True)
+
+    # Apply the menu records to get every item version the orders refer to
+    items = list(restaurant.get_menu())
+    for record in menu_records:
+        op = record[0]
+        if op == wal.ADD_ITEM:
+            items.append(restaurant.add_menu_item(*record[1:]))
+        elif op == wal.UPDATE_PRICE:
+            if restaurant.update_menu_item_price(record[1], record[2]):
+                items.append(restaurant.find_menu_item(record[1]))
+        elif op == wal.RENAME_ITEM:
+            if restaurant.rename_menu_item(record[1], record[2]):
+                items.append(restaurant.find_menu_item(record[2]))
+        else:
+            wal.apply_record(restaurant, record)
+
+    for customer_id, replayed in customers.items():
+        customer = restaurant.get_customer(customer_id)
+        if replayed.details is not None and customer is None:
+            customer = restaurant._register_customer(customer_id, *replayed.details)
+            number = customer_id[1:]
+            if restaurant.customer_id_generator is None and number.isdigit():
+                restaurant.next_customer_id = max(restaurant.next_customer_id, int(number) + 1)
+        if customer is None:
+            raise ValueError(f"Log refers to unknown customer {customer_id}")
+        for timestamp, amount in replayed.deposits:
+            customer._post(time.time() if timestamp is None else timestamp, amount, DEPOSIT)
+        for order_id, timestamp, version, total, entries, prices, quantities in replayed.history:
+            if order_id is None:
+                order_id = restaurant.id_generator.next_id()
+            customer._add_order(Order._restore(
+                customer_id, order_id, timestamp, Money(total), [items[entry] for entry in entries], prices, version,
+                quantities,
+            ))
+            customer._post(timestamp, -total, ORDER, order_id)
+        if replayed.removed:
+            restaurant.remove_customer(customer_id)
+    return restaurant
+
+
+def reconcile(restaurant: Restaurant, path: str, base: Optional[Restaurant] = None,
+              workers: Optional[int] = None, tolerance: Union[Money, float] = ZERO) -> List[Divergence]:
+    """Compare live balances and order counts with a parallel replay of the log.
+
+    Args:
+        restaurant: The live restaurant
+        path: Path of the log holding every mutation since `base`
+        base: Restaurant the log starts from, e.g. loaded from the
+            snapshot the log was started after; an empty one if not given
+        workers: Number of worker processes, defaults to the CPU count
+        tolerance: Largest balance difference to ignore; balances are
+            exact, so any difference counts by default
+
+    Returns:
+        One Divergence per customer whose live state differs from the log
+    """
+    customers, _ = replay_customers(path, base, workers)
+    tolerance = Money.of(tolerance)
+    divergences = []
+    expected_ids = set()
+    for customer_id, replayed in customers.items():
+        base_customer = base.get_customer(customer_id) if base is not None else None
+        if replayed.removed:
+            continue
+        expected_ids.add(customer_id)
+        balance = Money(replayed.funds - replayed.spent)
+        orders = replayed.order_count
+        if base_customer is not None:
+            balance += base_customer.balance
+            orders += len(base_customer.orders)
+        live = restaurant.get_customer(customer_id)
+        if live is None:
+            divergences.append(Divergence(customer_id, balance, None, orders, None))
+        elif abs(live.balance - balance) > tolerance or len(live.orders) != orders:
+            divergences.append(Divergence(customer_id, balance, live.balance, orders, len(live.orders)))
+
+    # Customers the log never touched keep their base state
+    if base is not None:
+        for base_customer in base.get_customers():
+            customer_id = base_customer.customer_id
+            if customer_id in customers:
+                continue
+            expected_ids.add(customer_id)
+            live = restaurant.get_customer(customer_id)
+            if live is None:
+                divergences.append(Divergence(
+                    customer_id, base_customer.balance, None, len(base_customer.orders), None,
+                ))
+            elif abs(live.balance - base_customer.balance) > tolerance or len(live.orders) != len(base_customer.orders):
+                divergences.append(Divergence(
+                    customer_id, base_customer.balance, live.balance, len(base_customer.orders), len(live.orders),
+                ))
+
+    for live in restaurant.get_customers():
+        if live.customer_id not in expected_ids:
+            divergences.append(Divergence(live.customer_id, None, live.balance, None, len(live.orders)))
+    return divergences
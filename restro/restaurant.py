@@ -1,47 +1,198 @@
 """
 Module containing the Restaurant class for the restaurant management system.
 """
-from typing import List, Dict, Optional
-from .models import MenuItem
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Callable, List, Dict, Iterable, Iterator, MutableMapping, Optional, Tuple, Union
+from .models import (
+    MenuItem,
+    Order,
+    OrderResult,
+    ORDER_OK,
+    ORDER_CUSTOMER_NOT_FOUND,
+    ORDER_ITEM_NOT_FOUND,
+    ORDER_INSUFFICIENT_FUNDS,
+    order_quantities,
+)
 from .customer import Customer
+from .directory import CustomerDirectory
+from .history import OrderHistory
+from .ledger import Ledger, ADJUSTMENT, CLOSURE
+from .money import Money
+from .locks import NO_LOCK
+from .ids import default_generator
+from .menu import MenuVersion, normalize_name
+from .search import MenuSearchIndex
+from .storage import MemoryBackend, StorageBackend
+from . import wal
+
+# Menu versions kept for pricing logged orders on replay, see menu_at
+MENU_HISTORY = 64
+
+# Records restored per lock acquisition or menu version, see restore_*
+RESTORE_BATCH = 1024
+
+
+class _NameKeys(dict):
+    """Menu keys by item name as spelled, each normalized on first sight."""
+
+    def __init__(self, normalize: Callable[[str], str]):
+        super().__init__()
+        self.normalize = normalize
+
+    def __missing__(self, name: str) -> str:
+        key = self[name] = self.normalize(name)
+        return key
 
 
 class Restaurant:
     """Represents a restaurant with menu and customer management."""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, thread_safe: bool = False, id_generator=None,
+                 customer_id_generator=None, storage: Optional[StorageBackend] = None):
         """Initialize a restaurant.
         
         Args:
             name: The name of the restaurant
+            thread_safe: Whether the restaurant will be shared between
+                threads. Enables a lock serializing menu changes, a lock
+                on customer registration, a lock per customer, so orders
+                for different customers still run in parallel, and a
+                short lock on the liabilities ledger. Menu reads never
+                lock.
+            id_generator: Object with a `next_id() -> int` method issuing
+                order IDs, defaults to the process-wide generator in
+                restro.ids
+            customer_id_generator: Generator issuing customer IDs in place
+                of the sequential C0001 counter, which may be the same
+                object as `id_generator`
+            storage: Backend keeping the customers and their orders,
+                loading whatever it already holds, see restro.storage;
+                in memory if not given
         """
         self.name = name
-        self.menu: List[MenuItem] = []
-        self.customers: Dict[str, Customer] = {}
+        # Current menu version and the most recent ones, see restro.menu
+        self._menu = MenuVersion()
+        self._menu_history: Dict[int, MenuVersion] = {0: self._menu}
+        # Email, name and paging indexes over customers, built on first use
+        self._directory: Optional[CustomerDirectory] = None
         self.next_customer_id = 1
+        self.id_generator = id_generator if id_generator is not None else default_generator()
+        self.customer_id_generator = customer_id_generator
+        # Operation log receiving every mutation, see restro.wal
+        self.log = None
+        # Checkpoint the state continues from, naming the log generation to replay
+        self.log_generation = 0
+        # Sales aggregates updated on every order, see restro.analytics
+        self.analytics = None
+        # Station queues receiving every order, see restro.kitchen
+        self.kitchen = None
+        # Call counts, latencies and rejects, see restro.metrics
+        self.metrics = None
+        # Prefix and fuzzy name index, built on first search
+        self._search_index: Optional[MenuSearchIndex] = None
+        # Every customer ledger entry, and closures, see restro.ledger
+        self._liabilities = Ledger()
+        # Every customer's orders in time order, built on first use, see restro.history
+        self._order_index: Optional[OrderHistory] = None
+        self.thread_safe = thread_safe
+        if thread_safe:
+            self._menu_write_lock = threading.Lock()
+            self._search_lock = threading.Lock()
+            self._customers_lock = threading.Lock()
+            self._ledger_lock = threading.Lock()
+            self._orders_lock = threading.Lock()
+        else:
+            self._menu_write_lock = self._search_lock = NO_LOCK
+            self._customers_lock = self._ledger_lock = self._orders_lock = NO_LOCK
+        self.storage = storage if storage is not None else MemoryBackend()
+        self.customers: MutableMapping[str, Customer] = self.storage.open(self)
     
-    def get_menu(self) -> List[MenuItem]:
+    @property
+    def menu(self) -> MenuVersion:
+        """The current version of the menu."""
+        return self._menu
+    
+    def get_menu(self) -> MenuVersion:
         """Get the restaurant's menu.
         
+        The version returned never changes, however the menu is changed
+        afterwards, so it can be read without locking.
+        
+        Returns:
+            The current MenuVersion, a sequence of menu items
+        """
+        return self._menu
+    
+    def menu_at(self, version: int) -> Optional[MenuVersion]:
+        """Get a recent version of the menu.
+        
+        Args:
+            version: Version number, as recorded on orders
+            
         Returns:
-            List of menu items
+            The MenuVersion, or None if it is older than the last
+            MENU_HISTORY versions
         """
-        return self.menu
+        return self._menu_history.get(version)
+    
+    def _publish(self, menu: MenuVersion):
+        """Make a menu version current. Caller holds the menu write lock."""
+        self._menu = menu
+        history = self._menu_history
+        history[menu.version] = menu
+        if len(history) > MENU_HISTORY:
+            del history[next(iter(history))]
+        self.storage.save_menu(menu)
+    
+    def _install_menu(self, menu: MenuVersion):
+        """Replace the menu and its history, e.g. with a menu loaded from disk."""
+        with self._menu_write_lock:
+            self._menu_history = {menu.version: menu}
+            self._menu = menu
+            with self._search_lock:
+                self._search_index = None
+    
+    _normalize_name = staticmethod(normalize_name)
     
-    def add_menu_item(self, name: str, price: float, category: str = "Food") -> MenuItem:
+    def find_menu_item(self, item_name: str) -> Optional[MenuItem]:
+        """Look up a menu item by name, ignoring case.
+        
+        Args:
+            item_name: Name of the item to find
+            
+        Returns:
+            The MenuItem object if found, None otherwise
+        """
+        return self._menu.find(self._normalize_name(item_name))
+    
+    def add_menu_item(self, name: str, price: Union[Money, float], category: str = "Food") -> MenuItem:
         """Add a new item to the menu.
         
         Args:
             name: Name of the menu item
-            price: Price of the menu item
+            price: Price of the menu item, as Money or a number of
+                currency units
             category: Category of the item
             
         Returns:
             The created MenuItem object
         """
-        item = MenuItem(name, price, category)
-        self.menu.append(item)
-        return item
+        price = Money.of(price)
+        with self._menu_write_lock:
+            item = MenuItem(name, price, category)
+            # A duplicate name keeps finding the first item, as a menu scan would
+            key = self._normalize_name(name)
+            menu = self._menu.appended(key, item)
+            # Log before publishing, so no order priced against the new
+            # version reaches the log ahead of it
+            if self.log is not None:
+                self.log.append(wal.ADD_ITEM, name, float(price), category)
+            self._publish(menu)
+            self._sync_search(key)
+            return item
     
     def remove_menu_item(self, item_name: str) -> bool:
         """Remove an item from the menu.
@@ -52,32 +203,190 @@ class Restaurant:
         Returns:
             True if successful, False otherwise
         """
-        for i, item in enumerate(self.menu):
-            if item.name.lower() == item_name.lower():
-                self.menu.pop(i)
-                return True
-        return False
+        with self._menu_write_lock:
+            key = self._normalize_name(item_name)
+            if self._menu.find(key) is None:
+                return False
+        
+            menu = self._menu.removed(key)
+            if self.log is not None:
+                self.log.append(wal.REMOVE_ITEM, item_name)
+            self._publish(menu)
+            self._sync_search(key)
+            return True
+    
+    def rename_menu_item(self, item_name: str, new_name: str) -> bool:
+        """Rename a menu item, keeping its position on the menu.
+        
+        Args:
+            item_name: Current name of the item
+            new_name: New name for the item
+            
+        Returns:
+            True if successful, False if the item was not found or
+            another item already uses the new name
+        """
+        with self._menu_write_lock:
+            key = self._normalize_name(item_name)
+            new_key = self._normalize_name(new_name)
+            item = self._menu.find(key)
+            if item is None:
+                return False
+            if new_key != key and self._menu.find(new_key) is not None:
+                return False
+        
+            menu = self._menu.replaced(key, item.with_name(new_name), new_key)
+            if self.log is not None:
+                self.log.append(wal.RENAME_ITEM, item_name, new_name)
+            self._publish(menu)
+            self._sync_search(key)
+            self._sync_search(new_key)
+            return True
+    
+    def _sync_search(self, key: str):
+        """Bring the search index in line with the current menu for one key."""
+        with self._search_lock:
+            if self._search_index is None:
+                return
+            if self._menu.find(key) is not None:
+                self._search_index.add(key)
+            else:
+                self._search_index.discard(key)
+    
+    def _search(self) -> MenuSearchIndex:
+        """Get the search index, building it on first use. Caller holds the search lock."""
+        if self._search_index is None:
+            self._search_index = MenuSearchIndex(self._menu.keys())
+        return self._search_index
+    
+    def build_search_index(self):
+        """Build the menu search index now, e.g. at startup, rather than on the first search.
+        
+        The index takes a while to build over a large menu; once built it
+        is kept up to date as the menu changes.
+        """
+        with self._search_lock:
+            self._search()
+    
+    def _items_for(self, keys: List[str]) -> List[MenuItem]:
+        """Get the current items for keys from the search index."""
+        # The index may run ahead of the version read here, or behind it
+        # while a writer finishes, so skip keys the version lacks
+        menu = self._menu
+        return [item for item in map(menu.find, keys) if item is not None]
+    
+    def complete_menu_item(self, prefix: str, limit: int = 10) -> List[MenuItem]:
+        """Get menu items whose name, or a word in it, starts with a prefix.
+        
+        Args:
+            prefix: Start of the name, in any case
+            limit: Most items to return
+            
+        Returns:
+            Matching items, those whose name starts with the prefix first
+        """
+        with self._search_lock:
+            keys = self._search().complete(self._normalize_name(prefix), limit)
+        return self._items_for(keys)
+    
+    def suggest_menu_items(self, item_name: str, limit: int = 3, build: bool = True) -> List[MenuItem]:
+        """Get the menu items most similar to a possibly misspelled name.
+        
+        Args:
+            item_name: Name as typed
+            limit: Most items to return
+            build: Whether to build the search index if it is not built
+                yet; without it nothing is suggested until a search or
+                `build_search_index` builds the index, which keeps the
+                build off paths such as a failed order
+            
+        Returns:
+            Similar items, most similar first
+        """
+        with self._search_lock:
+            if not build and self._search_index is None:
+                return []
+            keys = self._search().fuzzy(self._normalize_name(item_name), limit)
+        return self._items_for(keys)
+    
+    def search_menu(self, query: str, limit: int = 10) -> List[MenuItem]:
+        """Search the menu for autocomplete, falling back to fuzzy matches.
+        
+        Args:
+            query: Start of a name, or a misspelled name
+            limit: Most items to return
+            
+        Returns:
+            Prefix matches first, then similar names
+        """
+        key = self._normalize_name(query)
+        with self._search_lock:
+            index = self._search()
+            keys = index.complete(key, limit)
+            if len(keys) < limit:
+                keys += [match for match in index.fuzzy(key, limit) if match not in keys][:limit - len(keys)]
+        return self._items_for(keys)
     
-    def update_menu_item_price(self, item_name: str, new_price: float) -> bool:
+    def update_menu_item_price(self, item_name: str, new_price: Union[Money, float]) -> bool:
         """Update the price of a menu item.
         
+        The item is replaced by a new version at the new price; orders
+        already placed, and older menu versions, keep the old one.
+        
         Args:
             item_name: Name of the item to update
-            new_price: New price for the item
+            new_price: New price for the item, as Money or a number of
+                currency units
             
         Returns:
             True if successful, False otherwise
         """
-        for item in self.menu:
-            if item.name.lower() == item_name.lower():
-                item.price = new_price
-                return True
-        return False
+        new_price = Money.of(new_price)
+        with self._menu_write_lock:
+            key = self._normalize_name(item_name)
+            item = self._menu.find(key)
+            if item is None:
+                return False
+        
+            menu = self._menu.replaced(key, item.with_price(new_price))
+            if self.log is not None:
+                self.log.append(wal.UPDATE_PRICE, item_name, float(new_price))
+            self._publish(menu)
+            return True
     
-    def add_customer(self, name: str, email: str, address: str) -> Customer:
+    def add_customer(self, name: str, email: str, address: str) -> Optional[Customer]:
         """Add a new customer.
         
         Args:
+            name: Customer's name
+            email: Customer's email, which no other customer may use,
+                ignoring case
+            address: Customer's address
+            
+        Returns:
+            The created Customer object, or None if the email is taken
+        """
+        with self._customers_lock:
+            if self._customer_directory().email_owner(email) is not None:
+                if self.metrics is not None:
+                    self.metrics.reject("restaurant.add_customer", "duplicate_email")
+                return None
+            if self.customer_id_generator is not None:
+                customer_id = f"C{self.customer_id_generator.next_id()}"
+            else:
+                customer_id = f"C{self.next_customer_id:04d}"
+                self.next_customer_id += 1
+        
+            customer = self._register_customer(customer_id, name, email, address)
+            if self.log is not None:
+                self.log.append(wal.ADD_CUSTOMER, customer_id, name, email, address)
+            return customer
+    
+    def _register_customer(self, customer_id: str, name: str, email: str, address: str) -> Customer:
+        """Create a customer under an already allocated ID.
+        
+        Args:
+            customer_id: ID of the new customer
             name: Customer's name
             email: Customer's email
             address: Customer's address
@@ -85,21 +394,127 @@ class Restaurant:
         Returns:
             The created Customer object
         """
-        customer_id = f"C{self.next_customer_id:04d}"
-        self.next_customer_id += 1
-        
-        customer = Customer(name, email, address, customer_id)
+        customer = self._adopt(Customer(name, email, address, customer_id))
         self.customers[customer_id] = customer
+        if self._directory is not None:
+            self._directory.add(customer_id, name, email)
         return customer
     
+    def _adopt(self, customer: Customer) -> Customer:
+        """Attach a newly built customer to this restaurant.
+        
+        Args:
+            customer: The Customer object
+            
+        Returns:
+            The same Customer object
+        """
+        customer._restaurant = self
+        if self.thread_safe:
+            customer._lock = threading.Lock()
+        return customer
+    
+    def _customer_directory(self) -> CustomerDirectory:
+        """Get the customer directory, building it on first use. Caller holds the customers lock."""
+        if self._directory is None:
+            # A snapshot's lazy mapping reads identities without building customers
+            identities = getattr(self.customers, "identities", None)
+            if identities is not None:
+                self._directory = CustomerDirectory(identities())
+            else:
+                self._directory = CustomerDirectory(
+                    (customer.customer_id, customer.name, customer.email) for customer in self.customers.values()
+                )
+        return self._directory
+    
     def get_customers(self) -> List[Customer]:
         """Get all customers.
         
+        Builds a list of every customer; prefer `iter_customers` or
+        `customer_page` for large restaurants.
+        
         Returns:
             List of all customers
         """
         return list(self.customers.values())
     
+    def customer_page(self, after: Optional[str] = None, limit: int = 50) -> Tuple[List[Customer], Optional[str]]:
+        """Get a page of customers in registration order.
+        
+        Args:
+            after: Cursor returned with the previous page, or None for
+                the first page
+            limit: Most customers on the page
+            
+        Returns:
+            The customers, and the cursor of the next page, None after
+            the last page
+        """
+        with self._customers_lock:
+            customer_ids = self._customer_directory().page(after, limit)
+            customers = [self.customers[customer_id] for customer_id in customer_ids]
+        cursor = customer_ids[-1] if len(customer_ids) == limit else None
+        return customers, cursor
+    
+    def iter_customers(self, page_size: int = 256) -> Iterator[Customer]:
+        """Yield every customer in registration order, a page at a time.
+        
+        Customers registered or removed meanwhile are seen or skipped
+        as of the page being read.
+        
+        Args:
+            page_size: Customers fetched per page
+        """
+        cursor = None
+        while True:
+            customers, cursor = self.customer_page(cursor, page_size)
+            yield from customers
+            if cursor is None:
+                return
+    
+    def find_customer_by_email(self, email: str) -> Optional[Customer]:
+        """Look up a customer by email, ignoring case.
+        
+        Args:
+            email: Email of the customer
+            
+        Returns:
+            The Customer object if found, None otherwise
+        """
+        with self._customers_lock:
+            customer_id = self._customer_directory().email_owner(email)
+            return None if customer_id is None else self.customers.get(customer_id)
+    
+    def find_customers_by_name(self, prefix: str, limit: int = 10) -> List[Customer]:
+        """Find customers whose name starts with a prefix, ignoring case.
+        
+        Args:
+            prefix: Start of the name
+            limit: Most customers to return
+            
+        Returns:
+            Matching customers in name order
+        """
+        with self._customers_lock:
+            customer_ids = self._customer_directory().with_name_prefix(prefix, limit)
+            return [self.customers[customer_id] for customer_id in customer_ids]
+    
+    def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
+        """Find customers by email, or by the start of their name.
+        
+        Args:
+            query: An email, matched exactly but ignoring case, or else
+                the start of a name
+            limit: Most customers to return
+            
+        Returns:
+            Matching customers
+        """
+        if "@" in query:
+            customer = self.find_customer_by_email(query)
+            return [] if customer is None else [customer]
+        return self.find_customers_by_name(query, limit)
+    
     def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get a customer by ID.
         
@@ -120,10 +535,315 @@ class Restaurant:
         Returns:
             True if successful, False otherwise
         """
-        if customer_id in self.customers:
-            del self.customers[customer_id]
+        with self._customers_lock:
+            customer = self.customers.pop(customer_id, None)
+            if customer is None:
+                return False
+        
+            if self._directory is not None:
+                self._directory.discard(customer_id, customer.name, customer.email)
+            with customer._lock:
+                # Whatever the customer still holds is no longer owed
+                if customer.balance:
+                    timestamp = time.time()
+                    self._post_liability(timestamp, -customer.balance.cents, CLOSURE)
+                    self.storage.save_closure(customer_id, timestamp, -customer.balance.cents)
+                with self._orders_lock:
+                    if self._order_index is not None:
+                        self._order_index.discard(customer.orders)
+                customer._restaurant = None
+            if self.log is not None:
+                self.log.append(wal.REMOVE_CUSTOMER, customer_id)
             return True
-        return False
+    
+    def total_liabilities(self, when: Union[datetime, float, None] = None) -> Money:
+        """Get the total the restaurant owes its customers.
+        
+        Args:
+            when: Moment to report for, as a datetime or epoch seconds,
+                defaults to now
+            
+        Returns:
+            The sum of customer balances, counting customers since
+            removed only up to their removal
+        """
+        with self._ledger_lock:
+            if when is None:
+                return self._liabilities.balance
+            return self._liabilities.balance_at(when)
+    
+    def _post_liability(self, timestamp: float, cents: int, kind: int, reference: int = 0):
+        """Record a change in what the restaurant owes its customers.
+        
+        Args:
+            timestamp: When the change took effect, in epoch seconds
+            cents: Signed amount in cents, positive for money owed
+            kind: One of the ledger entry kinds
+            reference: ID of the order an ORDER entry pays for
+        """
+        with self._ledger_lock:
+            self._liabilities.append(timestamp, cents, kind, reference)
+    
+    def _order_history(self) -> OrderHistory:
+        """Get the time index of every customer's orders, building it on first use.
+        
+        Caller holds the customers lock and the orders lock, under which
+        orders are added to their customer's history and to the index.
+        """
+        if self._order_index is None:
+            self._order_index = OrderHistory(
+                order for customer in self.customers.values() for order in customer.orders
+            )
+        return self._order_index
+    
+    def orders_between(self, start: Union[datetime, float, None] = None, end: Union[datetime, float, None] = None,
+                       newest_first: bool = False) -> List[Order]:
+        """Get the orders every customer placed in a span of time.
+        
+        The first call indexes every order by time, and the index is
+        kept up to date from then on, so later calls only visit the
+        orders in the span. A SQLite backend answers from the index on
+        order times in its database instead, loading only those orders.
+        
+        Args:
+            start: First moment of the span, as a datetime or epoch
+                seconds, or None from the first order
+            end: Moment the span ends, itself excluded, or None up to
+                the last order
+            newest_first: Whether to list the newest order first
+            
+        Returns:
+            The orders, oldest first unless `newest_first`
+        """
+        stored = getattr(self.customers, "orders_between", None)
+        if stored is not None:
+            return stored(start, end, newest_first)
+        with self._customers_lock, self._orders_lock:
+            return list(self._order_history().between(start, end, newest_first))
+    
+    def order_page(self, before: Optional[Order] = None, limit: int = 50) -> Tuple[List[Order], Optional[Order]]:
+        """Get a page of every customer's orders, newest first.
+        
+        Args:
+            before: Cursor returned with the previous page, or None for
+                the newest orders
+            limit: Most orders on the page
+            
+        Returns:
+            The orders, and the cursor of the next page, None after the
+            last page
+        """
+        stored = getattr(self.customers, "order_page", None)
+        if stored is not None:
+            return stored(before, limit)
+        with self._customers_lock, self._orders_lock:
+            return self._order_history().page(before, limit)
+    
+    def place_orders_bulk(self, batch: Iterable[Tuple[str, List[Union[str, Tuple[str, int]]]]]) -> List[OrderResult]:
+        """Place many orders at once.
+        
+        Item names across the whole batch are resolved once, against one
+        version of the menu, repeats of an item within an order are
+        totalled into one line, order totals are summed exactly in
+        integer cents, and orders are then applied in batch order so each
+        customer's balance reflects the orders placed before it. All
+        orders in the batch share one timestamp.
+        Nothing is printed.
+        
+        Args:
+            batch: Pairs of (customer_id, item_names), the item names
+                being one unit each or (name, quantity) pairs
+            
+        Returns:
+            One OrderResult per input pair, in the same order
+            
+        Raises:
+            ValueError: If a quantity is not a positive whole number
+        """
+        return self._place_orders_bulk(list(batch))
+    
+    def _place_orders_bulk(self, batch: List[Tuple[str, List[Union[str, Tuple[str, int]]]]]) -> List[OrderResult]:
+        """Place a batch of orders, all priced against one menu version."""
+        # Normalize each distinct spelling in the batch once
+        keys = _NameKeys(self._normalize_name)
+        orders = [order_quantities(item_names, keys.__getitem__) for _, item_names in batch]
+        menu = self._menu
+        version = menu.version
+        # Resolve every distinct name once; None marks an unknown name
+        resolved: Dict[str, Optional[MenuItem]] = {}
+        for quantities in orders:
+            for item_name in quantities:
+                if item_name not in resolved:
+                    resolved[item_name] = menu.find(keys[item_name])
+        
+        # The whole batch is placed at one instant
+        placed_at = time.time()
+        customers = self.customers
+        results = []
+        for (customer_id, _), quantities in zip(batch, orders):
+            customer = customers.get(customer_id)
+            if customer is None:
+                results.append(OrderResult(customer_id, ORDER_CUSTOMER_NOT_FOUND))
+                continue
+            
+            # Total the order in integer cents while collecting its items
+            items = []
+            total_cents = 0
+            for item_name, quantity in quantities.items():
+                item = resolved[item_name]
+                if item is None:
+                    results.append(OrderResult(customer_id, ORDER_ITEM_NOT_FOUND, item_name=item_name))
+                    break
+                items.append(item)
+                total_cents += item.price.cents * quantity
+            else:
+                total_cost = Money(total_cents)
+                with customer._lock:
+                    if customer.balance < total_cost:
+                        results.append(OrderResult(customer_id, ORDER_INSUFFICIENT_FUNDS))
+                        continue
+                    order = customer._record_order(items, total_cost, placed_at, menu_version=version,
+                                                   quantities=list(quantities.values()))
+                results.append(OrderResult(customer_id, ORDER_OK, order))
+        if self.metrics is not None:
+            for result in results:
+                if result.status != ORDER_OK:
+                    self.metrics.reject("restaurant.place_orders_bulk", result.status)
+        return results
+    
+    def _check_restorable(self):
+        """Refuse to restore records while an operation log is attached."""
+        if self.log is not None:
+            raise ValueError("Restored records are not logged; restore before attaching a log, then checkpoint")
+    
+    def restore_menu_items(self, records: Iterable[Tuple[str, Money, str]]) -> int:
+        """Add menu items read from an export, publishing one menu version per batch.
+        
+        An item whose name is already on the menu is replaced by a new
+        version of it with the record's price and category.
+        
+        Args:
+            records: (name, price, category) of each item
+            
+        Returns:
+            The number of items restored
+        """
+        self._check_restorable()
+        records = iter(records)
+        restored = 0
+        while True:
+            batch = list(islice(records, RESTORE_BATCH))
+            if not batch:
+                return restored
+            with self._menu_write_lock:
+                menu = self._menu
+                keys = []
+                for name, price, category in batch:
+                    key = self._normalize_name(name)
+                    current = menu.find(key)
+                    if current is None:
+                        menu = menu.appended(key, MenuItem(name, price, category))
+                    else:
+                        menu = menu.replaced(key, MenuItem(current.name, price, category, current.sku))
+                    keys.append(key)
+                # Publish the batch as one version, not one per item
+                self._publish(MenuVersion(menu, self._menu.version + 1))
+                for key in keys:
+                    self._sync_search(key)
+            restored += len(batch)
+    
+    def restore_customers(self, records: Iterable[Tuple[str, str, str, str, Money]]) -> int:
+        """Register customers read from an export under their own IDs.
+        
+        Each customer's balance is posted to their ledger as one
+        adjustment, dated now.
+        
+        Args:
+            records: (customer_id, name, email, address, balance) of each
+                customer
+            
+        Returns:
+            The number of customers restored
+            
+        Raises:
+            ValueError: If a customer ID is already registered
+        """
+        self._check_restorable()
+        records = iter(records)
+        restored = 0
+        while True:
+            batch = list(islice(records, RESTORE_BATCH))
+            if not batch:
+                return restored
+            now = time.time()
+            with self._customers_lock:
+                for customer_id, name, email, address, balance in batch:
+                    if customer_id in self.customers:
+                        raise ValueError(f"Customer '{customer_id}' is already registered")
+                    customer = self._register_customer(customer_id, name, email, address)
+                    if balance:
+                        with customer._lock:
+                            customer._post(now, balance.cents, ADJUSTMENT)
+                    number = customer_id[1:]
+                    if self.customer_id_generator is None and number.isdigit():
+                        self.next_customer_id = max(self.next_customer_id, int(number) + 1)
+            restored += len(batch)
+    
+    def restore_orders(self, records: Iterable[Tuple[int, str, float, int, List[Tuple[str, str, int, Money]]]]) -> int:
+        """Add orders read from an export to their customers' order history.
+        
+        Restored orders are history: they keep their IDs, times and prices
+        at purchase, but do not debit balances, which a restored customer's
+        balance already reflects. Items no longer on the menu at the
+        recorded price are recreated off the menu, once per name, category
+        and price.
+        
+        Args:
+            records: (order_id, customer_id, timestamp, menu_version,
+                lines) of each order, where lines are (item name,
+                category, quantity, price at purchase)
+            
+        Returns:
+            The number of orders restored
+            
+        Raises:
+            ValueError: If an order names a customer who is not registered
+        """
+        self._check_restorable()
+        menu = self._menu
+        items: Dict[Tuple[str, str, int], MenuItem] = {}
+        analytics = self.analytics
+        restored = 0
+        for order_id, customer_id, timestamp, menu_version, lines in records:
+            customer = self.customers.get(customer_id)
+            if customer is None:
+                raise ValueError(f"Order {order_id} names unknown customer '{customer_id}'")
+            line_items = []
+            quantities = []
+            prices = []
+            total_cents = 0
+            for name, category, quantity, price in lines:
+                cents = price.cents
+                item = items.get((name, category, cents))
+                if item is None:
+                    current = menu.find(self._normalize_name(name))
+                    if current is not None and current.price.cents == cents and current.category == category:
+                        item = current
+                    else:
+                        item = MenuItem(name, price, category, None if current is None else current.sku)
+                    items[name, category, cents] = item
+                line_items.append(item)
+                quantities.append(quantity)
+                prices.append(cents)
+                total_cents += cents * quantity
+            order = Order._restore(customer_id, order_id, timestamp, Money(total_cents), line_items, prices,
+                                   menu_version, quantities)
+            with customer._lock:
+                customer._add_order(order)
+            if analytics is not None:
+                analytics.record_order(order)
+            restored += 1
+        return restored
     
     def __str__(self) -> str:
         """Return a string representation of the restaurant."""
@@ -0,0 +1,380 @@
+"""
+Module containing the menu search index for the restaurant management system.
+
+Names are indexed by their case-folded key, as in Restaurant's menu index:
+
+    names       sorted keys, for completing the start of a name
+    words       sorted (word suffix, key) pairs, for completing a later word
+    postings    word -> keys containing it
+    vocabulary  sorted distinct words, with a trigram -> words index
+
+Fuzzy matching corrects each query word against the vocabulary, which is
+far smaller than the menu: trigrams narrow the vocabulary to a few
+candidates and a bounded edit distance, counting a swap of two adjacent
+letters as one typo, picks the closest. Names are then found by walking
+the postings of one corrected word in rank order and keeping the keys
+that have the other words too, most words first, stopping as soon as
+there are enough; so the work per query follows the result size, not
+the menu size. Postings in rank order are kept up to date as keys come
+and go once a word has been searched for.
+"""
+import heapq
+from bisect import bisect_left, insort
+from itertools import combinations, filterfalse, islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Longest query, in words, whose subsets are tried when not all words match
+MAX_QUERY_WORDS = 6
+
+
+def _trigrams(word: str) -> Set[str]:
+    """Get the trigrams of a word, padded so short words still have some."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_suffixes(key: str) -> List[Tuple[str, str]]:
+    """Get the (suffix, key) pairs starting at each word after the first."""
+    return [
+        (key[i:], key)
+        for i in range(1, len(key))
+        if key[i - 1] == " " and key[i] != " "
+    ]
+
+
+def _max_edits(word: str) -> int:
+    """Get the number of typos tolerated in a word of this length."""
+    return 1 if len(word) < 8 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Get the edit distance between two strings, if within a limit.
+
+    This is the optimal string alignment distance: insertions, deletions,
+    substitutions and swaps of two adjacent characters each count as one
+    edit, so "mocah" is one edit from "mocha".
+
+    Args:
+        a: First string
+        b: Second string
+        limit: Largest distance of interest
+
+    Returns:
+        The distance, or None if it exceeds `limit`
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if limit <= 1:
+        return _within_one_edit(a, b, limit)
+    # Rows i - 2 and i - 1 of the distance table, for the swaps
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before[j - 2] + 1 < distance:
+                distance = before[j - 2] + 1
+            current.append(distance)
+        if min(current) > limit:
+            return None
+        before, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+def _within_one_edit(a: str, b: str, limit: int) -> Optional[int]:
+    """Get the edit distance of two strings at most one apart, as `edit_distance`, without the table."""
+    if a == b:
+        return 0
+    if limit < 1:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    # Past the first difference the rest must match, give or take that one edit
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return 1 if a[i:] == b[i + 1:] else None
+    if a[i + 1:] == b[i + 1:]:
+        return 1
+    # Or the two letters at the difference are swapped
+    if i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]:
+        return 1
+    return None
+
+
+class MenuSearchIndex:
+    """Prefix and fuzzy search over menu item keys."""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        """Build an index.
+
+        Args:
+            keys: Initial case-folded item names
+        """
+        self._keys: Set[str] = set()
+        self._names: List[str] = []
+        self._words: List[Tuple[str, str]] = []
+        self._postings: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_grams: Dict[str, Set[str]] = {}
+        # Postings of searched words sorted by rank, kept sorted as keys come and go
+        self._ranked_postings: Dict[str, List[str]] = {}
+        for key in keys:
+            self._keys.add(key)
+            self._names.append(key)
+            self._words.extend(_word_suffixes(key))
+            for word in key.split():
+                postings = self._postings.get(word)
+                if postings is None:
+                    self._postings[word] = {key}
+                    self._vocabulary.append(word)
+                    self._index_word(word)
+                else:
+                    postings.add(key)
+        self._names.sort()
+        self._words.sort()
+        self._vocabulary.sort()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _index_word(self, word: str):
+        """Add a vocabulary word to the trigram index."""
+        for gram in _trigrams(word):
+            words = self._vocabulary_grams.get(gram)
+            if words is None:
+                self._vocabulary_grams[gram] = {word}
+            else:
+                words.add(word)
+
+    def add(self, key: str):
+        """Index a key, if it is not indexed already."""
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        insort(self._names, key)
+        for suffix in _word_suffixes(key):
+            insort(self._words, suffix)
+        for word in key.split():
+            postings = self._postings.get(word)
+            if postings is None:
+                self._postings[word] = {key}
+                insort(self._vocabulary, word)
+                self._index_word(word)
+            elif key not in postings:
+                postings.add(key)
+                ranked = self._ranked_postings.get(word)
+                if ranked is not None:
+                    ranked.insert(_rank_position(ranked, key), key)
+
+    def discard(self, key: str):
+        """Remove a key from the index, if it is indexed."""
+        if key not in self._keys:
+            return
+        self._keys.remove(key)
+        del self._names[bisect_left(self._names, key)]
+        for suffix in _word_suffixes(key):
+            del self._words[bisect_left(self._words, suffix)]
+        for word in set(key.split()):
+            postings = self._postings[word]
+            postings.discard(key)
+            if postings:
+                ranked = self._ranked_postings.get(word)
+                if ranked is not None:
+                    del ranked[_rank_position(ranked, key)]
+                continue
+            del self._postings[word]
+            self._ranked_postings.pop(word, None)
+            del self._vocabulary[bisect_left(self._vocabulary, word)]
+            for gram in _trigrams(word):
+                words = self._vocabulary_grams[gram]
+                words.discard(word)
+                if not words:
+                    del self._vocabulary_grams[gram]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Get keys starting with a prefix, or with a later word starting with it.
+
+        Names starting with the prefix come first, then names with a
+        later word starting with it, each in alphabetical order.
+
+        Args:
+            prefix: Case-folded start of a name
+            limit: Most keys to return
+
+        Returns:
+            Matching keys, best first
+        """
+        matches = []
+        position = bisect_left(self._names, prefix)
+        while position < len(self._names) and len(matches) < limit:
+            key = self._names[position]
+            if not key.startswith(prefix):
+                break
+            matches.append(key)
+            position += 1
+
+        seen = set(matches)
+        position = bisect_left(self._words, (prefix,))
+        while position < len(self._words) and len(matches) < limit:
+            suffix, key = self._words[position]
+            if not suffix.startswith(prefix):
+                break
+            if key not in seen:
+                seen.add(key)
+                matches.append(key)
+            position += 1
+        return matches
+
+    def correct(self, word: str, allow_prefix: bool = False) -> List[str]:
+        """Get the vocabulary words closest to a possibly misspelled word.
+
+        Args:
+            word: Case-folded query word
+            allow_prefix: Whether words starting with `word` count as
+                exact matches when `word` itself is unknown, for a word
+                still being typed
+
+        Returns:
+            The words at the smallest edit distance found, if any within
+            the tolerated number of typos
+        """
+        if word in self._postings:
+            return [word]
+        exact = []
+        if allow_prefix:
+            position = bisect_left(self._vocabulary, word)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+                exact.append(self._vocabulary[position])
+                position += 1
+        if exact:
+            return exact
+
+        # One typo changes at most four trigrams, so close words share the rest
+        grams = _trigrams(word)
+        limit = _max_edits(word)
+        need = max(1, len(grams) - 4 * limit)
+        counts: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._vocabulary_grams.get(gram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+
+        best: List[str] = []
+        for candidate, shared in counts.items():
+            if shared < need:
+                continue
+            distance = edit_distance(word, candidate, limit)
+            if distance is None:
+                continue
+            if distance < limit or not best:
+                best = [candidate]
+                limit = distance
+            elif distance == limit:
+                best.append(candidate)
+        return best
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[str]:
+        """Get the keys most similar to a possibly misspelled name.
+
+        Keys matching more of the query's words rank first, then shorter
+        keys, then alphabetical order.
+
+        Args:
+            query: Case-folded name to match
+            limit: Most keys to return
+
+        Returns:
+            Similar keys, most similar first
+        """
+        words = list(dict.fromkeys(query.split()))[:MAX_QUERY_WORDS]
+        choices = []
+        for position, word in enumerate(words):
+            corrections = self.correct(word, allow_prefix=position == len(words) - 1)
+            if corrections:
+                choices.append(corrections)
+
+        # Combinations keep the query's word order, so dropping later words
+        # is tried before dropping earlier ones
+        results: List[str] = []
+        seen: Set[str] = set()
+        for size in range(len(choices), 0, -1):
+            for combination in combinations(choices, size):
+                wanted = limit - len(results)
+                first, *rest = sorted(combination, key=self._posting_count)
+                if len(first) == 1:
+                    # Walk the fewest keys in rank order until enough have the other words
+                    ranked = self._best_with(first[0], [self._keys_with(words) for words in rest], seen, wanted)
+                elif not rest:
+                    ranked = self._shortest_with(first, seen, wanted)
+                else:
+                    smallest, *others = map(self._keys_with, [first] + rest)
+                    ranked = _shortest(smallest.intersection(*others), seen, wanted)
+                results.extend(ranked)
+                seen.update(ranked)
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def _posting_count(self, words: List[str]) -> int:
+        """Count the keys containing any of some words, counting shared keys once per word."""
+        return sum(len(self._postings[word]) for word in words)
+
+    def _keys_with(self, words: List[str]) -> Set[str]:
+        """Get the keys containing any of some words."""
+        if len(words) == 1:
+            return self._postings[words[0]]
+        return set().union(*(self._postings[word] for word in words))
+
+    def _best_with(self, word: str, within: List[Set[str]], seen: Set[str], n: int) -> List[str]:
+        """Get the n best-ranked unseen keys containing a word that are in every set of `within`."""
+        # Chained filters test the keys without a Python loop, and stop with the nth
+        keys = filterfalse(seen.__contains__, self._ranked(word))
+        for others in within:
+            keys = filter(others.__contains__, keys)
+        return list(islice(keys, n))
+
+    def _shortest_with(self, words: List[str], seen: Set[str], n: int) -> List[str]:
+        """Get the n best-ranked unseen keys containing any of some words."""
+        ranked = []
+        for key in heapq.merge(*map(self._ranked, words), key=_rank):
+            if key not in seen and (not ranked or ranked[-1] != key):
+                ranked.append(key)
+                if len(ranked) == n:
+                    break
+        return ranked
+
+    def _ranked(self, word: str) -> List[str]:
+        """Get the keys containing a word in rank order, sorting them the first time."""
+        ranked = self._ranked_postings.get(word)
+        if ranked is None:
+            ranked = self._ranked_postings[word] = sorted(self._postings[word], key=_rank)
+        return ranked
+
+
+def _rank(key: str) -> Tuple[int, str]:
+    """Order keys shortest first, ties in alphabetical order."""
+    return len(key), key
+
+
+def _rank_position(ranked: List[str], key: str) -> int:
+    """Find where a key goes in a list of keys in rank order, by bisection."""
+    rank = _rank(key)
+    low, high = 0, len(ranked)
+    while low < high:
+        middle = (low + high) // 2
+        if _rank(ranked[middle]) < rank:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _shortest(keys: Set[str], seen: Set[str], n: int) -> List[str]:
+    """Get the n best-ranked keys not already seen."""
+    return heapq.nsmallest(n, (key for key in keys if key not in seen), key=_rank)
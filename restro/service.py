@@ -0,0 +1,537 @@
+"""
+Module containing an asyncio HTTP/JSON service for the restaurant management system.
+
+The service exposes the same operations as Admin, Customer and Restaurant:
+
+    GET    /menu                         list the menu
+    GET    /menu/search?q=...&limit=N    autocomplete, then close matches
+    POST   /menu                         add an item {"name", "price", "category"}
+    PATCH  /menu/{name}                  update {"price"} and/or rename {"name"}
+    DELETE /menu/{name}                  remove an item
+    GET    /customers?after=ID&limit=N   list customers, a page at a time
+    GET    /customers?q=...&limit=N      find customers by email or name prefix
+    POST   /customers                    register {"name", "email", "address"}
+    GET    /customers/{id}               customer details and balance
+    DELETE /customers/{id}               remove a customer
+    POST   /customers/{id}/funds         add funds {"amount"}
+    GET    /customers/{id}/orders?before=CURSOR&limit=N  order history, a page at a time
+    POST   /customers/{id}/orders        place an order {"items": [name or [name, quantity], ...]}
+
+Orders come back with one entry per line, {"item": {...}, "quantity": n},
+not one per unit. Order history comes newest first as {"orders": [...],
+"next": CURSOR}, where CURSOR is the `before` of the next page, null
+after the last one.
+
+Menu changes and customer listing/removal require the admin's credentials
+through HTTP Basic authentication when the service has an Admin.
+
+Connections are kept alive and may pipeline requests; responses are
+written in request order. Parsed requests go through one bounded queue
+to the worker tasks that touch the restaurant, and a connection whose
+request cannot be queued stops being read until there is room, which
+pushes back on clients through TCP flow control.
+"""
+import asyncio
+import base64
+import json
+import math
+from http import HTTPStatus
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .admin import Admin
+from .customer import Customer
+from .models import MenuItem, Order, ORDER_OK, ORDER_CUSTOMER_NOT_FOUND, ORDER_ITEM_NOT_FOUND
+from .money import Money, ZERO
+from .restaurant import Restaurant
+
+# Largest request head and body accepted, in bytes
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+Response = Tuple[int, Any]
+
+
+class HTTPError(Exception):
+    """An error answered with an HTTP status and a JSON message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def item_to_dict(item: MenuItem) -> Dict[str, Any]:
+    """Convert a menu item to its JSON form."""
+    return {"name": item.name, "price": float(item.price), "category": item.category}
+
+
+def customer_to_dict(customer: Customer) -> Dict[str, Any]:
+    """Convert a customer to its JSON form."""
+    return {
+        "customer_id": customer.customer_id,
+        "name": customer.name,
+        "email": customer.email,
+        "address": customer.address,
+        "balance": float(customer.check_balance()),
+    }
+
+
+def order_to_dict(order: Order) -> Dict[str, Any]:
+    """Convert an order to its JSON form."""
+    return {
+        "order_id": order.order_id,
+        "customer_id": order.customer_id,
+        "timestamp": order.timestamp.isoformat(),
+        "lines": [{"item": item_to_dict(item), "quantity": quantity} for item, quantity in order.lines],
+        "total_price": float(order.total_price),
+        "menu_version": order.menu_version,
+    }
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    __slots__ = ("method", "path", "query", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str], body: bytes):
+        """Initialize a request.
+
+        Args:
+            method: Request method
+            target: Request target from the request line
+            version: HTTP version from the request line
+            headers: Header fields with lower-cased names
+            body: Request body
+        """
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = url.query
+        self.headers = headers
+        self.body = body
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            self.keep_alive = connection == "keep-alive"
+        else:
+            self.keep_alive = connection != "close"
+
+    def json(self) -> Dict[str, Any]:
+        """Decode the body as a JSON object."""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be valid JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+        return data
+
+
+class RestaurantService:
+    """Serves a Restaurant over HTTP/1.1 with JSON bodies."""
+
+    def __init__(self, restaurant: Restaurant, admin: Optional[Admin] = None,
+                 queue_size: int = 1024, workers: int = 1, pipeline_depth: int = 32):
+        """Initialize the service.
+
+        Args:
+            restaurant: The restaurant to serve
+            admin: Admin whose credentials guard admin routes, or None
+                to leave them open
+            queue_size: Requests that may wait for a worker before
+                connections stop being read
+            workers: Number of worker tasks draining the queue; operations
+                are synchronous, so one is enough unless handlers change
+            pipeline_depth: Requests a single connection may have in
+                flight before it stops being read
+        """
+        self.restaurant = restaurant
+        self.admin = admin
+        self.queue_size = queue_size
+        self.workers = workers
+        self.pipeline_depth = pipeline_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        """Start listening and return the server."""
+        # Built before the first request, so failed orders come back with suggestions
+        self.restaurant.build_search_index()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(
+            self._serve_connection, host, port, limit=MAX_HEADER_SIZE, backlog=4096
+        )
+        return self._server
+
+    async def close(self):
+        """Stop listening, close open connections and stop the workers."""
+        if self._server is not None:
+            self._server.close()
+        # Let connection handlers see end of stream and finish on their own
+        connections = list(self._connections.items())
+        for _, writer in connections:
+            writer.close()
+        await asyncio.gather(*(task for task, _ in connections), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080):
+        """Start the service and run until cancelled."""
+        server = await self.start(host, port)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _work(self):
+        """Execute queued requests against the restaurant."""
+        while True:
+            request, future = await self._queue.get()
+            try:
+                response = self.handle(request)
+            except Exception as error:  # answer with 500 rather than killing the worker
+                response = (HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)})
+            if not future.done():
+                future.set_result(response)
+            self._queue.task_done()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read pipelined requests from a connection and queue them."""
+        responses: asyncio.Queue = asyncio.Queue(self.pipeline_depth)
+        responder = asyncio.create_task(self._respond(responses, writer))
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as error:
+                    future = loop.create_future()
+                    future.set_result((error.status, {"error": error.message}))
+                    await responses.put((future, False))
+                    break
+                if request is None:
+                    break
+                future = loop.create_future()
+                # Blocks while the connection or the service is saturated
+                await responses.put((future, request.keep_alive))
+                await self._queue.put((request, future))
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await responses.put((None, False))
+            await responder
+            del self._connections[task]
+
+    async def _respond(self, responses: asyncio.Queue, writer: asyncio.StreamWriter):
+        """Write responses in request order, then close the connection.
+
+        Once the connection fails or is closed, remaining responses are
+        still consumed so the reading side never blocks on a full queue.
+        """
+        open_ = True
+        while True:
+            future, keep_alive = await responses.get()
+            if future is None:
+                break
+            status, payload = await future
+            if not open_:
+                continue
+            try:
+                writer.write(self._encode_response(status, payload, keep_alive))
+                if responses.empty():
+                    await writer.drain()
+            except ConnectionError:
+                keep_alive = False
+            if not keep_alive:
+                open_ = False
+                writer.close()
+        if open_:
+            writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+        """Read one request, or return None at end of stream."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if error.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request.")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request head too large.")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported.")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, version, headers, body)
+
+    @staticmethod
+    def _encode_response(status: int, payload: Any, keep_alive: bool) -> bytes:
+        """Serialize a response with a JSON body."""
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        status = HTTPStatus(status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    def handle(self, request: Request) -> Response:
+        """Route a request to the matching operation.
+
+        Args:
+            request: The parsed request
+
+        Returns:
+            The (status, JSON payload) pair to send back
+        """
+        parts = [unquote(part) for part in request.path.strip("/").split("/")]
+        try:
+            if parts[0] == "menu":
+                return self._route_menu(request, parts[1:])
+            if parts[0] == "customers":
+                return self._route_customers(request, parts[1:])
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown resource.")
+        except HTTPError as error:
+            return error.status, {"error": error.message}
+
+    def _require_admin(self, request: Request):
+        """Reject the request unless it carries the admin's credentials."""
+        if self.admin is None:
+            return
+        scheme, _, encoded = request.headers.get("authorization", "").partition(" ")
+        try:
+            username, _, password = base64.b64decode(encoded).decode("utf-8").partition(":")
+        except ValueError:
+            username = password = None
+        if scheme.lower() != "basic" or (username, password) != (self.admin.username, self.admin.password):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Admin credentials required.")
+
+    def _route_menu(self, request: Request, parts: List[str]) -> Response:
+        """Handle /menu routes."""
+        restaurant = self.restaurant
+        method = request.method
+        if not parts and method == "GET":
+            return HTTPStatus.OK, [item_to_dict(item) for item in restaurant.get_menu()]
+        if parts == ["search"] and method == "GET":
+            query = parse_qs(request.query)
+            limit = query.get("limit", ["10"])[0]
+            if not limit.isdigit() or not 0 < int(limit) <= 100:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'limit' must be between 1 and 100.")
+            matches = restaurant.search_menu(query.get("q", [""])[0], int(limit))
+            return HTTPStatus.OK, [item_to_dict(item) for item in matches]
+        if len(parts) > 1:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown resource.")
+
+        self._require_admin(request)
+        admin = self.admin or Admin("", "")
+        if not parts and method == "POST":
+            data = request.json()
+            name = _field(data, "name", str)
+            price = _positive(_field(data, "price", (int, float)), "Price")
+            category = data.get("category") or "Food"
+            if restaurant.find_menu_item(name) is not None:
+                raise HTTPError(HTTPStatus.CONFLICT, "An item with this name already exists.")
+            return HTTPStatus.CREATED, item_to_dict(admin.add_menu_item(restaurant, name, price, category))
+        if parts and method == "DELETE":
+            if not admin.remove_menu_item(restaurant, parts[0]):
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Item '{parts[0]}' not found.")
+            return HTTPStatus.OK, {"removed": parts[0]}
+        if parts and method in ("PATCH", "PUT"):
+            data = request.json()
+            name = parts[0]
+            item = restaurant.find_menu_item(name)
+            if item is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Item '{name}' not found.")
+            # Validate the whole update first, so a rejected one changes nothing
+            price = _positive(_field(data, "price", (int, float)), "Price") if "price" in data else None
+            new_name = _field(data, "name", str) if "name" in data else None
+            if new_name is not None and restaurant.find_menu_item(new_name) not in (None, item):
+                raise HTTPError(HTTPStatus.CONFLICT, "An item with this name already exists.")
+            if new_name is not None:
+                if not admin.rename_menu_item(restaurant, name, new_name):
+                    raise HTTPError(HTTPStatus.CONFLICT, "An item with this name already exists.")
+                name = new_name
+            if price is not None:
+                admin.update_menu_item_price(restaurant, name, price)
+            return HTTPStatus.OK, item_to_dict(restaurant.find_menu_item(name))
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed.")
+
+    def _route_customers(self, request: Request, parts: List[str]) -> Response:
+        """Handle /customers routes."""
+        restaurant = self.restaurant
+        method = request.method
+        if not parts:
+            if method == "POST":
+                data = request.json()
+                customer = restaurant.add_customer(
+                    _field(data, "name", str), _field(data, "email", str), _field(data, "address", str)
+                )
+                if customer is None:
+                    raise HTTPError(HTTPStatus.CONFLICT, "A customer with this email is already registered.")
+                return HTTPStatus.CREATED, customer_to_dict(customer)
+            if method == "GET":
+                self._require_admin(request)
+                return HTTPStatus.OK, [customer_to_dict(c) for c in self._list_customers(request)]
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed.")
+
+        customer = restaurant.get_customer(parts[0])
+        if customer is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Customer with ID '{parts[0]}' not found.")
+        if len(parts) == 1:
+            if method == "GET":
+                return HTTPStatus.OK, customer_to_dict(customer)
+            if method == "DELETE":
+                self._require_admin(request)
+                restaurant.remove_customer(customer.customer_id)
+                return HTTPStatus.OK, {"removed": customer.customer_id}
+        elif parts[1:] == ["funds"] and method == "POST":
+            amount = _positive(_field(request.json(), "amount", (int, float)), "Amount")
+            return HTTPStatus.OK, {"balance": float(customer.add_funds(amount))}
+        elif parts[1:] == ["orders"]:
+            if method == "GET":
+                orders, cursor = self._order_page(customer, request)
+                return HTTPStatus.OK, {
+                    "orders": [order_to_dict(order) for order in orders],
+                    "next": None if cursor is None else _order_cursor(cursor),
+                }
+            if method == "POST":
+                return self._place_order(customer, request.json())
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown resource.")
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed.")
+
+    def _list_customers(self, request: Request) -> Iterable[Customer]:
+        """Get the customers a GET /customers request asks for.
+
+        Without parameters every customer is listed. `q` searches by email
+        or name prefix; `after` and `limit` select a page, whose last
+        customer ID is the `after` of the next one.
+        """
+        query = parse_qs(request.query)
+        limit = query.get("limit", [None])[0]
+        if limit is not None and (not limit.isdigit() or not 0 < int(limit) <= 1000):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'limit' must be between 1 and 1000.")
+        if "q" in query:
+            return self.restaurant.search_customers(query["q"][0], int(limit or 10))
+        if limit is None and "after" not in query:
+            return self.restaurant.iter_customers()
+        customers, _ = self.restaurant.customer_page(query.get("after", [None])[0], int(limit or 50))
+        return customers
+
+    def _order_page(self, customer: Customer, request: Request) -> Tuple[List[Order], Optional[Order]]:
+        """Get the page of order history a GET /customers/{id}/orders request asks for.
+
+        `before` is the cursor returned with the previous page, and `limit`
+        the most orders on the page, 20 by default.
+        """
+        query = parse_qs(request.query)
+        limit = query.get("limit", ["20"])[0]
+        if not limit.isdigit() or not 0 < int(limit) <= 1000:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'limit' must be between 1 and 1000.")
+        before = None
+        if "before" in query:
+            before = _cursor_order(customer, query["before"][0])
+            if before is None:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'before' is not a cursor of this order history.")
+        return customer.order_page(before, int(limit))
+
+    def _place_order(self, customer: Customer, data: Dict[str, Any]) -> Response:
+        """Place an order and map its outcome to a response."""
+        item_names = data.get("items")
+        if not isinstance(item_names, list) or not item_names:
+            raise HTTPError(HTTPStatus.BAD_REQUEST,
+                            "'items' must be a non-empty list of item names or [name, quantity] pairs.")
+        try:
+            result = self.restaurant.place_orders_bulk([(customer.customer_id, item_names)])[0]
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(error))
+        if result.status == ORDER_OK:
+            return HTTPStatus.CREATED, order_to_dict(result.order)
+        if result.status == ORDER_ITEM_NOT_FOUND:
+            return HTTPStatus.NOT_FOUND, {
+                "error": f"Item '{result.item_name}' not found in menu.", "reason": result.status,
+                "suggestions": [item.name for item in self.restaurant.suggest_menu_items(result.item_name, build=False)],
+            }
+        if result.status == ORDER_CUSTOMER_NOT_FOUND:
+            return HTTPStatus.NOT_FOUND, {"error": "Customer not found.", "reason": result.status}
+        return HTTPStatus.PAYMENT_REQUIRED, {
+            "error": "Insufficient balance.", "reason": result.status, "balance": float(customer.check_balance()),
+        }
+
+
+def _order_cursor(order: Order) -> str:
+    """Encode an order as a page cursor: the exact time it was placed and its ID."""
+    return f"{order._created!r}:{order.id}"
+
+
+def _cursor_order(customer: Customer, cursor: str) -> Optional[Order]:
+    """Find the order a page cursor names in a customer's history, or None."""
+    created, _, order_id = cursor.partition(":")
+    try:
+        created, order_id = float(created), int(order_id)
+    except ValueError:
+        return None
+    if not math.isfinite(created):
+        return None
+    # Only the orders placed at that very moment are searched
+    for order in customer.orders.between(created):
+        if order._created != created:
+            break
+        if order.id == order_id:
+            return order
+    return None
+
+
+def _field(data: Dict[str, Any], name: str, kind):
+    """Get a required field of a given type from a JSON object."""
+    value = data.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' is missing or has the wrong type.")
+    return value
+
+
+def _positive(value, label: str) -> Money:
+    """Convert a JSON number to Money, rejecting zero and negative amounts as the interface does."""
+    try:
+        value = Money.of(value)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{label} is not an amount of money.")
+    if value <= ZERO:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{label} must be positive.")
+    return value
@@ -0,0 +1,401 @@
+"""
+Module containing the binary snapshot format for the restaurant management system.
+
+A snapshot stores a whole Restaurant in one file laid out as:
+
+    header          magic, version, counts and section offsets
+    string offsets  (n_strings + 1) x u64 into the string data
+    string data     UTF-8 bytes of every distinct string
+    items           fixed-width menu item records, the menu first, then
+                    older versions of items that orders refer to
+    customers       fixed-width customer records in registration order
+    customer index  u32 record numbers sorted by customer ID
+    orders          fixed-width order records grouped by customer
+    order lines     u32 item record number and u32 quantity per line
+    ledger          five columns of ledger entries, see restro.ledger:
+                    the restaurant's liabilities first, then each
+                    customer's entries in customer record order
+
+Loading maps the file into memory and only decodes the header and the
+menu, and copies the liabilities ledger's columns as they are. Customers,
+their orders and their ledgers, are built the first time they are
+accessed, so time-to-first-request barely grows with the data. The menu
+keeps its version number, so orders and later log records naming menu
+versions still line up.
+"""
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .customer import Customer
+from .ledger import Ledger
+from .menu import MenuVersion
+from .models import MenuItem, Order
+from .money import Money
+from .restaurant import Restaurant
+
+MAGIC = b"RSNP"
+VERSION = 7
+
+# magic, version, restaurant name, next customer id, menu version, log generation,
+# counts: strings, items, menu, customers, orders, lines, ledger entries, liability entries,
+# offsets: string offsets, string data, items, customers, customer index, orders, lines,
+#          ledger times, amounts, kinds, references, balances
+HEADER = struct.Struct("<4sHxxIQQQ6I2Q12Q")
+# name, category, record number of the first version of the item, price in cents
+ITEM = struct.Struct("<IIIq")
+# customer id, name, email, address, first order, order count, first ledger entry, entry count
+CUSTOMER = struct.Struct("<IIIIIIQI")
+# order id, timestamp, total price in cents, menu version, first line, line count
+ORDER = struct.Struct("<QdqQII")
+# item record number, quantity
+LINE = struct.Struct("<II")
+# Array type codes of the ledger columns, in Ledger.columns order
+LEDGER_COLUMNS = "dqBQq"
+
+
+def save_snapshot(restaurant: Restaurant, path: str):
+    """Write a snapshot of a restaurant.
+
+    The file is written next to `path` and renamed into place, so a crash
+    never leaves a partial snapshot behind.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the snapshot file
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    item_numbers: Dict[int, int] = {}
+    # Record number of the first item written for each SKU
+    sku_numbers: Dict[int, int] = {}
+    items = bytearray()
+
+    def item_number(item: MenuItem) -> int:
+        number = item_numbers.get(item.item_id)
+        if number is None:
+            number = item_numbers[item.item_id] = len(item_numbers)
+            origin = sku_numbers.setdefault(item.sku, number)
+            items.extend(ITEM.pack(intern(item.name), intern(item.category), origin, item.price.cents))
+        return number
+
+    name_index = intern(restaurant.name)
+    menu = restaurant.get_menu()
+    for item in menu:
+        item_number(item)
+
+    ledger_columns = [array(code) for code in LEDGER_COLUMNS]
+
+    def add_ledger(ledger: Optional[Ledger]) -> int:
+        if ledger is not None:
+            for column, values in zip(ledger_columns, ledger.columns()):
+                column.extend(values)
+        return len(ledger_columns[0])
+
+    n_liabilities = add_ledger(restaurant._liabilities)
+
+    customers = bytearray()
+    orders = bytearray()
+    lines = array("I")
+    customer_ids: List[str] = []
+    n_orders = 0
+    for customer in restaurant.customers.values():
+        first_entry = len(ledger_columns[0])
+        n_entries = add_ledger(customer._ledger) - first_entry
+        customers.extend(CUSTOMER.pack(
+            intern(customer.customer_id), intern(customer.name), intern(customer.email),
+            intern(customer.address), n_orders, len(customer.orders), first_entry, n_entries,
+        ))
+        customer_ids.append(customer.customer_id)
+        for order in customer.orders:
+            orders.extend(ORDER.pack(
+                order.id, order._created, order.total_price.cents, order.menu_version, len(lines) // 2,
+                len(order._items),
+            ))
+            for item, quantity, _ in order._iter_lines():
+                lines.append(item_number(item))
+                lines.append(quantity)
+        n_orders += len(customer.orders)
+
+    customer_index = array("I", sorted(range(len(customer_ids)), key=customer_ids.__getitem__))
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = array("Q", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    if (lines.itemsize != 4 or string_offsets.itemsize != 8 or customer_index.itemsize != 4
+            or [column.itemsize for column in ledger_columns] != [8, 8, 1, 8, 8]):
+        raise RuntimeError("Unsupported array item sizes on this platform")
+
+    sections = [
+        string_offsets.tobytes(), b"".join(encoded), bytes(items), bytes(customers),
+        customer_index.tobytes(), bytes(orders), lines.tobytes(),
+        *(column.tobytes() for column in ledger_columns),
+    ]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        # Keep every section 8-byte aligned
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, name_index, restaurant.next_customer_id, menu.version, restaurant.log_generation,
+        len(encoded), len(item_numbers), len(menu), len(customer_ids), n_orders, len(lines) // 2,
+        len(ledger_columns[0]), n_liabilities, *offsets,
+    )
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(header)
+        for offset, section in zip(offsets, sections):
+            snapshot_file.write(b"\0" * (offset - snapshot_file.tell()))
+            snapshot_file.write(section)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temp_path, path)
+
+
+def checkpoint(restaurant: Restaurant, path: str):
+    """Write a snapshot and empty the restaurant's operation log.
+
+    The snapshot names the next log generation before the log is swapped
+    for an empty one of that generation, so a crash in between leaves a
+    log that recovery knows the snapshot already holds, see restro.wal.
+
+    Args:
+        restaurant: The restaurant object
+        path: Path of the snapshot file
+    """
+    log = restaurant.log
+    if log is not None:
+        log.sync()
+        restaurant.log_generation += 1
+    save_snapshot(restaurant, path)
+    if log is not None:
+        log.rotate(restaurant.log_generation)
+
+
+def load_snapshot(path: str, thread_safe: bool = False) -> Restaurant:
+    """Load a restaurant from a snapshot.
+
+    Only the header, the menu and the liabilities ledger are read here;
+    customers are built on first access.
+
+    Args:
+        path: Path of the snapshot file
+        thread_safe: Whether the restaurant will be shared between threads
+
+    Returns:
+        The restored Restaurant object
+    """
+    with open(path, "rb") as snapshot_file:
+        data = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    reader = _SnapshotReader(data)
+    restaurant = Restaurant(reader.string(reader.name_index), thread_safe)
+    restaurant.next_customer_id = reader.next_customer_id
+    restaurant.log_generation = reader.log_generation
+    restaurant._install_menu(MenuVersion(
+        (reader.item(number) for number in range(reader.n_menu)), reader.menu_version,
+    ))
+    restaurant._liabilities = reader.ledger(0, reader.n_liabilities)
+    restaurant.customers = LazyCustomers(reader, restaurant)
+    return restaurant
+
+
+class _SnapshotReader:
+    """Decodes records from a memory-mapped snapshot on demand."""
+
+    def __init__(self, data: mmap.mmap):
+        """Validate the header of a mapped snapshot.
+
+        Args:
+            data: The mapped snapshot file
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("Not a restaurant snapshot")
+        fields = HEADER.unpack_from(data)
+        if fields[0] != MAGIC:
+            raise ValueError("Not a restaurant snapshot")
+        if fields[1] != VERSION:
+            raise ValueError(f"Unsupported snapshot version: {fields[1]}")
+        self.data = data
+        (self.name_index, self.next_customer_id, self.menu_version, self.log_generation, self.n_strings,
+         self.n_items, self.n_menu, self.n_customers, self.n_orders, self.n_lines) = fields[2:12]
+        self.n_entries, self.n_liabilities = fields[12:14]
+        (self.string_offsets, self.string_data, self.items_offset, self.customers_offset,
+         self.index_offset, self.orders_offset, self.lines_offset) = fields[14:21]
+        self.ledger_offsets = fields[21:]
+        # Menu items already built, by item record number
+        self.items: Dict[int, MenuItem] = {}
+
+    def string(self, index: int) -> str:
+        """Decode one string from the string table."""
+        start, end = struct.unpack_from("<QQ", self.data, self.string_offsets + 8 * index)
+        return self.data[self.string_data + start:self.string_data + end].decode("utf-8")
+
+    def item(self, number: int) -> MenuItem:
+        """Get the MenuItem for an item record, shared between orders."""
+        item = self.items.get(number)
+        if item is None:
+            name, category, origin, price = ITEM.unpack_from(self.data, self.items_offset + ITEM.size * number)
+            sku = None if origin == number else self.item(origin).sku
+            item = self.items[number] = MenuItem(self.string(name), Money(price), self.string(category), sku)
+        return item
+
+    def ledger(self, first: int, count: int) -> Ledger:
+        """Build a ledger from a run of ledger entries."""
+        columns = []
+        for offset, code in zip(self.ledger_offsets, LEDGER_COLUMNS):
+            column = array(code)
+            size = column.itemsize
+            column.frombytes(self.data[offset + size * first:offset + size * (first + count)])
+            columns.append(column)
+        return Ledger.from_columns(*columns)
+
+    def customer_id(self, record: int) -> str:
+        """Decode only the ID of a customer record."""
+        index, = struct.unpack_from("<I", self.data, self.customers_offset + CUSTOMER.size * record)
+        return self.string(index)
+
+    def customer_identity(self, record: int) -> Tuple[str, str, str]:
+        """Decode only the ID, name and email of a customer record."""
+        id_index, name, email = struct.unpack_from("<III", self.data, self.customers_offset + CUSTOMER.size * record)
+        return self.string(id_index), self.string(name), self.string(email)
+
+    def find_customer(self, customer_id: str) -> Optional[int]:
+        """Binary search the customer index for a customer record."""
+        index = _CustomerIndex(self)
+        position = bisect_left(index, customer_id)
+        if position < self.n_customers and index[position] == customer_id:
+            return index.record(position)
+        return None
+
+    def customer(self, record: int, restaurant: Restaurant) -> Customer:
+        """Build a customer, with its order history, from its record."""
+        id_index, name, email, address, first_order, n_orders, first_entry, n_entries = CUSTOMER.unpack_from(
+            self.data, self.customers_offset + CUSTOMER.size * record
+        )
+        customer_id = self.string(id_index)
+        customer = Customer(self.string(name), self.string(email), self.string(address), customer_id)
+        if n_entries:
+            customer._ledger = self.ledger(first_entry, n_entries)
+        restaurant._adopt(customer)
+        for number in range(first_order, first_order + n_orders):
+            order_id, timestamp, total_price, menu_version, first_line, n_lines = ORDER.unpack_from(
+                self.data, self.orders_offset + ORDER.size * number
+            )
+            lines = struct.unpack_from(f"<{2 * n_lines}I", self.data, self.lines_offset + LINE.size * first_line)
+            items = [self.item(line) for line in lines[::2]]
+            customer.orders.append(Order(items, customer_id, timestamp, Money(total_price), order_id, menu_version,
+                                         list(lines[1::2])))
+        return customer
+
+
+class _CustomerIndex:
+    """Sequence view of customer IDs in sorted order, for bisect."""
+
+    def __init__(self, reader: _SnapshotReader):
+        self.reader = reader
+
+    def record(self, position: int) -> int:
+        """Get the customer record number at a sorted position."""
+        record, = struct.unpack_from("<I", self.reader.data, self.reader.index_offset + 4 * position)
+        return record
+
+    def __len__(self) -> int:
+        return self.reader.n_customers
+
+    def __getitem__(self, position: int) -> str:
+        return self.reader.customer_id(self.record(position))
+
+
+class LazyCustomers(MutableMapping):
+    """Customer mapping backed by a snapshot, building customers on access.
+
+    Customers added after loading, and snapshot customers once built, live
+    in an ordinary dict layered over the snapshot records. Iteration keeps
+    registration order: snapshot customers first, then newer ones.
+    """
+
+    def __init__(self, reader: _SnapshotReader, restaurant: Restaurant):
+        """Initialize the mapping.
+
+        Args:
+            reader: Reader over the mapped snapshot
+            restaurant: The restaurant the customers belong to
+        """
+        self._reader = reader
+        self._restaurant = restaurant
+        self._loaded: Dict[str, Customer] = {}
+        self._removed: Set[str] = set()
+        self._added: Dict[str, None] = {}
+        self._build_lock = threading.Lock()
+
+    def _in_snapshot(self, customer_id: str) -> Optional[int]:
+        """Get the snapshot record of a customer that has not been removed."""
+        if customer_id in self._removed:
+            return None
+        return self._reader.find_customer(customer_id)
+
+    def __getitem__(self, customer_id: str) -> Customer:
+        customer = self._loaded.get(customer_id)
+        if customer is not None:
+            return customer
+        # Threads racing to build the same customer must share one object
+        with self._build_lock:
+            customer = self._loaded.get(customer_id)
+            if customer is not None:
+                return customer
+            record = self._in_snapshot(customer_id)
+            if record is None:
+                raise KeyError(customer_id)
+            customer = self._loaded[customer_id] = self._reader.customer(record, self._restaurant)
+            return customer
+
+    def __setitem__(self, customer_id: str, customer: Customer):
+        if customer_id not in self._loaded and self._in_snapshot(customer_id) is None:
+            self._added[customer_id] = None
+        self._loaded[customer_id] = customer
+
+    def __delitem__(self, customer_id: str):
+        if customer_id in self._added:
+            del self._added[customer_id]
+        elif self._in_snapshot(customer_id) is not None:
+            self._removed.add(customer_id)
+        else:
+            raise KeyError(customer_id)
+        self._loaded.pop(customer_id, None)
+
+    def __contains__(self, customer_id) -> bool:
+        return customer_id in self._loaded or self._in_snapshot(customer_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for record in range(self._reader.n_customers):
+            customer_id = self._reader.customer_id(record)
+            if customer_id not in self._removed:
+                yield customer_id
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return self._reader.n_customers - len(self._removed) + len(self._added)
+
+    def identities(self) -> Iterator[Tuple[str, str, str]]:
+        """Yield (customer_id, name, email) of every customer without building any."""
+        for record in range(self._reader.n_customers):
+            identity = self._reader.customer_identity(record)
+            if identity[0] not in self._removed:
+                yield identity
+        for customer_id in list(self._added):
+            customer = self._loaded[customer_id]
+            yield customer_id, customer.name, customer.email
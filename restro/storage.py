@@ -0,0 +1,550 @@
+"""
+Module containing the storage backends of the restaurant management system.
+
+A backend keeps a restaurant's customers, their ledgers and their order
+histories. It hands the restaurant the mapping of customer ID to
+Customer that Restaurant uses as `customers`, and is told of every menu
+version published. MemoryBackend, the default, keeps everything in a
+dict and lists.
+
+SQLiteBackend keeps it all in a local SQLite file, so the data is not
+bounded by memory and survives a restart. Only recently used customers
+stay built, in an LRU cache in front of the database; any other
+customer is read back on access, with their ledger and their orders,
+whose lines are stored as they are packed in memory. Writes go through
+to the database from each customer's ledger and order list, queued and
+committed together once `batch_size` are waiting, or on `flush`; up to
+that many writes are lost if the process dies. Reads take a connection
+from a small pool, so threads reading different customers do not wait
+on each other, and sqlite3 prepares each statement once per connection.
+The menu is small and stays in memory, written out when it changes, as
+does the restaurant's liabilities ledger, rebuilt from the stored
+entries on open. Orders are indexed by the time they were placed, so the
+restaurant's range queries and pages of every customer's orders read
+only the rows they return rather than every order.
+"""
+import queue
+import sqlite3
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .customer import Customer
+from .history import OrderHistory
+from .ledger import Ledger, CLOSURE, epoch_seconds
+from .locks import NO_LOCK
+from .menu import MenuVersion
+from .models import MenuItem, Order
+from .money import Money
+
+# Customers kept built by default, and writes committed per transaction
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 1_000
+DEFAULT_POOL_SIZE = 4
+
+# Items are stored under keys of their own, since item IDs last only as
+# long as the process; order lines refer to items by key, as n item keys
+# (u32), n quantities (u32) and n prices in cents (i64)
+STORED_LINE_SIZE = 16
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS items (
+    key INTEGER PRIMARY KEY, name TEXT, category TEXT, price INTEGER, sku INTEGER);
+CREATE TABLE IF NOT EXISTS menu (position INTEGER PRIMARY KEY, item INTEGER);
+CREATE TABLE IF NOT EXISTS customers (
+    seq INTEGER PRIMARY KEY, id TEXT UNIQUE, name TEXT, email TEXT, address TEXT);
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY, customer_id TEXT, time REAL, amount INTEGER, kind INTEGER, reference INTEGER);
+CREATE INDEX IF NOT EXISTS entries_customer ON entries (customer_id, seq);
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY, id INTEGER, customer_id TEXT, created REAL, menu_version INTEGER,
+    total INTEGER, lines BLOB);
+CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_id, seq);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (created);
+"""
+
+INSERT_ITEM = "INSERT INTO items (key, name, category, price, sku) VALUES (?, ?, ?, ?, ?)"
+INSERT_CUSTOMER = "INSERT INTO customers (id, name, email, address) VALUES (?, ?, ?, ?)"
+INSERT_ENTRY = "INSERT INTO entries (customer_id, time, amount, kind, reference) VALUES (?, ?, ?, ?, ?)"
+INSERT_ORDER = ("INSERT INTO orders (id, customer_id, created, menu_version, total, lines) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+INSERT_MENU = "INSERT INTO menu (position, item) VALUES (?, ?)"
+SET_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+DELETE_CUSTOMER = "DELETE FROM customers WHERE id = ?"
+DELETE_ORDERS = "DELETE FROM orders WHERE customer_id = ?"
+SELECT_CUSTOMER = "SELECT name, email, address FROM customers WHERE id = ?"
+SELECT_ENTRIES = "SELECT time, amount, kind, reference FROM entries WHERE customer_id = ? ORDER BY time, seq"
+SELECT_ORDERS = ("SELECT id, created, menu_version, total, lines FROM orders "
+                 "WHERE customer_id = ? ORDER BY seq")
+# The index on created holds seq as the rowid, so these walk it in order
+ORDER_COLUMNS = "SELECT customer_id, id, created, menu_version, total, lines FROM orders "
+SELECT_ORDERS_BETWEEN = ORDER_COLUMNS + "WHERE created >= ? AND created < ? ORDER BY created, seq"
+SELECT_ORDERS_BETWEEN_NEWEST = ORDER_COLUMNS + "WHERE created >= ? AND created < ? ORDER BY created DESC, seq DESC"
+SELECT_NEWEST_ORDERS = ORDER_COLUMNS + "ORDER BY created DESC, seq DESC LIMIT ?"
+SELECT_ORDERS_BEFORE = ORDER_COLUMNS + "WHERE (created, seq) < (?, ?) ORDER BY created DESC, seq DESC LIMIT ?"
+SELECT_ORDER_SEQ = "SELECT seq FROM orders WHERE created = ? AND id = ?"
+
+
+class StorageBackend:
+    """Where a restaurant keeps its customers and their order histories."""
+
+    def open(self, restaurant) -> MutableMapping:
+        """Load whatever the backend holds into a new restaurant.
+
+        Args:
+            restaurant: The restaurant, otherwise still empty
+
+        Returns:
+            The mapping of customer ID to Customer for the restaurant's
+            `customers`
+        """
+        raise NotImplementedError
+
+    def save_menu(self, menu: MenuVersion):
+        """Keep a newly published menu version.
+
+        Args:
+            menu: The menu version
+        """
+
+    def save_closure(self, customer_id: str, timestamp: float, cents: int):
+        """Keep what a removed customer's balance took off the liabilities.
+
+        Args:
+            customer_id: ID of the removed customer
+            timestamp: When they were removed, in epoch seconds
+            cents: The change in liabilities, minus their balance
+        """
+
+    def flush(self):
+        """Write out every change made so far."""
+
+    def close(self):
+        """Flush, and release what the backend holds open."""
+
+
+class MemoryBackend(StorageBackend):
+    """Keeps customers in a dict and their orders in lists, as long as the process lives."""
+
+    def open(self, restaurant) -> Dict[str, Customer]:
+        return {}
+
+
+class _StoredLedger(Ledger):
+    """A customer's ledger, writing each entry through to the database."""
+
+    __slots__ = ("_store", "_customer_id")
+
+    def append(self, timestamp: float, cents: int, kind: int, reference: int = 0):
+        Ledger.append(self, timestamp, cents, kind, reference)
+        self._store._queue_entry((self._customer_id, timestamp, cents, kind, reference))
+
+
+class _StoredOrders(OrderHistory):
+    """A customer's order history, writing each order through to the database."""
+
+    __slots__ = ("_store", "_customer_id")
+
+    def append(self, order: Order):
+        OrderHistory.append(self, order)
+        self._store._queue_order(self._customer_id, order)
+
+
+class SQLiteBackend(StorageBackend):
+    """Keeps customers, ledgers and orders in a local SQLite database."""
+
+    def __init__(self, path: str, cache_size: int = DEFAULT_CACHE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, pool_size: int = DEFAULT_POOL_SIZE):
+        """Open or create the database.
+
+        Args:
+            path: Path of the database file, or ":memory:" for a
+                database that lasts as long as the backend
+            cache_size: Most customers kept built in memory
+            batch_size: Writes committed together in one transaction
+            pool_size: Connections for reads, used in parallel by threads
+
+        Raises:
+            ValueError: If a size is less than 1
+        """
+        if min(cache_size, batch_size, pool_size) < 1:
+            raise ValueError("Cache, batch and pool sizes must be at least 1")
+        self.path = path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        # An in-memory database exists only on its one connection
+        self._shared = path == ":memory:"
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        if not self._shared:
+            for _ in range(pool_size):
+                self._idle.put(self._connect())
+        # Guards the writer and the queued writes; thread safe once opened for such a restaurant
+        self._lock = NO_LOCK
+        self._restaurant = None
+        # Writes waiting for the next transaction
+        self._new_items: List[tuple] = []
+        self._new_customers: List[tuple] = []
+        self._entries: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._removed: List[Tuple[str]] = []
+        self._menu: Optional[MenuVersion] = None
+        self._pending = 0
+        # Customers with queued writes, whom a read must not miss
+        self._dirty: Set[str] = set()
+        # Stored item key by item ID, item by key, and key of the first version stored by SKU
+        self._item_keys: Dict[int, int] = {}
+        self._items: Dict[int, MenuItem] = {}
+        self._sku_keys: Dict[int, int] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that any one thread at a time may use."""
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        if not self._shared:
+            # Readers see the last commit without blocking the writer
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def open(self, restaurant) -> "_StoredCustomers":
+        """Load the menu, customer count and liabilities, and serve the customers on demand.
+
+        Raises:
+            ValueError: If the backend already serves a restaurant
+        """
+        if self._restaurant is not None:
+            raise ValueError("A SQLite backend serves one restaurant")
+        self._restaurant = restaurant
+        if restaurant.thread_safe:
+            self._lock = threading.Lock()
+        writer = self._writer
+        # Every version of every item stored; menus are small, so load them all up front
+        for key, name, category, price, sku in writer.execute(
+                "SELECT key, name, category, price, sku FROM items ORDER BY key"):
+            item = MenuItem(name, Money(price), category, None if sku == key else self._items[sku].sku)
+            self._items[key] = item
+            self._item_keys[item.item_id] = key
+            self._sku_keys.setdefault(item.sku, key)
+        meta = dict(writer.execute("SELECT key, value FROM meta"))
+        if "menu_version" in meta:
+            restaurant._install_menu(MenuVersion(
+                (self._items[key] for key, in writer.execute("SELECT item FROM menu ORDER BY position")),
+                meta["menu_version"],
+            ))
+        restaurant.next_customer_id = meta.get("next_customer_id", restaurant.next_customer_id)
+        times = array('d')
+        amounts = array('q')
+        kinds = array('B')
+        references = array('Q')
+        for timestamp, amount, kind, reference in writer.execute(
+                "SELECT time, amount, kind, reference FROM entries ORDER BY time, seq"):
+            times.append(timestamp)
+            amounts.append(amount)
+            kinds.append(kind)
+            references.append(reference)
+        if times:
+            restaurant._liabilities = Ledger.from_columns(times, amounts, kinds, references,
+                                                          array('q', accumulate(amounts)))
+        return _StoredCustomers(self, restaurant)
+
+    def _item_key(self, item: MenuItem) -> int:
+        """Get the stored key of an item, queueing the item if new. Caller holds the lock."""
+        key = self._item_keys.get(item.item_id)
+        if key is None:
+            key = len(self._items)
+            self._item_keys[item.item_id] = key
+            self._items[key] = item
+            # Later versions refer to the first version stored, which is read back before them
+            sku = self._sku_keys.setdefault(item.sku, key)
+            self._new_items.append((key, item.name, item.category, item.price.cents, sku))
+        return key
+
+    def _queued(self, count: int = 1):
+        """Count queued writes, committing them once a batch is waiting. Caller holds the lock."""
+        self._pending += count
+        if self._pending >= self.batch_size:
+            self._flush()
+
+    def _queue_entry(self, row: tuple):
+        """Queue a customer's ledger entry."""
+        with self._lock:
+            self._entries.append(row)
+            self._dirty.add(row[0])
+            self._queued()
+
+    def _queue_order(self, customer_id: str, order: Order):
+        """Queue an order, its lines referring to items by stored key."""
+        lines = order._packed()
+        split = 8 * len(order._items)
+        with self._lock:
+            keys = self._item_keys
+            stored = array('I', [keys[item.item_id] if item.item_id in keys else self._item_key(item)
+                                 for item in order._items])
+            self._orders.append((order.id, customer_id, order._created, order.menu_version,
+                                 order.total_price.cents, stored.tobytes() + lines[split:] + lines[:split]))
+            self._dirty.add(customer_id)
+            self._queued()
+
+    def _add_customer(self, customer: Customer):
+        """Store a newly registered customer and write their changes through from now on."""
+        customer_id = customer.customer_id
+        ledger = _StoredLedger.from_columns(*(customer._ledger or Ledger()).columns())
+        ledger._store = self
+        ledger._customer_id = customer_id
+        orders = _StoredOrders()
+        orders._store = self
+        orders._customer_id = customer_id
+        with self._lock:
+            self._new_customers.append((customer_id, customer.name, customer.email, customer.address))
+            self._dirty.add(customer_id)
+            self._queued()
+        # Whatever the customer already holds, as restored customers may, is written too
+        for timestamp, cents, kind, reference, _ in zip(*ledger.columns()):
+            self._queue_entry((customer_id, timestamp, cents, kind, reference))
+        customer._ledger = ledger
+        orders.extend(customer.orders)
+        customer.orders = orders
+
+    def _remove_customer(self, customer_id: str):
+        """Delete a customer and their orders, keeping their entries for the liabilities."""
+        with self._lock:
+            self._removed.append((customer_id,))
+            self._dirty.add(customer_id)
+            self._queued()
+
+    def save_closure(self, customer_id: str, timestamp: float, cents: int):
+        # Stored at the restaurant's own moment, so the liabilities rebuilt on open match
+        self._queue_entry((customer_id, timestamp, cents, CLOSURE, 0))
+
+    def save_menu(self, menu: MenuVersion):
+        with self._lock:
+            self._menu = menu
+            self._queued()
+
+    def _flush(self):
+        """Commit every queued write in one transaction. Caller holds the lock."""
+        writer = self._writer
+        menu_keys = None
+        if self._menu is not None:
+            menu_keys = [(position, self._item_key(item)) for position, item in enumerate(self._menu)]
+        with writer:
+            if self._new_items:
+                writer.executemany(INSERT_ITEM, self._new_items)
+            if self._new_customers:
+                writer.executemany(INSERT_CUSTOMER, self._new_customers)
+            if self._entries:
+                writer.executemany(INSERT_ENTRY, self._entries)
+            if self._orders:
+                writer.executemany(INSERT_ORDER, self._orders)
+            if self._removed:
+                writer.executemany(DELETE_CUSTOMER, self._removed)
+                writer.executemany(DELETE_ORDERS, self._removed)
+            if menu_keys is not None:
+                writer.execute("DELETE FROM menu")
+                writer.executemany(INSERT_MENU, menu_keys)
+                writer.execute(SET_META, ("menu_version", self._menu.version))
+            if self._restaurant is not None:
+                writer.execute(SET_META, ("next_customer_id", self._restaurant.next_customer_id))
+        self._new_items.clear()
+        self._new_customers.clear()
+        self._entries.clear()
+        self._orders.clear()
+        self._removed.clear()
+        self._menu = None
+        self._pending = 0
+        self._dirty.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    @contextmanager
+    def _reader(self, customer_id: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection that sees the writes queued so far.
+
+        Args:
+            customer_id: The one customer the reads are about, whose
+                queued writes are all that need committing first; every
+                queued write is committed if not given
+        """
+        with self._lock:
+            if self._pending and (customer_id is None or customer_id in self._dirty):
+                self._flush()
+            if self._shared:
+                yield self._writer
+                return
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def _load_customer(self, customer_id: str, restaurant) -> Customer:
+        """Build a stored customer with their ledger and orders.
+
+        Raises:
+            KeyError: If no such customer is stored
+        """
+        with self._reader(customer_id) as connection:
+            row = connection.execute(SELECT_CUSTOMER, (customer_id,)).fetchone()
+            if row is None:
+                raise KeyError(customer_id)
+            entries = connection.execute(SELECT_ENTRIES, (customer_id,)).fetchall()
+            orders = connection.execute(SELECT_ORDERS, (customer_id,)).fetchall()
+        customer = restaurant._adopt(Customer(row[0], row[1], row[2], customer_id))
+        # Entries come in time order, as the ledger keeps them
+        times, amounts, kinds, references = zip(*entries) if entries else ((), (), (), ())
+        ledger = _StoredLedger.from_columns(array('d', times), array('q', amounts), array('B', kinds),
+                                            array('Q', references), array('q', accumulate(amounts)))
+        ledger._store = self
+        ledger._customer_id = customer_id
+        customer._ledger = ledger
+        history = _StoredOrders(self._order(customer_id, *row) for row in orders)
+        history._store = self
+        history._customer_id = customer_id
+        customer.orders = history
+        return customer
+
+    def _order(self, customer_id: str, order_id: int, created: float, menu_version: int, total: int,
+               lines: bytes) -> Order:
+        """Build a stored order, its lines moved back from item keys to items."""
+        count = len(lines) // STORED_LINE_SIZE
+        keys = array('I')
+        keys.frombytes(lines[:4 * count])
+        items = self._items
+        return Order._from_lines(customer_id, order_id, created, Money(total), menu_version,
+                                 tuple([items[key] for key in keys]), lines[8 * count:] + lines[4 * count:8 * count])
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list:
+        """Run a read query on a pooled connection."""
+        with self._reader() as connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    def _page(self, before: Optional[Order], limit: int) -> list:
+        """Read up to `limit` order rows placed before a cursor order, newest first.
+
+        Raises:
+            ValueError: If the cursor is not a stored order
+        """
+        with self._reader() as connection:
+            if before is None:
+                return connection.execute(SELECT_NEWEST_ORDERS, (limit,)).fetchall()
+            row = connection.execute(SELECT_ORDER_SEQ, (before._created, before.id)).fetchone()
+            if row is None:
+                raise ValueError(f"Order {before.order_id} is not in this history")
+            return connection.execute(SELECT_ORDERS_BEFORE, (before._created, row[0], limit)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+            while not self._idle.empty():
+                self._idle.get_nowait().close()
+
+
+class _StoredCustomers(MutableMapping):
+    """Customer mapping over a SQLite backend, with an LRU cache of built customers.
+
+    A customer evicted from the cache while still referenced elsewhere
+    is found again by a weak reference, so each customer is only ever
+    built once at a time and keeps one lock.
+    """
+
+    def __init__(self, backend: SQLiteBackend, restaurant):
+        """Initialize the mapping.
+
+        Args:
+            backend: The backend holding the customers
+            restaurant: The restaurant the customers belong to
+        """
+        self._backend = backend
+        self._restaurant = restaurant
+        self._cache: "OrderedDict[str, Customer]" = OrderedDict()
+        self._live: "weakref.WeakValueDictionary[str, Customer]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock() if restaurant.thread_safe else NO_LOCK
+        self.hits = 0
+        self.misses = 0
+
+    def _keep(self, customer_id: str, customer: Customer):
+        """Put a customer at the hot end of the cache, evicting the coldest. Caller holds the lock."""
+        cache = self._cache
+        cache[customer_id] = customer
+        cache.move_to_end(customer_id)
+        if len(cache) > self._backend.cache_size:
+            cache.popitem(last=False)
+
+    def __getitem__(self, customer_id: str) -> Customer:
+        with self._lock:
+            customer = self._cache.get(customer_id)
+            if customer is not None:
+                self._cache.move_to_end(customer_id)
+                self.hits += 1
+                return customer
+            customer = self._live.get(customer_id)
+            if customer is not None:
+                self._keep(customer_id, customer)
+                self.hits += 1
+                return customer
+        loaded = self._backend._load_customer(customer_id, self._restaurant)
+        with self._lock:
+            # A thread that loaded the same customer first wins
+            customer = self._live.get(customer_id)
+            if customer is None:
+                customer = self._live[customer_id] = loaded
+            self._keep(customer_id, customer)
+            self.misses += 1
+            return customer
+
+    def __setitem__(self, customer_id: str, customer: Customer):
+        with self._lock:
+            self._backend._add_customer(customer)
+            self._live[customer_id] = customer
+            self._keep(customer_id, customer)
+
+    def __delitem__(self, customer_id: str):
+        if customer_id not in self:
+            raise KeyError(customer_id)
+        with self._lock:
+            self._cache.pop(customer_id, None)
+            self._live.pop(customer_id, None)
+            self._backend._remove_customer(customer_id)
+
+    def __contains__(self, customer_id) -> bool:
+        if customer_id in self._cache or customer_id in self._live:
+            return True
+        return bool(self._backend._query("SELECT 1 FROM customers WHERE id = ?", (customer_id,)))
+
+    def __iter__(self) -> Iterator[str]:
+        for customer_id, in self._backend._query("SELECT id FROM customers ORDER BY seq"):
+            yield customer_id
+
+    def __len__(self) -> int:
+        return self._backend._query("SELECT count(*) FROM customers")[0][0]
+
+    def identities(self) -> Iterator[Tuple[str, str, str]]:
+        """Yield (customer_id, name, email) of every customer without building any."""
+        yield from self._backend._query("SELECT id, name, email FROM customers ORDER BY seq")
+
+    def orders_between(self, start: Union[datetime, float, None] = None, end: Union[datetime, float, None] = None,
+                       newest_first: bool = False) -> List[Order]:
+        """Get every customer's orders placed in a span of time, as `Restaurant.orders_between`."""
+        backend = self._backend
+        span = (float("-inf") if start is None else epoch_seconds(start),
+                float("inf") if end is None else epoch_seconds(end))
+        sql = SELECT_ORDERS_BETWEEN_NEWEST if newest_first else SELECT_ORDERS_BETWEEN
+        return [backend._order(*row) for row in backend._query(sql, span)]
+
+    def order_page(self, before: Optional[Order] = None, limit: int = 50) -> Tuple[List[Order], Optional[Order]]:
+        """Get a page of every customer's orders, newest first, as `Restaurant.order_page`."""
+        backend = self._backend
+        # One row past the page tells whether another page follows
+        rows = backend._page(before, max(0, limit) + 1)
+        orders = [backend._order(*row) for row in rows[:max(0, limit)]]
+        return orders, orders[-1] if len(rows) > len(orders) and orders else None
@@ -0,0 +1,346 @@
+"""
+Module containing the append-only operation log for the restaurant management system.
+
+Every mutation made through a Restaurant (and the customers it owns) is
+appended to the log as one JSON array per line. The first element is an
+operation code and, for customer operations, the second is the customer ID:
+
+    ["A", name, price, category]        add menu item
+    ["R", name]                         remove menu item
+    ["N", name, new_name]               rename menu item
+    ["P", name, new_price]              update menu item price
+    ["C", customer_id, name, email, address]
+                                        add customer
+    ["D", customer_id]                  remove customer
+    ["F", customer_id, amount, timestamp]
+                                        add funds
+    ["O", customer_id, timestamp, order_id, menu_version, item, ...]
+                                        place order, each item a name
+                                        for one unit or [name, quantity]
+    ["G", generation]                   first record of a log started by
+                                        a checkpoint
+
+Prices and amounts are JSON numbers of currency units. They are written
+from whole cents, so reading them back to the nearest cent is exact.
+Timestamps are epoch seconds; add funds records from logs written before
+deposits were timestamped have none and are dated on replay.
+
+Replaying the records in order against an empty Restaurant rebuilds the
+state that produced them. Each menu record makes one new menu version,
+so versions on replay match the ones orders were priced against, and
+an order logged after a menu change it did not see is still priced
+against the version it names.
+
+A checkpoint snapshots the restaurant and then swaps the log for an
+empty one of the next generation, whose number the snapshot keeps as
+`Restaurant.log_generation`. A log of an older generation is the one the
+snapshot already holds, left behind by a crash before the swap, and is
+not replayed again; a newer one continues a snapshot other than the one
+loaded, and is refused.
+"""
+import json
+import os
+import threading
+from typing import Iterator, List, Optional, Union
+
+from .models import Order, order_quantities
+from .money import Money
+
+ADD_ITEM = "A"
+REMOVE_ITEM = "R"
+RENAME_ITEM = "N"
+UPDATE_PRICE = "P"
+ADD_CUSTOMER = "C"
+REMOVE_CUSTOMER = "D"
+ADD_FUNDS = "F"
+PLACE_ORDER = "O"
+GENERATION = "G"
+
+
+class OperationLog:
+    """Append-only log of restaurant mutations with group commit.
+
+    Records are buffered and written with a single fsync once `sync_every`
+    records are pending, or once the oldest pending record is `max_delay`
+    seconds old. `sync_every=1` makes every mutation durable before it
+    returns; larger values trade durability latency for throughput.
+    """
+
+    def __init__(self, path: str, sync_every: int = 1, max_delay: Optional[float] = None):
+        """Open a log for appending.
+
+        Args:
+            path: Path of the log file, created if missing
+            sync_every: Number of records written per fsync
+            max_delay: Longest time in seconds a record may stay unsynced,
+                or None to sync only on `sync_every` and close
+        """
+        if sync_every < 1:
+            raise ValueError("sync_every must be at least 1")
+        self.path = path
+        self.sync_every = sync_every
+        self.max_delay = max_delay
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if max_delay is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def append(self, *record):
+        """Append a record, syncing if the group commit size is reached.
+
+        Args:
+            record: Operation code followed by its arguments
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.sync_every:
+                self._write_pending()
+
+    def sync(self):
+        """Write and fsync all pending records."""
+        with self._lock:
+            self._write_pending()
+
+    def rotate(self, generation: int):
+        """Discard every record and start a new generation, e.g. once a snapshot has captured them.
+
+        The new log, holding only its generation record, is written next
+        to the old one and renamed over it, so a crash leaves one or the
+        other.
+
+        Args:
+            generation: Generation number of the new log
+        """
+        with self._lock:
+            self._pending.clear()
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as log_file:
+                log_file.write(json.dumps([GENERATION, generation]) + "\n")
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        """Sync pending records and close the log."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.sync()
+        self._file.close()
+
+    def _write_pending(self):
+        """Write buffered records with one fsync. Caller holds the lock."""
+        if not self._pending:
+            return
+        self._pending.append("")
+        self._file.write("\n".join(self._pending))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending.clear()
+
+    def _flush_periodically(self):
+        """Background loop bounding how long a record stays unsynced."""
+        while not self._closed.wait(self.max_delay):
+            self.sync()
+
+    @staticmethod
+    def read(path: str) -> Iterator[list]:
+        """Read the records of a log file in order.
+
+        A torn final line, left by a crash in the middle of a write, is
+        ignored.
+
+        Args:
+            path: Path of the log file
+
+        Yields:
+            Each record as a list
+        """
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    if line.endswith("\n"):
+                        raise
+                    return
+
+
+def log_generation(path: str) -> int:
+    """Get the generation of a log file, 0 for a log no checkpoint started.
+
+    Args:
+        path: Path of the log file
+    """
+    for record in OperationLog.read(path):
+        return record[1] if record[0] == GENERATION else 0
+    return 0
+
+
+def replay_needed(restaurant, path: str) -> bool:
+    """Check whether a log's records are still to be applied to a restaurant.
+
+    Args:
+        restaurant: The restaurant, e.g. loaded from a snapshot
+        path: Path of the log file
+
+    Returns:
+        True if the log continues the restaurant's state, False if it
+        is missing or the restaurant already holds its records
+
+    Raises:
+        ValueError: If the log continues from a later checkpoint than
+            the restaurant's
+    """
+    if not os.path.exists(path):
+        return False
+    generation = log_generation(path)
+    if generation > restaurant.log_generation:
+        raise ValueError(f"Log {path} continues checkpoint {generation}, "
+                         f"but the restaurant is at checkpoint {restaurant.log_generation}")
+    return generation == restaurant.log_generation
+
+
+def order_entries(order: Order) -> List[Union[str, list]]:
+    """Get the items of an order as logged: a name per single unit, else [name, quantity].
+
+    Args:
+        order: The order object
+
+    Returns:
+        One entry per line of the order
+    """
+    return [item.name if quantity == 1 else [item.name, quantity] for item, quantity in order.lines]
+
+
+def parse_order(record: list):
+    """Split a place order record into its order ID, menu version and items.
+
+    Logs written before orders had numeric IDs, or menu versions, go
+    straight to the items, which are never integers.
+
+    Args:
+        record: The place order record
+
+    Returns:
+        (order_id, menu_version, items), with None for missing fields;
+        items are names and [name, quantity] pairs, as logged
+    """
+    order_id = menu_version = None
+    names = 3
+    if len(record) > 3 and isinstance(record[3], int):
+        order_id = record[3]
+        names = 4
+        if len(record) > 4 and isinstance(record[4], int):
+            menu_version = record[4]
+            names = 5
+    return order_id, menu_version, record[names:]
+
+
+def apply_record(restaurant, record: list):
+    """Apply one log record to a restaurant.
+
+    Args:
+        restaurant: The restaurant object, which must not have a log attached
+        record: The record to apply
+    """
+    op = record[0]
+    if op == PLACE_ORDER:
+        customer = restaurant.get_customer(record[1])
+        order_id, menu_version, names = parse_order(record)
+        menu = restaurant.menu_at(menu_version) if menu_version is not None else None
+        if menu is None:
+            menu = restaurant.get_menu()
+        quantities = order_quantities(names)
+        items = [menu.find(restaurant._normalize_name(name)) for name in quantities]
+        total_cents = 0
+        for item, quantity in zip(items, quantities.values()):
+            total_cents += item.price.cents * quantity
+        customer._record_order(items, Money(total_cents), record[2], order_id, menu.version,
+                               list(quantities.values()))
+    elif op == ADD_FUNDS:
+        restaurant.get_customer(record[1])._deposit(Money.of(record[2]), record[3] if len(record) > 3 else None)
+    elif op == ADD_CUSTOMER:
+        restaurant._register_customer(*record[1:])
+        number = record[1][1:]
+        if restaurant.customer_id_generator is None and number.isdigit():
+            restaurant.next_customer_id = max(restaurant.next_customer_id, int(number) + 1)
+    elif op == REMOVE_CUSTOMER:
+        restaurant.remove_customer(record[1])
+    elif op == ADD_ITEM:
+        restaurant.add_menu_item(*record[1:])
+    elif op == REMOVE_ITEM:
+        restaurant.remove_menu_item(record[1])
+    elif op == RENAME_ITEM:
+        restaurant.rename_menu_item(record[1], record[2])
+    elif op == UPDATE_PRICE:
+        restaurant.update_menu_item_price(record[1], record[2])
+    elif op == GENERATION:
+        pass
+    else:
+        raise ValueError(f"Unknown log operation: {op!r}")
+
+
+def recover(restaurant, path: str, sync_every: int = 1,
+            max_delay: Optional[float] = None) -> OperationLog:
+    """Replay a log into a restaurant and attach the log for new mutations.
+
+    A log the restaurant already holds, from a checkpoint that crashed
+    before swapping logs, is replaced with an empty one instead.
+
+    Args:
+        restaurant: A freshly created restaurant object, or one loaded
+            from a snapshot
+        path: Path of the log file, created if missing
+        sync_every: Number of records written per fsync
+        max_delay: Longest time in seconds a record may stay unsynced
+
+    Returns:
+        The attached OperationLog
+
+    Raises:
+        ValueError: If the log continues from a later checkpoint than
+            the restaurant's
+    """
+    if replay_needed(restaurant, path):
+        for record in OperationLog.read(path):
+            apply_record(restaurant, record)
+        _truncate_torn_tail(path)
+        restaurant.log = OperationLog(path, sync_every, max_delay)
+    else:
+        restaurant.log = OperationLog(path, sync_every, max_delay)
+        if restaurant.log_generation:
+            restaurant.log.rotate(restaurant.log_generation)
+    return restaurant.log
+
+
+def _truncate_torn_tail(path: str):
+    """Cut an unterminated final record off the log so appends start clean."""
+    with open(path, "rb+") as log_file:
+        log_file.seek(0, os.SEEK_END)
+        size = log_file.tell()
+        if size == 0:
+            return
+        log_file.seek(size - 1)
+        if log_file.read(1) == b"\n":
+            return
+        # Scan back to the last complete record
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            log_file.seek(start)
+            newline = log_file.read(end - start).rfind(b"\n")
+            if newline != -1:
+                log_file.truncate(start + newline + 1)
+                return
+            end = start
+        log_file.truncate(0)